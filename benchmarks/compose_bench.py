@@ -0,0 +1,124 @@
+# LCD printer compositing benchmark.
+# Drives the real LCDPrinter against a null SPI bus with the compositor off
+# and on, and reports for telemetry updates and page switches the CPU time
+# per frame next to the SPI traffic: write transactions, bytes and the
+# windows set up. Compositing pays off only where the windows it saves cost
+# more on the bus than its canvas painting and merging costs the CPU.
+# Under CPython the viper canvas helpers (_index_blit, _expand) run as plain
+# Python and dominate the compositing figures; only the board's numbers
+# decide whether LCDPrinter composes by default.
+#
+# Runs under CPython (with the firmware stand-ins of tests/sim) and on the
+# board, from the repository root:
+#   python benchmarks/compose_bench.py [--frames 50]
+#   mpremote mount . run benchmarks/compose_bench.py
+
+import gc
+import sys
+
+_here = __file__.rsplit("/", 1)[0] if "/" in __file__ else "."
+sys.path.insert(0, _here + "/..")
+
+try:
+    import machine  # noqa: F401
+except ImportError:
+    sys.path.insert(0, _here + "/../tests/sim")
+    import firmware
+
+    firmware.install()
+
+from time import ticks_us, ticks_diff  # noqa: E402
+
+import st7789py as st7789  # noqa: E402
+from lcd_printer import LCDPrinter  # noqa: E402
+from st7789_bench import FakeSPI, FakePin  # noqa: E402
+
+_RAMWR = b"\x2c"
+
+
+class CountingPin(FakePin):
+    """
+    A DC pin that also counts RAMWR commands, i.e. windows sent.
+    """
+    def __init__(self, spi):
+        super().__init__()
+        self.spi = spi
+        self.windows = 0
+
+    def reset(self):
+        super().reset()
+        self.windows = 0
+
+
+def make_printer(compose):
+    spi = FakeSPI()
+    dc = CountingPin(spi)
+    tft = st7789.ST7789(spi, 240, 320, reset=FakePin(), dc=dc, cs=FakePin(),
+                        rotation=0)
+    write = tft._write
+
+    def counted_write(command=None, data=None):
+        if command == _RAMWR:
+            dc.windows += 1
+        write(command, data)
+
+    tft._write = counted_write
+    return LCDPrinter(tft, compose=compose), spi, dc
+
+
+def updates(printer, frames):
+    for i in range(frames):
+        printer.print_usage({"User": f"{i % 100}.{i % 7}",
+                             "System": f"{(i * 3) % 100}.5",
+                             "Idle": f"{(i * 7) % 100}",
+                             "RAM_USED": f"{i % 16}.{i % 10} GiB",
+                             "OUT_OF": "16 GiB"})
+
+
+def switches(printer, frames):
+    for i in range(frames):
+        printer.show_page("cpu" if i % 2 else "overview")
+
+
+def run(frames=50):
+    """
+    Measure both cases with the compositor off and on.
+    :return: A dictionary "<case>_<off|on>" -> per frame statistics.
+    """
+    results = {}
+    for compose in (False, True):
+        for name, fn in (("update", updates), ("switch", switches)):
+            gc.collect()
+            printer, spi, dc = make_printer(compose)
+            fn(printer, 2)  # Warm up: layers, wrap cache, first values
+            spi.reset()
+            dc.reset()
+            start = ticks_us()
+            fn(printer, frames)
+            elapsed = ticks_diff(ticks_us(), start)
+            results[f"{name}_{'on' if compose else 'off'}"] = {
+                "us": elapsed / frames,
+                "spi_writes": spi.writes / frames,
+                "spi_bytes": spi.bytes / frames,
+                "windows": dc.windows / frames,
+            }
+            if printer.compositor is not None:
+                printer.compositor.detach()
+            del printer
+    return results
+
+
+def main():
+    frames = 50
+    args = sys.argv[1:]
+    if "--frames" in args:
+        frames = int(args[args.index("--frames") + 1])
+    results = run(frames)
+    print(f"{'case':12} {'us/frame':>10} {'writes':>8} {'bytes':>9} {'windows':>8}")
+    for name, r in results.items():
+        print(f"{name:12} {r['us']:10.0f} {r['spi_writes']:8.1f} "
+              f"{r['spi_bytes']:9.0f} {r['windows']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# ST7789 driver benchmark.
+# Drives the real st7789py driver against a recording fake SPI bus and fake
+# pins, and reports for every drawing primitive the Python time per call and
+# the SPI traffic it causes: write transactions, bytes, CS toggles and
+# command/data (DC) switches. Under MicroPython the heap allocated per call
+# is reported as well (null under CPython). Results are written as JSON, so a driver change
+# can be compared against a baseline before it reaches a board.
+#
+# Runs under CPython and the MicroPython unix port, from the repository root:
+#   python benchmarks/st7789_bench.py [--iterations 20] [--out results.json]
+#       [--compare baseline.json] [--theme]
+# --theme binds the printer's colour theme, so its colours are pre-packed.
+#   micropython benchmarks/st7789_bench.py ...
+
+import gc
+import json
+import sys
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    from time import perf_counter_ns
+
+    def ticks_us():
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(a, b):
+        return a - b
+
+try:
+    from gc import mem_alloc
+except ImportError:
+    mem_alloc = None
+
+_here = __file__.rsplit("/", 1)[0] if "/" in __file__ else "."
+sys.path.insert(0, _here + "/..")
+
+import st7789py as st7789  # noqa: E402
+from fonts import vga2_8x8 as font8  # noqa: E402
+from fonts import vga2_16x16 as font16  # noqa: E402
+from theme import Theme  # noqa: E402
+
+
+class FakeSPI:
+    """
+    Counts what the driver sends; the data itself is dropped.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.writes = 0
+        self.bytes = 0
+
+    def write(self, buf):
+        self.writes += 1
+        self.bytes += len(buf)
+
+
+class FakePin:
+    """
+    Counts level changes.
+    """
+    def __init__(self):
+        self.level = 1
+        self.reset()
+
+    def reset(self):
+        self.toggles = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self.level
+        v = 1 if v else 0
+        if v != self.level:
+            self.toggles += 1
+            self.level = v
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+
+class _Rand:
+    # Small LCG, the same sequence under CPython and MicroPython
+    def __init__(self, seed=1):
+        self.state = seed
+
+    def byte(self):
+        self.state = (self.state * 1103515245 + 12345) & 0x7FFFFFFF
+        return (self.state >> 16) & 0xFF
+
+
+class Bitmap:
+    """
+    A synthetic bitmap module for ST7789.bitmap: 32x32 pixels, 2 bpp.
+    """
+    WIDTH = 32
+    HEIGHT = 32
+    BPP = 2
+    PALETTE = (st7789.BLACK, st7789.RED, st7789.GREEN, st7789.BLUE)
+
+    def __init__(self):
+        r = _Rand(7)
+        self.BITMAP = bytes(r.byte() for _ in range(32 * 32 * 2 // 8))
+
+
+class ProportionalFont:
+    """
+    A synthetic converted true-type font for ST7789.write: 16 pixels high,
+    glyphs 6 to 13 pixels wide.
+    """
+    HEIGHT = 16
+    MAX_WIDTH = 13
+    OFFSET_WIDTH = 2
+    MAP = "".join(chr(c) for c in range(0x20, 0x7F))
+
+    def __init__(self):
+        r = _Rand(3)
+        widths = [6 + (i * 5) % 8 for i in range(len(self.MAP))]
+        offsets = bytearray()
+        bit = 0
+        for w in widths:
+            offsets.append(bit >> 8)
+            offsets.append(bit & 0xFF)
+            bit += w * self.HEIGHT
+        self.WIDTHS = bytes(widths)
+        self.OFFSETS = bytes(offsets)
+        self.BITMAPS = bytes(r.byte() for _ in range((bit + 7) // 8))
+
+
+def make_display():
+    spi = FakeSPI()
+    pins = {"reset": FakePin(), "dc": FakePin(), "cs": FakePin()}
+    tft = st7789.ST7789(spi, 240, 320, reset=pins["reset"], dc=pins["dc"],
+                        cs=pins["cs"], rotation=0)
+    return tft, spi, pins
+
+
+def cases(tft):
+    """
+    (name, callable) pairs of the primitives to measure.
+    """
+    bitmap = Bitmap()
+    pfont = ProportionalFont()
+    text = "CPU 42% RAM 7.5G"
+    star = [(0, -40), (12, -12), (40, 0), (12, 12), (0, 40), (-12, 12),
+            (-40, 0), (-12, -12), (0, -40)]
+    return (
+        ("fill", lambda: tft.fill(st7789.BLUE)),
+        ("fill_rect", lambda: tft.fill_rect(10, 110, 220, 40, st7789.RED)),
+        ("text8", lambda: tft.text(font8, text, 0, 10, st7789.WHITE)),
+        ("text16", lambda: tft.text(font16, text, 0, 40, st7789.WHITE)),
+        ("bitmap", lambda: tft.bitmap(bitmap, 100, 100)),
+        ("write", lambda: tft.write(pfont, text, 0, 80, st7789.WHITE)),
+        ("line", lambda: tft.line(0, 0, 239, 319, st7789.GREEN)),
+        ("polygon", lambda: tft.polygon(star, 120, 160, st7789.YELLOW, 0.3)),
+    )
+
+
+def run(iterations=20, theme=False):
+    """
+    Measure every primitive.
+    :param theme: Bind a theme with the colours the cases draw in.
+    :return: A dictionary name -> per call statistics.
+    """
+    tft, spi, pins = make_display()
+    if theme:
+        Theme([st7789.RED, st7789.GREEN, st7789.BLUE, st7789.YELLOW]).bind(tft)
+    results = {}
+    for name, fn in cases(tft):
+        fn()  # Warm up, e.g. lazy allocations
+        spi.reset()
+        for pin in pins.values():
+            pin.reset()
+        gc.collect()
+        gc.disable()  # Keep the heap figure free of collections
+        heap = mem_alloc() if mem_alloc else 0
+        start = ticks_us()
+        for _ in range(iterations):
+            fn()
+        elapsed = ticks_diff(ticks_us(), start)
+        heap = (mem_alloc() - heap) / iterations if mem_alloc else None
+        gc.enable()
+        results[name] = {
+            "us": elapsed / iterations,
+            "heap_bytes": heap,
+            "spi_writes": spi.writes / iterations,
+            "spi_bytes": spi.bytes / iterations,
+            "cs_toggles": pins["cs"].toggles / iterations,
+            "dc_switches": pins["dc"].toggles / iterations,
+        }
+    return results
+
+
+def compare(results, baseline):
+    """
+    Print the change of every figure against a baseline run.
+    """
+    print(f"{'case':<10} {'us':>18} {'spi_bytes':>22} {'spi_writes':>18}")
+    for name, r in results.items():
+        b = baseline.get("results", baseline).get(name)
+        if b is None:
+            continue
+        cols = []
+        for key in ("us", "spi_bytes", "spi_writes"):
+            old = b[key]
+            pct = (r[key] - old) * 100 / old if old else 0
+            cols.append(f"{r[key]:>10.0f} {pct:>+6.1f}%")
+        print(f"{name:<10} {cols[0]:>18} {cols[1]:>22} {cols[2]:>18}")
+
+
+def main(argv):
+    opts = {"--iterations": "20", "--out": None, "--compare": None}
+    for i, arg in enumerate(argv):
+        if arg in opts and i + 1 < len(argv):
+            opts[arg] = argv[i + 1]
+    theme = "--theme" in argv
+    results = run(int(opts["--iterations"]), theme)
+    doc = {
+        "implementation": sys.implementation.name,
+        "iterations": int(opts["--iterations"]),
+        "theme": theme,
+        "results": results,
+    }
+    text = json.dumps(doc)
+    if opts["--out"]:
+        with open(opts["--out"], "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if opts["--compare"]:
+        with open(opts["--compare"]) as f:
+            compare(results, json.loads(f.read()))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
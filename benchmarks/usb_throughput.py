@@ -0,0 +1,218 @@
+# USB channel throughput simulator.
+# Runs the real Channel class against a simulated full-speed bulk pipe and
+# a simulated device CPU, sweeping message sizes, buffer sizes and transfer
+# lengths, and reports messages/second and bytes/second for each
+# configuration.
+#
+# Usage (from the repository root, under CPython):
+#   python benchmarks/usb_throughput.py [--msg 200] [--count 2000]
+#       [--base-us 1500] [--byte-us 2]
+#
+# The model: the host queues fixed-size messages back to back; each 64 byte
+# packet takes PACKET_US on the bus and is only accepted while an OUT transfer
+# is pending. A transfer completes when it is full or a message ends (short
+# packet). The handler runs on the single device CPU, costing base_us per call
+# plus byte_us per received byte, and frees the RX buffer when it runs.
+
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Full speed USB: at most 19 bulk packets of 64 bytes per 1 ms frame
+PACKET_US = 1000 / 19
+
+# Message sizes swept by default: a short telemetry frame, and frames
+# spanning several packets (large frames, image chunks)
+MSG_SIZES = (40, 200, 1000)
+
+_scheduled = []
+
+
+class SimBuffer:
+    """
+    Model of usb.device.core.Buffer: the readable data always starts at
+    index 0 and a pending write starts where it ends. Data read while a
+    write is pending shifts down, and finish_write moves the written bytes
+    down after it.
+    """
+    def __init__(self, length):
+        self._b = memoryview(bytearray(length))
+        self._n = 0  # Readable bytes, from index 0
+        self._w = length  # Start of the pending write, length if none
+
+    def writable(self):
+        return len(self._b) - self._n
+
+    def readable(self):
+        return self._n
+
+    def pend_write(self, wmax=None):
+        self._w = self._n
+        end = (self._w + wmax) if wmax else len(self._b)
+        return self._b[self._w:end]
+
+    def finish_write(self, nbytes):
+        if self._n != self._w:
+            # Data was read while the write was pending
+            self._b[self._n:self._n + nbytes] = self._b[self._w:self._w + nbytes]
+        self._n += nbytes
+        self._w = len(self._b)
+
+    def pend_read(self):
+        return self._b[:self._n]
+
+    def finish_read(self, nbytes):
+        if not nbytes:
+            return
+        i = self._n - nbytes
+        self._n = i
+        if i:
+            self._b[:i] = self._b[nbytes:nbytes + i]
+
+    def write(self, data):
+        m = self.pend_write()
+        n = min(len(m), len(data))
+        if n:
+            m[:n] = data[:n]
+            self.finish_write(n)
+        return n
+
+
+def _schedule(func, arg):
+    if len(_scheduled) >= 8:  # MicroPython's default schedule queue depth
+        raise RuntimeError("schedule queue full")
+    _scheduled.append((func, arg))
+
+
+def _install_sim_modules():
+    # Only used when the real MicroPython modules are not available
+    mp = types.ModuleType("micropython")
+    mp.schedule = _schedule
+    mp.const = lambda x: x
+    usb = types.ModuleType("usb")
+    device = types.ModuleType("usb.device")
+    core = types.ModuleType("usb.device.core")
+    core.Buffer = SimBuffer
+    usb.device = device
+    device.core = core
+    sys.modules.update({"micropython": mp, "usb": usb, "usb.device": device,
+                        "usb.device.core": core})
+
+
+class SimInterface:
+    """
+    The parts of usb.device.core.Interface used by Channel.
+    """
+    def __init__(self):
+        self.pending = {}
+
+    def is_open(self):
+        return True
+
+    def xfer_pending(self, ep):
+        return ep in self.pending
+
+    def submit_xfer(self, ep, buf, cb):
+        self.pending[ep] = [buf, cb, 0]
+        return True
+
+
+def simulate(rxlen, xfer_len, msg_len, count, base_us, byte_us, mps=64):
+    """
+    Push count messages of msg_len bytes through one channel.
+    :return: (messages/s, bytes/s, handler calls), or None if the channel
+             wedged (full RX buffer and no handler scheduled)
+    """
+    from channel import Channel
+
+    del _scheduled[:]
+    state = {"handled": 0, "calls": 0, "cost": 0}
+
+    def handler(ch):
+        data = ch.read()
+        state["calls"] += 1
+        state["handled"] += len(data)
+        state["cost"] = base_us + byte_us * len(data)
+
+    itf = SimInterface()
+    ch = Channel("sim", handler, rxlen, 64, mps=mps, xfer_len=xfer_len)
+    ch.attach(itf, 1)
+    ch.rx_xfer()
+
+    now = 0.0
+    busy_until = 0.0
+    sent_msgs = 0
+    msg_left = msg_len
+    total = count * msg_len
+    while state["handled"] < total:
+        progressed = False
+        xfer = itf.pending.get(ch.ep_out)
+        if xfer is not None and sent_msgs < count:
+            # One packet on the bus, the USB hardware runs alongside the CPU
+            buf, cb, filled = xfer
+            n = min(mps, msg_left, len(buf) - filled)
+            now += PACKET_US
+            filled += n
+            msg_left -= n
+            if not msg_left:
+                sent_msgs += 1
+                msg_left = msg_len
+            # Full transfer, short packet or end of message completes it
+            if filled == len(buf) or n < mps or msg_left == msg_len:
+                del itf.pending[ch.ep_out]
+                cb(ch.ep_out, 0, filled)
+            else:
+                xfer[2] = filled
+            progressed = True
+        # The CPU runs scheduled handlers whenever it is free
+        while _scheduled and busy_until <= now:
+            func, arg = _scheduled.pop(0)
+            state["cost"] = 0
+            func(arg)
+            busy_until = max(now, busy_until) + state["cost"]
+            progressed = True
+        if not progressed:
+            if busy_until > now:
+                # The host is NAKed until the device frees buffer space
+                now = busy_until
+            else:
+                return None
+    now = max(now, busy_until)
+    seconds = now / 1e6
+    return count / seconds, total / seconds, state["calls"]
+
+
+def main(argv):
+    opts = {"--msg": None, "--count": 2000, "--base-us": 1500, "--byte-us": 2}
+    for i, arg in enumerate(argv):
+        if arg in opts and i + 1 < len(argv):
+            opts[arg] = int(argv[i + 1])
+    try:
+        import usb.device.core  # noqa: F401
+    except ImportError:
+        _install_sim_modules()
+    # xfer_len only matters for messages longer than a packet: shorter ones
+    # end every transfer with a short packet whatever its length
+    sizes = MSG_SIZES if opts["--msg"] is None else (opts["--msg"],)
+    print(f"handler {opts['--base-us']} us + {opts['--byte-us']} us/B")
+    print(f"{'msg':>5} {'rxlen':>6} {'xfer':>6} {'calls':>6} "
+          f"{'msg/s':>9} {'bytes/s':>10}")
+    for msg in sizes:
+        for rxlen in (256, 512, 1024, 3000, 4096):
+            for xfer_len in (None, 64, 256, 1024):
+                if xfer_len is not None and xfer_len > rxlen:
+                    continue
+                result = simulate(rxlen, xfer_len, msg, opts["--count"],
+                                  opts["--base-us"], opts["--byte-us"])
+                if result is None:
+                    print(f"{msg:>5} {rxlen:>6} {str(xfer_len):>6}  wedged")
+                    continue
+                msg_s, bps, calls = result
+                print(f"{msg:>5} {rxlen:>6} {str(xfer_len):>6} {calls:>6} "
+                      f"{msg_s:>9.0f} {bps:>10.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
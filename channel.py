@@ -0,0 +1,156 @@
+# Bulk endpoint pair used by the WZab1 USB interface.
+# Each channel owns an OUT endpoint (host to device), an IN endpoint
+# (device to host), its own RX/TX buffers and a handler for received data.
+
+from micropython import schedule, const
+from usb.device.core import Buffer
+from tracer import STAGE_RX, STAGE_SCHED, STAGE_ACK
+
+_EP_IN_FLAG = const(1 << 7)
+
+
+class Channel:
+    """
+    One bulk endpoint pair of a USB interface.
+    The handler is called as handler(channel) via micropython.schedule,
+    outside of the USB callback function, whenever data was received.
+    """
+    def __init__(self, name, handler, rxlen=3000, txlen=3000, priority=0,
+                 mps=64, xfer_len=None):
+        """
+        :param name: The channel role, e.g. "data" or "control".
+        :param handler: Callable invoked with the channel when data arrives.
+        :param rxlen: Size of the RX (host to device) buffer in bytes.
+        :param txlen: Size of the TX (device to host) buffer in bytes.
+        :param priority: Channels with a higher priority get their transfers
+                         submitted first when the interface is opened.
+        :param mps: Max packet size of both endpoints in the descriptor.
+        :param xfer_len: Max length of one OUT transfer, rounded down to a
+                         multiple of mps. None submits all free RX space at
+                         once; smaller values complete transfers of long
+                         messages in parts, so the handler can start on
+                         them earlier. Only one OUT transfer is pending at
+                         a time either way.
+        """
+        self.name = name
+        self.handler = handler
+        self.priority = priority
+        self.mps = mps
+        if xfer_len is not None:
+            xfer_len = max(mps, xfer_len - xfer_len % mps)
+        self.xfer_len = xfer_len
+        self.itf = None
+        self.ep_out = None # RX direction (host to device)
+        self.ep_in = None # TX direction (device to host)
+        self.rxlen = rxlen
+        self.txlen = txlen
+        self.rx = Buffer(rxlen)
+        self.tx = Buffer(txlen)
+        self.seq = 0 # Frames received on this channel
+        self.dropped = 0 # Frames not handled (schedule queue full)
+        self.trace = None # Optional tracer.Tracer
+        self.trace_id = 0 # Channel index in the trace entries
+        self.supervisor = None # Optional supervisor.Supervisor running the handler
+
+    def attach(self, itf, ep_num):
+        """
+        Bind the channel to an interface and an endpoint number.
+        :param itf: The owning usb.device.core.Interface.
+        :param ep_num: The endpoint number used for both directions.
+        :return: None
+        """
+        self.itf = itf
+        self.ep_out = ep_num
+        self.ep_in = ep_num | _EP_IN_FLAG
+
+    def tx_xfer(self):
+        # Keep an active IN transfer to send data to the host, whenever
+        # there is data to send.
+        itf = self.itf
+        if itf.is_open() and not itf.xfer_pending(self.ep_in) and self.tx.readable():
+            itf.submit_xfer(self.ep_in, self.tx.pend_read(), self._tx_cb)
+
+    def _tx_cb(self, ep, res, num_bytes):
+        if res == 0:
+            self.tx.finish_read(num_bytes)
+        self.tx_xfer()
+
+    def rx_xfer(self):
+        # Keep an active OUT transfer to receive messages from the host
+        itf = self.itf
+        if itf.is_open() and not itf.xfer_pending(self.ep_out) and self.rx.writable():
+            itf.submit_xfer(self.ep_out, self.rx.pend_write(self.xfer_len), self._rx_cb)
+
+    def _rx_cb(self, ep, res, num_bytes):
+        if res == 0:
+            self.rx.finish_write(num_bytes)
+            if self.trace is not None:
+                # Transfers merged into one frame share the next seq
+                self.trace.mark(STAGE_RX, self.seq + 1, self.trace_id)
+            try:
+                schedule(self._on_rx, None)
+            except RuntimeError:
+                # Schedule queue full, the data is merged into the next frame
+                self.dropped += 1
+        self.rx_xfer()
+
+    def _on_rx(self, _):
+        # Called via micropython.schedule, outside of the USB callback function.
+        if self.trace is not None:
+            self.trace.begin(self.seq + 1, self.trace_id)
+            self.trace.mark(STAGE_SCHED)
+        if self.supervisor is not None:
+            self.supervisor.run(self)
+        else:
+            self.handler(self)
+
+    def read(self):
+        """
+        Take all received data out of the RX buffer.
+        :return: bytes
+        """
+        m = self.rx.pend_read()
+        dt = bytes(m)
+        self.rx.finish_read(len(m))
+        self.seq += 1
+        # A full buffer left no OUT transfer pending, start one again
+        self.rx_xfer()
+        return dt
+
+    def pend_read(self):
+        """
+        Return the received data in place, without copying it.
+        It stays valid until finish_read is called.
+        :return: memoryview
+        """
+        return self.rx.pend_read()
+
+    def finish_read(self, nbytes):
+        """
+        Release nbytes returned by pend_read; completes a frame like read().
+        :param nbytes: The number of bytes consumed.
+        :return: None
+        """
+        self.rx.finish_read(nbytes)
+        self.seq += 1
+        self.rx_xfer()
+
+    def write(self, data):
+        """
+        Queue data for the host and start an IN transfer if none is active.
+        :param data: The bytes to send.
+        :return: The number of bytes queued.
+        """
+        if self.trace is not None:
+            self.trace.mark(STAGE_ACK, self.seq, self.trace_id)
+        n = self.tx.write(data)
+        self.tx_xfer()
+        return n
+
+    def kick(self):
+        """
+        Start any transfers that may have queued while the device was not open.
+        :return: None
+        """
+        self.tx_xfer()
+        self.rx_xfer()
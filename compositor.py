@@ -0,0 +1,508 @@
+# Dirty-region compositor between the LCD printer and the ST7789 driver.
+# A region of the screen is mirrored in a canvas. Inside a frame, fill_rect
+# and blit_buffer calls (text is drawn through blit_buffer) only paint the
+# canvas and record the damaged rectangle. A new rectangle is merged into one
+# of the last few recorded when a cost model, a window setup against the
+# extra pixels a merged window sends, says so; the glyphs of a text run are
+# drawn one after another, so their cells coalesce as they arrive. At the end
+# of the frame every rectangle is sent from the canvas with one _set_window
+# and its data bursts.
+# Outside a frame the calls are written through to both the canvas and the
+# display. Raw window writes by other code (write(), pixel(), image streams)
+# mark their area as unknown; merges never reach into unknown pixels.
+# The canvas can be palette indexed (4 or 8 bpp): painting looks the colours
+# up in the palette, and flushing expands the rows back to RGB565 in the
+# chunk buffer. A full 240x320 screen then takes 38 KB instead of 150 KB.
+
+import micropython
+import struct
+from array import array
+from micropython import const
+
+try:
+    ptr8
+except NameError:
+    # Outside viper code (e.g. CPython) the pointers are memoryviews
+    def ptr8(buf):
+        return memoryview(buf).cast("B")
+
+    def ptr16(buf):
+        return memoryview(buf).cast("B").cast("H")
+
+# Recorded rectangles a new one may be merged into, the newest first
+_CANDIDATES = const(4)
+
+_ENCODE_PIXEL = ">H"
+_ENCODE_PIXEL_SWAPPED = "<H"
+
+
+def _union(a, b):
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def _contains(a, b):
+    return a[0] <= b[0] and a[1] <= b[1] and b[2] <= a[2] and b[3] <= a[3]
+
+
+def _hits(rects, x0, y0, x1, y1):
+    # True if [x0, y0, x1, y1) overlaps any of rects
+    for k in rects:
+        if x0 < k[2] and k[0] < x1 and y0 < k[3] and k[1] < y1:
+            return True
+    return False
+
+
+# Indexed canvas helpers. In 4 bpp rows the even pixel is the high nibble.
+
+@micropython.viper
+def _fill_index(canvas, stride: int, bpp: int, x0: int, y0: int, w: int,
+                h: int, index: int):
+    # Set the w x h pixels at x0, y0 of the canvas to index
+    c = ptr8(canvas)
+    x1 = x0 + w
+    row = y0 * stride
+    end = row + h * stride
+    both = index | (index << 4)
+    while row < end:
+        x = x0
+        if bpp == 8:
+            while x < x1:
+                c[row + x] = index
+                x += 1
+        else:
+            if x & 1:
+                o = row + (x >> 1)
+                c[o] = (int(c[o]) & 0xF0) | index
+                x += 1
+            while x + 1 < x1:
+                c[row + (x >> 1)] = both
+                x += 2
+            if x < x1:
+                o = row + (x >> 1)
+                c[o] = (int(c[o]) & 0x0F) | (index << 4)
+        row += stride
+
+
+@micropython.viper
+def _index_blit(src, src_width: int, src_off: int, canvas, stride: int,
+                bpp: int, x0: int, y0: int, w: int, h: int, palette,
+                colors: int) -> int:
+    # Paint the RGB565 pixels of src (row width src_width, starting at pixel
+    # src_off) as palette indices. Returns -1, or the first pixel value that
+    # is not among the first colors palette entries.
+    s = ptr16(src)
+    c = ptr8(canvas)
+    p = ptr16(palette)
+    last = -1
+    index = 0
+    y = 0
+    while y < h:
+        si = src_off + y * src_width
+        row = (y0 + y) * stride
+        x = 0
+        while x < w:
+            v = int(s[si + x])
+            if v != last:
+                index = 0
+                while index < colors and int(p[index]) != v:
+                    index += 1
+                if index == colors:
+                    return v
+                last = v
+            cx = x0 + x
+            if bpp == 8:
+                c[row + cx] = index
+            else:
+                o = row + (cx >> 1)
+                if cx & 1:
+                    c[o] = (int(c[o]) & 0xF0) | index
+                else:
+                    c[o] = (int(c[o]) & 0x0F) | (index << 4)
+            x += 1
+        y += 1
+    return -1
+
+
+@micropython.viper
+def _expand(canvas, stride: int, bpp: int, x0: int, y0: int, w: int, h: int,
+            palette, out):
+    # Expand the w x h pixels at x0, y0 of the canvas to RGB565 in out
+    c = ptr8(canvas)
+    p = ptr16(palette)
+    o = ptr16(out)
+    n = 0
+    x1 = x0 + w
+    row = y0 * stride
+    end = row + h * stride
+    while row < end:
+        x = x0
+        while x < x1:
+            if bpp == 8:
+                index = int(c[row + x])
+            else:
+                b = int(c[row + (x >> 1)])
+                if x & 1:
+                    index = b & 0x0F
+                else:
+                    index = b >> 4
+            o[n] = p[index]
+            n += 1
+            x += 1
+        row += stride
+
+
+class Compositor:
+    """
+    Collects the damage of a frame and sends it in as few windows as pays off.
+    Rectangles are [x0, y0, x1, y1) in screen coordinates. The damage lives in
+    a preallocated array, so drawing and merging allocate nothing; only the
+    rarely changing unknown areas are lists.
+    """
+    def __init__(self, tft, x, y, width, height, setup_px=512, chunk=2048,
+                 bpp=16, max_damage=32):
+        """
+        :param tft: The ST7789 driver instance; its blit_buffer, fill_rect
+                    and _set_window are hooked until detach().
+        :param x: The left edge of the composited region.
+        :param y: The top edge of the composited region.
+        :param width: The width of the region.
+        :param height: The height of the region.
+        :param setup_px: The cost of a window setup, in pixels sent. Two
+                         rectangles are merged when their bounding box adds
+                         at most this many pixels.
+        :param chunk: Size of the buffer used to gather partial rows.
+        :param bpp: Bits per canvas pixel: 16 for RGB565, 4 or 8 for a
+                    palette of 16 or 256 colours. Drawing with more colours
+                    than the palette holds falls back to direct drawing.
+        :param max_damage: Damaged rectangles kept per frame; a frame with
+                           more is sent in parts.
+        """
+        self.tft = tft
+        self.region = [x, y, x + width, y + height]
+        self.width = width
+        self.bpp = bpp
+        if bpp == 16:
+            self.stride = width * 2
+        elif bpp == 8:
+            self.stride = width
+        elif bpp == 4:
+            self.stride = (width + 1) // 2
+        else:
+            raise ValueError("bpp must be 4, 8 or 16")
+        self.canvas = bytearray(self.stride * height)
+        # Palette entries are pixels as sent; index 0 is black, which is
+        # what the zeroed canvas holds
+        self.palette = bytearray(2 << bpp) if bpp < 16 else None
+        self._indices = {bytes(2): 0}
+        self.setup_px = setup_px
+        self._chunk = bytearray(chunk - chunk % (width * 2) or width * 2)
+        # x0, y0, x1, y1 of every damaged rectangle, ndamage of them in use
+        self.damage = array("h", bytes(8 * max_damage))
+        self.ndamage = 0
+        self._r = array("h", bytes(8))  # The clipped rectangle of a call
+        self.unknown = []
+        self.in_frame = False
+        self._raw = 0  # > 0 while the driver is called by the compositor
+        # Merge statistics of the last frame and in total
+        self.rects = 0
+        self.windows = 0
+        self.total_rects = 0
+        self.total_windows = 0
+        self._blit_buffer = tft.blit_buffer
+        self._fill_rect = tft.fill_rect
+        self._set_window = tft._set_window
+        tft.blit_buffer = self.blit_buffer
+        tft.fill_rect = self.fill_rect
+        tft._set_window = self._hook_set_window
+
+    def detach(self):
+        """
+        Restore the driver's own methods.
+        :return: None
+        """
+        tft = self.tft
+        tft.blit_buffer = self._blit_buffer
+        tft.fill_rect = self._fill_rect
+        tft._set_window = self._set_window
+
+    def stats(self):
+        """
+        Return the merge statistics as a dict: damaged rectangles and windows
+        sent in the last frame and in total; total_windows / total_rects is
+        the cumulative merge ratio.
+        """
+        return {"rects": self.rects, "windows": self.windows,
+                "total_rects": self.total_rects,
+                "total_windows": self.total_windows,
+                "colors": len(self._indices) if self.palette is not None else 0}
+
+    # Canvas
+
+    def _clip(self, x, y, width, height):
+        # The part of a call inside the region, in the reused _r
+        reg = self.region
+        r = self._r
+        r[0] = max(x, reg[0])
+        r[1] = max(y, reg[1])
+        r[2] = min(x + width, reg[2])
+        r[3] = min(y + height, reg[3])
+        return r
+
+    def _damaged(self, r):
+        # Record r as damage of the frame, merged into one of the last
+        # rectangles if the bounding box adds at most setup_px pixels
+        self.rects += 1
+        d = self.damage
+        x0 = r[0]
+        y0 = r[1]
+        x1 = r[2]
+        y1 = r[3]
+        area = (x1 - x0) * (y1 - y0) + self.setup_px
+        unknown = self.unknown
+        o = self.ndamage * 4
+        stop = max(0, o - 4 * _CANDIDATES)
+        while o > stop:
+            o -= 4
+            ux0 = min(x0, d[o])
+            uy0 = min(y0, d[o + 1])
+            ux1 = max(x1, d[o + 2])
+            uy1 = max(y1, d[o + 3])
+            if (area + (d[o + 2] - d[o]) * (d[o + 3] - d[o + 1])
+                    < (ux1 - ux0) * (uy1 - uy0)):
+                continue
+            if unknown and _hits(unknown, ux0, uy0, ux1, uy1):
+                continue
+            d[o] = ux0
+            d[o + 1] = uy0
+            d[o + 2] = ux1
+            d[o + 3] = uy1
+            return
+        if self.ndamage * 4 == len(d):
+            self._flush()
+        o = self.ndamage * 4
+        d[o] = x0
+        d[o + 1] = y0
+        d[o + 2] = x1
+        d[o + 3] = y1
+        self.ndamage += 1
+
+    def _index(self, pixel):
+        # The palette index of an encoded pixel, or -1 if the palette is full
+        index = self._indices.get(pixel)
+        if index is None:
+            index = len(self._indices)
+            if index >= 1 << self.bpp:
+                return -1
+            self.palette[index * 2:index * 2 + 2] = pixel
+            self._indices[pixel] = index
+        return index
+
+    def _paint_fill(self, r, color):
+        # Paint r with color; False if the colour does not fit the palette
+        tft = self.tft
+        pixel = None if tft.theme is None else tft.theme.pixels.get(color)
+        if pixel is None:
+            pixel = struct.pack(
+                _ENCODE_PIXEL_SWAPPED if tft.needs_swap else _ENCODE_PIXEL,
+                color)
+        reg = self.region
+        if self.palette is not None:
+            index = self._index(pixel)
+            if index < 0:
+                return False
+            _fill_index(self.canvas, self.stride, self.bpp, r[0] - reg[0],
+                        r[1] - reg[1], r[2] - r[0], r[3] - r[1], index)
+            return True
+        row_bytes = (r[2] - r[0]) * 2
+        row = self._chunk
+        row[0:2] = pixel
+        n = 2
+        while n < row_bytes:
+            k = min(n, row_bytes - n)
+            row[n:n + k] = row[0:k]
+            n += k
+        canvas = self.canvas
+        stride = self.stride
+        off = (r[1] - reg[1]) * stride + (r[0] - reg[0]) * 2
+        src = memoryview(row)[:row_bytes]
+        for _ in range(r[3] - r[1]):
+            canvas[off:off + row_bytes] = src
+            off += stride
+        return True
+
+    def _paint_blit(self, r, buffer, x, y, width):
+        # Paint r from buffer; False if its colours do not fit the palette
+        reg = self.region
+        if self.palette is not None:
+            while True:
+                missing = _index_blit(
+                    buffer, width, (r[1] - y) * width + r[0] - x, self.canvas,
+                    self.stride, self.bpp, r[0] - reg[0], r[1] - reg[1],
+                    r[2] - r[0], r[3] - r[1], self.palette,
+                    len(self._indices))
+                if missing < 0:
+                    return True
+                # Values are read in native (little endian) order
+                if self._index(bytes((missing & 0xFF, missing >> 8))) < 0:
+                    return False
+        src = memoryview(buffer)
+        canvas = self.canvas
+        stride = self.stride
+        row_bytes = (r[2] - r[0]) * 2
+        off = (r[1] - reg[1]) * stride + (r[0] - reg[0]) * 2
+        s = ((r[1] - y) * width + r[0] - x) * 2
+        for _ in range(r[3] - r[1]):
+            canvas[off:off + row_bytes] = src[s:s + row_bytes]
+            off += stride
+            s += width * 2
+        return True
+
+    def _painted(self, r):
+        # Unknown areas completely repainted are known again
+        unknown = self.unknown
+        i = 0
+        while i < len(unknown):
+            if _contains(r, unknown[i]):
+                unknown.pop(i)
+            else:
+                i += 1
+
+    # Hooked driver methods
+
+    def fill_rect(self, x, y, width, height, color):
+        r = self._clip(x, y, width, height)
+        if r[0] < r[2] and r[1] < r[3]:
+            if not self._paint_fill(r, color):
+                self._unpainted(r)
+            else:
+                self._painted(r)
+                if (self.in_frame and r[0] == x and r[1] == y
+                        and r[2] == x + width and r[3] == y + height):
+                    self._damaged(r)
+                    return
+        self._raw += 1
+        try:
+            self._fill_rect(x, y, width, height, color)
+        finally:
+            self._raw -= 1
+
+    def blit_buffer(self, buffer, x, y, width, height):
+        r = self._clip(x, y, width, height)
+        if r[0] < r[2] and r[1] < r[3]:
+            if not self._paint_blit(r, buffer, x, y, width):
+                self._unpainted(r)
+            else:
+                self._painted(r)
+                if (self.in_frame and r[0] == x and r[1] == y
+                        and r[2] == x + width and r[3] == y + height):
+                    self._damaged(r)
+                    return
+        self._raw += 1
+        try:
+            self._blit_buffer(buffer, x, y, width, height)
+        finally:
+            self._raw -= 1
+
+    def _hook_set_window(self, x0, y0, x1, y1):
+        if not self._raw:
+            # Pixels written behind the compositor's back
+            r = self._clip(x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+            if r[0] < r[2] and r[1] < r[3]:
+                self._unpainted(r)
+        self._set_window(x0, y0, x1, y1)
+
+    def _unpainted(self, r):
+        # The display gets pixels in r the canvas does not have. Damage
+        # collected so far is sent first, it must not cover them later.
+        if self.ndamage:
+            self._flush()
+        self._add_unknown(r)
+
+    def _add_unknown(self, r):
+        unknown = self.unknown
+        for k in unknown:
+            if _contains(k, r):
+                return
+        self._painted(r)  # Drop the areas r covers
+        unknown.append([r[0], r[1], r[2], r[3]])
+        if len(unknown) > 8:
+            # Keep the check cheap, e.g. during image streams
+            u = unknown[0]
+            for k in unknown:
+                u = _union(u, k)
+            unknown[:] = [u]
+
+    # Frames
+
+    def begin(self):
+        """
+        Start collecting damage instead of drawing.
+        :return: None
+        """
+        self.in_frame = True
+        self.rects = 0
+        self.windows = 0
+
+    def end(self):
+        """
+        Send the damage of the frame.
+        :return: The number of windows sent.
+        """
+        self.in_frame = False
+        self._flush()
+        self.total_rects += self.rects
+        self.total_windows += self.windows
+        return self.windows
+
+    def _flush(self):
+        n = self.ndamage
+        self.ndamage = 0
+        self.windows += n
+        d = self.damage
+        for o in range(0, n * 4, 4):
+            self._emit(d[o], d[o + 1], d[o + 2], d[o + 3])
+
+    def _emit(self, x0, y0, x1, y1):
+        tft = self.tft
+        self._raw += 1
+        try:
+            self._set_window(x0, y0, x1 - 1, y1 - 1)
+        finally:
+            self._raw -= 1
+        reg = self.region
+        stride = self.stride
+        row_bytes = (x1 - x0) * 2
+        chunk = self._chunk
+        if self.palette is not None:
+            # Expand as many rows as fit the chunk buffer at a time
+            rows = len(chunk) // row_bytes
+            y = y0 - reg[1]
+            end = y1 - reg[1]
+            while y < end:
+                n = min(rows, end - y)
+                _expand(self.canvas, stride, self.bpp, x0 - reg[0], y,
+                        x1 - x0, n, self.palette, chunk)
+                tft._write(None, memoryview(chunk)[:n * row_bytes])
+                y += n
+            return
+        off = (y0 - reg[1]) * stride + (x0 - reg[0]) * 2
+        canvas = memoryview(self.canvas)
+        rows = y1 - y0
+        if row_bytes == stride:
+            # Full width rows are contiguous in the canvas
+            end = off + rows * stride
+            step = len(chunk)
+            while off < end:
+                tft._write(None, canvas[off:min(end, off + step)])
+                off += step
+            return
+        n = 0
+        for _ in range(rows):
+            if n + row_bytes > len(chunk):
+                tft._write(None, memoryview(chunk)[:n])
+                n = 0
+            chunk[n:n + row_bytes] = canvas[off:off + row_bytes]
+            n += row_bytes
+            off += stride
+        if n:
+            tft._write(None, memoryview(chunk)[:n])
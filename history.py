@@ -0,0 +1,188 @@
+# On-device telemetry history.
+# Once a second the latest value of every parsed slot (the parser's numbers,
+# in hundredths) is sampled into fixed-size array rings at several
+# resolutions: 1 s samples and 10 s and 1 min rollups with min/max/avg by
+# default, i.e. the last minute, ten minutes and hour. All storage is
+# allocated up front, so the RAM use is fixed (see nbytes). Seconds without
+# fresh telemetry are recorded as gaps (NO_NUMBER). The rings outlive host
+# reconnects; the host reads them with the "HIST:<key>:<period>" command.
+
+import struct
+from array import array
+from time import ticks_ms, ticks_diff, ticks_add
+from parser import NO_NUMBER
+from protocol import (REPLY_HIST, HIST_HEADER, HIST_HEADER_SIZE, HIST_ENTRY,
+                      HIST_ENTRY_SIZE)
+
+
+class Tier:
+    """
+    One resolution: a ring of buckets of period seconds for every key.
+    """
+    def __init__(self, period, length, keys):
+        """
+        :param period: Seconds per bucket.
+        :param length: Buckets kept per key.
+        :param keys: Number of keys.
+        """
+        self.period = period
+        self.length = length
+        n = keys * length
+        # Key i owns [i * length, (i + 1) * length); a 1 s bucket holds one
+        # sample, so its min and max are the average
+        self.avg = array("i", [NO_NUMBER] * n)
+        if period > 1:
+            self.min = array("i", [NO_NUMBER] * n)
+            self.max = array("i", [NO_NUMBER] * n)
+        else:
+            self.min = self.max = self.avg
+        self.pos = 0  # The next bucket to write
+        self.count = 0  # Buckets written, up to length
+        # The open bucket
+        self._min = array("i", [0] * keys)
+        self._max = array("i", [0] * keys)
+        self._sum = [0] * keys
+        self._n = array("H", [0] * keys)
+
+    def nbytes(self):
+        """
+        Return the bytes taken by the arrays.
+        """
+        rings = 3 if self.min is not self.avg else 1
+        keys = len(self._n)
+        return 4 * self.length * keys * rings + 10 * keys
+
+    def add(self, i, value):
+        """
+        Add a sample of key i to the open bucket.
+        """
+        n = self._n[i]
+        if n == 0 or value < self._min[i]:
+            self._min[i] = value
+        if n == 0 or value > self._max[i]:
+            self._max[i] = value
+        self._sum[i] = self._sum[i] + value if n else value
+        self._n[i] = n + 1
+
+    def close(self):
+        """
+        Store the open bucket of every key and start the next one.
+        """
+        length = self.length
+        o = self.pos
+        for i in range(len(self._n)):
+            n = self._n[i]
+            if n:
+                self.min[o] = self._min[i]
+                self.max[o] = self._max[i]
+                self.avg[o] = (self._sum[i] + n // 2) // n
+                self._n[i] = 0
+            else:
+                self.min[o] = self.max[o] = self.avg[o] = NO_NUMBER
+            o += length
+        self.pos = (self.pos + 1) % length
+        if self.count < length:
+            self.count += 1
+
+
+class History:
+    """
+    Fixed-size multi-resolution history of the parsed telemetry values.
+    """
+    def __init__(self, keys, numbers, tiers=((1, 60), (10, 60), (60, 60)),
+                 stale_ms=5000):
+        """
+        :param keys: The keys, in the order of numbers.
+        :param numbers: The array of latest values in hundredths, e.g.
+                        UsageParser.numbers; NO_NUMBER for non-numeric values.
+        :param tiers: (seconds per bucket, buckets) of every resolution.
+        :param stale_ms: Values not refreshed by a frame for this long are
+                         recorded as gaps.
+        """
+        self.keys = list(keys)
+        self.numbers = numbers
+        self.tiers = [Tier(period, length, len(self.keys))
+                      for period, length in tiers]
+        self.stale_ms = stale_ms
+        self.seconds = 0  # Seconds sampled since start
+        self._last_ms = ticks_ms()
+        self._data_ms = None  # ticks_ms of the last frame
+        # The longest time any tier covers, older seconds are overwritten
+        self._span = max(period * length for period, length in tiers)
+        self._reply = bytearray(HIST_HEADER_SIZE + HIST_ENTRY_SIZE
+                                * max(length for _, length in tiers))
+
+    def nbytes(self):
+        """
+        Return the bytes taken by the rings and accumulators.
+        """
+        return sum(tier.nbytes() for tier in self.tiers)
+
+    def record(self):
+        """
+        Called for every parsed frame: the values are fresh.
+        :return: None
+        """
+        self._data_ms = ticks_ms()
+
+    def service(self, now):
+        """
+        Called from the main loop: sample every second that passed.
+        :param now: The current time in milliseconds (ticks_ms).
+        :return: None
+        """
+        elapsed = ticks_diff(now, self._last_ms)
+        if elapsed < 1000:
+            return
+        steps = elapsed // 1000
+        self._last_ms = ticks_add(self._last_ms, steps * 1000)
+        if steps > self._span:
+            self.seconds += steps - self._span
+            steps = self._span
+        fresh = (self._data_ms is not None
+                 and ticks_diff(now, self._data_ms) < self.stale_ms)
+        for _ in range(steps):
+            self._sample(fresh)
+
+    def _sample(self, fresh):
+        self.seconds += 1
+        numbers = self.numbers
+        tiers = self.tiers
+        if fresh:
+            for i in range(len(self.keys)):
+                value = numbers[i]
+                if value != NO_NUMBER:
+                    for tier in tiers:
+                        tier.add(i, value)
+        for tier in tiers:
+            if self.seconds % tier.period == 0:
+                tier.close()
+
+    def dump(self, key, period):
+        """
+        Encode the history of one key at one resolution, oldest bucket first.
+        :param key: The key.
+        :param period: Seconds per bucket of the tier.
+        :return: A memoryview of the reply, valid until the next dump, or
+                 None for an unknown key or period.
+        """
+        if key not in self.keys:
+            return None
+        for tier in self.tiers:
+            if tier.period == period:
+                break
+        else:
+            return None
+        buf = self._reply
+        length = tier.length
+        struct.pack_into(HIST_HEADER, buf, 0, REPLY_HIST, 0, tier.count,
+                         period, self.seconds % period)
+        base = self.keys.index(key) * length
+        first = tier.pos - tier.count
+        off = HIST_HEADER_SIZE
+        for k in range(first, tier.pos):
+            o = base + k % length
+            struct.pack_into(HIST_ENTRY, buf, off, tier.min[o], tier.max[o],
+                             tier.avg[o])
+            off += HIST_ENTRY_SIZE
+        return memoryview(buf)[:off]
@@ -0,0 +1,315 @@
+# Streaming image and screen-update decoder writing straight into display RAM.
+# The host sends window headers followed by raw or run-length encoded RGB565
+# pixels. Every received chunk is written to the open RAMWR window as it
+# arrives, so nothing is ever assembled in RAM.
+#
+# All fields are little endian. A rectangle header is
+#   x, y, width, height (u16), encoding (u8)
+# followed by its payload:
+#   ENC_RAW:  width * height pixels, 2 bytes each, in panel byte order
+#   ENC_RLE:  records of count (u16) + pixel (2 bytes, panel order)
+#   ENC_FILL: a single pixel (2 bytes, panel order) filling the rectangle
+#
+# Messages:
+#   b"IMG0" + one rectangle                   - a single image
+#   b"FRM0" + count (u16) + count rectangles  - a screen update, usually only
+#                                               the rectangles that changed
+#                                               since the host's previous frame
+
+import struct
+from time import ticks_us, ticks_diff
+from micropython import const
+
+MAGIC_IMAGE = b"IMG0"
+MAGIC_FRAME = b"FRM0"
+MAGIC_SIZE = const(4)
+RECT_FORMAT = "<HHHHB"
+RECT_SIZE = struct.calcsize(RECT_FORMAT)
+COUNT_SIZE = const(2)
+
+ENC_RAW = const(0)
+ENC_RLE = const(1)
+ENC_FILL = const(2)
+
+RLE_RECORD = const(4)
+
+_STATE_MAGIC = const(0)
+_STATE_COUNT = const(1)
+_STATE_RECT = const(2)
+_STATE_RAW = const(3)
+_STATE_RLE = const(4)
+_STATE_FILL = const(5)
+_STATE_DISCARD = const(6)  # Out of sync, skipping to the next magic
+
+# Bytes of the pattern buffer used to burst RLE runs, 256 pixels
+_PATTERN_SIZE = const(512)
+
+
+class ImageStream:
+    """
+    Decodes the image/screen-update stream of one channel into the display.
+    """
+    def __init__(self, tft, on_done=None):
+        """
+        :param tft: The ST7789 driver instance.
+        :param on_done: Called as on_done(ok, elapsed_us) after each message,
+                        ok is False if a header was rejected; that is
+                        reported once, the data up to the next magic is
+                        skipped silently.
+        """
+        self.tft = tft
+        self.on_done = on_done
+        self.count = 0 # Messages completed
+        self.rects = 0 # Rectangles drawn
+        self._state = _STATE_MAGIC
+        self._header = bytearray(RECT_SIZE)
+        self._header_n = 0
+        self._rects_left = 0
+        self._record = bytearray(RLE_RECORD)
+        self._record_n = 0
+        self._pair = bytearray(2)
+        self._odd = False # A single byte is waiting in self._pair
+        self._pattern = bytearray(_PATTERN_SIZE)
+        self._start = 0
+        self._reopen = True
+
+    def feed(self, data):
+        """
+        Consume one received chunk.
+        :param data: A memoryview (or bytes) with the received data.
+        :return: None
+        """
+        data = memoryview(data)
+        # Someone else may have drawn since the last chunk, so the window is
+        # always reopened at the current position
+        self._reopen = True
+        while data:
+            state = self._state
+            if state == _STATE_RAW:
+                data = self._feed_raw(data)
+            elif state == _STATE_RLE:
+                data = self._feed_rle(data)
+            elif state == _STATE_FILL:
+                data = self._feed_fill(data)
+            elif state == _STATE_DISCARD:
+                data = self._feed_discard(data)
+            else:
+                data = self._feed_header(data)
+
+    def abort(self):
+        """
+        Drop the message being received, e.g. after an error while drawing.
+        It is reported like a rejected header.
+        :return: None
+        """
+        self._reject()
+
+    def _collect(self, data, size):
+        # Accumulate a header of the given size, which may be split across chunks
+        n = min(size - self._header_n, len(data))
+        self._header[self._header_n:self._header_n + n] = data[:n]
+        self._header_n += n
+        return data[n:]
+
+    def _reject(self):
+        # Out of sync: report it once and skip everything up to the next magic
+        if self._state == _STATE_DISCARD:
+            return
+        self._state = _STATE_DISCARD
+        self._header_n = 0
+        if self.on_done is not None:
+            self.on_done(False, 0)
+
+    def _feed_discard(self, data):
+        # Look for a magic, which may start in the last bytes of the previous
+        # chunk; those are kept in the header buffer
+        kept = self._header_n
+        buf = bytes(self._header[:kept]) + bytes(data)
+        i = buf.find(MAGIC_IMAGE)
+        j = buf.find(MAGIC_FRAME)
+        if i < 0 or 0 <= j < i:
+            i = j
+        if i < 0:
+            # Keep what could be the start of a magic split across chunks
+            n = min(len(buf), MAGIC_SIZE - 1)
+            self._header[:n] = buf[len(buf) - n:]
+            self._header_n = n
+            return data[:0]
+        self._state = _STATE_MAGIC
+        if i >= kept:
+            self._header_n = 0
+            return data[i - kept:]
+        # The magic starts in the kept bytes, collect the rest from data
+        self._header[:kept - i] = buf[i:kept]
+        self._header_n = kept - i
+        return data
+
+    def _feed_header(self, data):
+        state = self._state
+        size = (MAGIC_SIZE if state == _STATE_MAGIC else
+                COUNT_SIZE if state == _STATE_COUNT else RECT_SIZE)
+        data = self._collect(data, size)
+        if self._header_n < size:
+            return data
+        self._header_n = 0
+        header = self._header
+        if state == _STATE_MAGIC:
+            magic = bytes(header[:MAGIC_SIZE])
+            self._start = ticks_us()
+            if magic == MAGIC_IMAGE:
+                self._rects_left = 1
+                self._state = _STATE_RECT
+            elif magic == MAGIC_FRAME:
+                self._state = _STATE_COUNT
+            else:
+                self._reject()
+                # The real magic may start inside the rejected bytes
+                header[:MAGIC_SIZE - 1] = magic[1:]
+                self._header_n = MAGIC_SIZE - 1
+        elif state == _STATE_COUNT:
+            self._rects_left = header[0] | header[1] << 8
+            self._state = _STATE_RECT
+            if not self._rects_left:
+                self._finish()
+        else:
+            x, y, w, h, enc = struct.unpack(RECT_FORMAT, header)
+            tft = self.tft
+            if (enc > ENC_FILL or not w or not h
+                    or x + w > tft.width or y + h > tft.height):
+                self._reject()
+            else:
+                self.begin(x, y, w, h, enc)
+        return data
+
+    def begin(self, x, y, w, h, enc=ENC_RAW):
+        """
+        Start a rectangle whose header was already parsed.
+        :return: None
+        """
+        self._x = x
+        self._y = y
+        self._w = w
+        self._h = h
+        self._total = w * h * 2
+        self._done = 0
+        self._odd = False
+        self._record_n = 0
+        self._reopen = True
+        self._state = (_STATE_RAW if enc == ENC_RAW else
+                       _STATE_RLE if enc == ENC_RLE else _STATE_FILL)
+
+    def _end_rect(self):
+        self.rects += 1
+        self._rects_left -= 1
+        if self._rects_left > 0:
+            self._state = _STATE_RECT
+        else:
+            self._finish()
+
+    def _finish(self):
+        self._state = _STATE_MAGIC
+        self.count += 1
+        if self.on_done is not None:
+            self.on_done(True, ticks_diff(ticks_us(), self._start))
+
+    def _emit(self, data):
+        # Write an even number of pixel bytes, reopening the window as needed.
+        # A window that starts mid-row only covers the rest of that row.
+        tft = self.tft
+        while data:
+            if self._reopen:
+                row, col = divmod(self._done // 2, self._w)
+                x0 = self._x + col
+                x1 = self._x + self._w - 1
+                y0 = self._y + row
+                if col:
+                    tft._set_window(x0, y0, x1, y0)
+                    self._row_left = (self._w - col) * 2
+                else:
+                    tft._set_window(x0, y0, x1, self._y + self._h - 1)
+                    self._row_left = self._total
+                self._reopen = False
+            n = min(len(data), self._row_left, self._total - self._done)
+            tft._write(None, data[:n])
+            self._done += n
+            self._row_left -= n
+            if not self._row_left:
+                self._reopen = True
+            data = data[n:]
+            if self._done >= self._total:
+                return
+
+    def _feed_raw(self, data):
+        if self._odd:
+            self._pair[1] = data[0]
+            self._odd = False
+            self._emit(self._pair)
+            data = data[1:]
+        n = min(len(data), self._total - self._done)
+        even = n & ~1
+        if even:
+            self._emit(data[:even])
+        if even != n:
+            self._pair[0] = data[even]
+            self._odd = True
+        if self._done >= self._total:
+            self._end_rect()
+        return data[n:]
+
+    def _feed_fill(self, data):
+        if not self._odd:
+            self._pair[0] = data[0]
+            self._odd = True
+            data = data[1:]
+            if not data:
+                return data
+        self._pair[1] = data[0]
+        self._odd = False
+        self.fill(self._pair, self._total // 2)
+        self._end_rect()
+        return data[1:]
+
+    def fill(self, pixel, count):
+        """
+        Burst count copies of a 2 byte pixel into the window.
+        :param pixel: The pixel in panel byte order (2 bytes).
+        :param count: The number of pixels.
+        :return: None
+        """
+        pattern = self._pattern
+        mv = memoryview(pattern)
+        need = min(count * 2, _PATTERN_SIZE)
+        pattern[0] = pixel[0]
+        pattern[1] = pixel[1]
+        # Doubling copies fill the pattern without a per-pixel loop
+        n = 2
+        while n < need:
+            step = min(n, need - n)
+            mv[n:n + step] = mv[:step]
+            n += step
+        left = count * 2
+        while left > 0 and self._done < self._total:
+            step = min(left, _PATTERN_SIZE)
+            self._emit(mv[:step])
+            left -= step
+
+    def _feed_rle(self, data):
+        record = self._record
+        while data and self._done < self._total:
+            if self._record_n or len(data) < RLE_RECORD:
+                # Reassemble a record split across chunks
+                n = min(RLE_RECORD - self._record_n, len(data))
+                record[self._record_n:self._record_n + n] = data[:n]
+                self._record_n += n
+                data = data[n:]
+                if self._record_n < RLE_RECORD:
+                    return data
+                self._record_n = 0
+                rec = record
+            else:
+                rec = data[:RLE_RECORD]
+                data = data[RLE_RECORD:]
+            self.fill(rec[2:4], rec[0] | rec[1] << 8)
+        if self._done >= self._total:
+            self._end_rect()
+        return data
@@ -0,0 +1,117 @@
+# Opt-in heap and timing instrumentation for the display and USB hot paths.
+# Wrapped calls record their count, duration (time.ticks_us) and the heap
+# allocated while they ran (gc.mem_alloc deltas). The collected stats can be
+# encoded in the same "key:value;..." format the host already speaks.
+
+import gc
+import time
+
+try:
+    _mem_alloc = gc.mem_alloc
+    _mem_free = gc.mem_free
+except AttributeError:
+    # CPython has no heap counters
+    _mem_alloc = lambda: 0
+    _mem_free = lambda: 0
+
+try:
+    _ticks_us = time.ticks_us
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    _ticks_us = lambda: time.perf_counter_ns() // 1000
+    _ticks_diff = lambda a, b: a - b
+
+# Indexes into a stats entry
+CALLS = 0
+TOTAL_US = 1
+MAX_US = 2
+ALLOC = 3
+
+
+class Instrument:
+    """
+    Collects per-call statistics for wrapped methods.
+    """
+    def __init__(self):
+        # name -> [calls, total_us, max_us, alloc_bytes]
+        self.stats = {}
+        # name -> callable returning a dict of values to report as well
+        self.gauges = {}
+
+    def wrap(self, obj, attr, name=None):
+        """
+        Replace obj.attr with a wrapper recording call statistics.
+        Allocations made by nested wrapped calls are counted by both entries.
+        :param obj: The object (instance) whose method is wrapped.
+        :param attr: The name of the method.
+        :param name: The stats entry name (default is the method name).
+        :return: None
+        """
+        func = getattr(obj, attr)
+        entry = self.stats.setdefault(name or attr, [0, 0, 0, 0])
+
+        def wrapper(*args, **kwargs):
+            alloc = _mem_alloc()
+            start = _ticks_us()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = _ticks_diff(_ticks_us(), start)
+                alloc = _mem_alloc() - alloc
+                entry[CALLS] += 1
+                entry[TOTAL_US] += elapsed
+                if elapsed > entry[MAX_US]:
+                    entry[MAX_US] = elapsed
+                # A collection during the call makes the delta negative
+                if alloc > 0:
+                    entry[ALLOC] += alloc
+
+        setattr(obj, attr, wrapper)
+
+    def gauge(self, name, func):
+        """
+        Report the values of another component, e.g. its own counters.
+        :param name: The entry name prefix.
+        :param func: Returns a dictionary of field -> int when called.
+        :return: None
+        """
+        self.gauges[name] = func
+
+    def wrap_all(self, obj, attrs, prefix):
+        """
+        Wrap several methods of one object, naming the entries prefix.attr.
+        :return: None
+        """
+        for attr in attrs:
+            self.wrap(obj, attr, f"{prefix}.{attr}")
+
+    def reset(self):
+        """
+        Zero all counters, keeping the wrapped methods in place.
+        :return: None
+        """
+        for entry in self.stats.values():
+            entry[CALLS] = entry[TOTAL_US] = entry[MAX_US] = entry[ALLOC] = 0
+
+    def snapshot(self):
+        """
+        Return the stats as a flat dict, including the current heap state.
+        :return: A dictionary of "name.field" -> int.
+        """
+        out = {"heap.free": _mem_free(), "heap.alloc": _mem_alloc()}
+        for name, entry in self.stats.items():
+            out[f"{name}.calls"] = entry[CALLS]
+            out[f"{name}.us"] = entry[TOTAL_US]
+            out[f"{name}.max_us"] = entry[MAX_US]
+            out[f"{name}.alloc"] = entry[ALLOC]
+        for name, func in self.gauges.items():
+            for field, value in func().items():
+                out[f"{name}.{field}"] = value
+        return out
+
+    def encode(self):
+        """
+        Encode the stats as "key:value;..." bytes for the control channel.
+        :return: bytes
+        """
+        return ";".join(f"{k}:{v}" for k, v in self.snapshot().items()).encode()
@@ -0,0 +1,113 @@
+# Layout compiler for the usage screen.
+# A declarative layout (key, font, colour, alignment per row) is turned once
+# into a table of render slots with all constant geometry precomputed, so an
+# update only has to measure the new value and draw the slots that arrived.
+
+ALIGN_LEFT = "left"
+ALIGN_CENTER = "center"
+ALIGN_RIGHT = "right"
+
+
+class Slot:
+    """
+    A compiled row: a constant label and a value drawn below it.
+    Besides the geometry it remembers what is currently on screen.
+    """
+    __slots__ = ("key", "index", "font", "color", "align", "label",
+                 "label_x", "label_y", "value_y", "margin", "width",
+                 "label_drawn", "value", "value_x", "value_w")
+
+    def __init__(self, key, index, font, color, align, label, label_x,
+                 label_y, value_y, margin, width):
+        self.key = key
+        self.index = index
+        self.font = font
+        self.color = color
+        self.align = align
+        self.label = label
+        self.label_x = label_x
+        self.label_y = label_y
+        self.value_y = value_y
+        self.margin = margin
+        self.width = width
+        self.reset()
+
+    def reset(self):
+        """
+        Forget what is on screen, e.g. after the screen was cleared.
+        :return: None
+        """
+        self.label_drawn = False
+        self.value = None
+        self.value_x = 0
+        self.value_w = 0
+
+    def value_x_for(self, value_width):
+        """
+        The x-coordinate of a value of the given pixel width.
+        """
+        if self.align == ALIGN_LEFT:
+            return self.margin
+        if self.align == ALIGN_RIGHT:
+            return self.width - self.margin - value_width
+        return (self.width - value_width) // 2
+
+
+class Layout:
+    """
+    A declarative layout, compiled into slots once per screen geometry.
+    """
+    def __init__(self, entries, first_y, margin=10, label_gap=2, row_gap=6):
+        """
+        :param entries: A sequence of (key, font, color, align) tuples.
+        :param first_y: The y-coordinate of the first row.
+        :param margin: Left/right margin for left/right aligned rows.
+        :param label_gap: Pixels between a label and its value.
+        :param row_gap: Pixels between rows.
+        """
+        self.entries = entries
+        self.first_y = first_y
+        self.margin = margin
+        self.label_gap = label_gap
+        self.row_gap = row_gap
+        # (width, height) -> {key: Slot}
+        self._compiled = {}
+
+    def compile(self, width, height):
+        """
+        Return the slots for a screen geometry, compiling them on first use.
+        :param width: The screen width for the current rotation.
+        :param height: The screen height for the current rotation.
+        :return: A dictionary of key -> Slot.
+        """
+        slots = self._compiled.get((width, height))
+        if slots is not None:
+            return slots
+        slots = {}
+        y = self.first_y
+        for index, (key, font, color, align) in enumerate(self.entries):
+            label = f"{key}:"
+            label_w = len(label) * font.WIDTH
+            if align == ALIGN_LEFT:
+                label_x = self.margin
+            elif align == ALIGN_RIGHT:
+                label_x = width - self.margin - label_w
+            else:
+                label_x = (width - label_w) // 2
+            value_y = y + font.HEIGHT + self.label_gap
+            if value_y + font.HEIGHT > height:
+                break  # Rows that do not fit this rotation are left out
+            slots[key] = Slot(key, index, font, color, align, label, label_x,
+                              y, value_y, self.margin, width)
+            y = value_y + font.HEIGHT + self.row_gap
+        self._compiled[(width, height)] = slots
+        return slots
+
+    def reset(self):
+        """
+        Mark every compiled slot as not drawn.
+        :return: None
+        """
+        for slots in self._compiled.values():
+            for slot in slots.values():
+                slot.reset()
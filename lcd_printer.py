@@ -1,9 +1,16 @@
 import random
 import st7789py as st7789
 import tft_config
+from static_layers import StaticLayerCache
+from layout import Layout, ALIGN_CENTER, ALIGN_LEFT
+from pages import Page, LogPage, PageManager
+from compositor import Compositor
+from theme import Theme
+from wrap import WordWrap, is_proportional, line_text
 from fonts import vga2_bold_16x32 as font_big
 from fonts import vga2_16x16 as font_schmol
 from fonts import vga1_bold_16x16 as font_pretty
+from fonts import vga2_8x8 as font_small
 
 import time
 
@@ -12,21 +19,66 @@ class LCDPrinter:
     """
     A class to handle printing to the LCD display.
     """
-    def __init__(self, tft=None):
+    def __init__(self, tft=None, layer_path=None, compose=None):
         if tft is None:
             tft = tft_config.config(tft_config.WIDE)
             tft.rotation(0)
         self.tft = tft
         self.FIRST_ROW_Y = 110
         self.FIRST_COLUMN_X = 10
+        # Title and key labels never change, render them once
+        self.layers = StaticLayerCache(tft, layer_path)
+        self.last_usage = None
+        # True while the values shown were restored from a snapshot
+        self.stale = False
+        self.wrap = WordWrap()
         
-        self.tft.fill(st7789.BLACK)  # Clear the screen initially
-        self.print_title(st7789.WHITE)  # Print the title initially
-        self.print_info("Waiting for data...", 10, self.FIRST_ROW_Y, 
-                        st7789.WHITE, font=font_pretty)
-        self.colors = [
+        # Every colour the printer uses is pre-packed for the driver
+        self.theme = Theme([
             st7789.RED, st7789.GREEN, st7789.BLUE, st7789.YELLOW,
-            st7789.CYAN, st7789.MAGENTA]
+            st7789.CYAN, st7789.MAGENTA])
+        self.theme.bind(tft)
+        self.colors = self.theme.accents
+        # Compiled once; each update only draws the slots whose values arrived
+        order = ["User", "System", "Idle", "RAM_USED", "OUT_OF"]
+        self.layout = self._layout(order, font_schmol)
+        self.pages = PageManager(self, [
+            Page("overview", ("Usage", "Monitor"), self.layout),
+            Page("cpu", ("CPU", "Cores"),
+                 self._layout([f"CPU{i}" for i in range(8)], font_small,
+                              ALIGN_LEFT)),
+            Page("net", ("Network", "Traffic"),
+                 self._layout(["NET_RX", "NET_TX", "NET_ERR"], font_schmol)),
+            Page("disk", ("Disk", "Activity"),
+                 self._layout(["DISK_READ", "DISK_WRITE", "DISK_USED"],
+                              font_schmol)),
+            LogPage("log", ("Event", "Log"), "LOG", font_small),
+        ])
+        self.wrap.max_entries = self.pages.wrap_entries()
+
+        # Optionally (compose, by default tft_config.COMPOSE) updates and
+        # page switches are drawn as frames through the compositor, which
+        # merges their windows. Its 4 bpp canvas holds the whole screen
+        # (38 KB), so a frame reaches the panel only once it is complete;
+        # without the memory for it everything draws directly.
+        self.compositor = None
+        if compose is None:
+            compose = tft_config.COMPOSE
+        if compose:
+            try:
+                self.compositor = Compositor(tft, 0, 0, tft.width, tft.height,
+                                             bpp=4)
+            except MemoryError:
+                pass
+
+        self.tft.fill(st7789.BLACK)  # Clear the screen initially
+        self.pages.repaint()  # Print the title and "Waiting for data..."
+
+    def _layout(self, keys, font, align=ALIGN_CENTER):
+        return Layout(
+            [(key, font, self.theme.accent(idx), align)
+             for idx, key in enumerate(keys)],
+            self.FIRST_ROW_Y)
 
     def print_text(self, text, x, y, color=st7789.WHITE, font=font_schmol):
         """
@@ -40,26 +92,35 @@ class LCDPrinter:
         """
         self.tft.text(font, text, x, y, color)
 
-    def print_title(self, color=st7789.WHITE):
+    def print_title(self, color=st7789.WHITE, title=("Usage", "Monitor")):
         """
-        Print the title "Usage Monitor" on the TFT display.
+        Clear the screen and print a two line title, "Usage Monitor" by default.
+        The lines are blitted from the static layer cache.
         :param color: The color of the title text (default is white).
+        :param title: The title lines.
         :return: None
         """
 
         self.tft.fill(st7789.BLACK)
-        # Center "Activity" and "Monitor" on separate lines
-        screen_width = self.tft.physical_width
-        text1 = "Usage"
-        text2 = "Monitor"
-        # Calculate text width using font_big.WIDTH and len
-        text1_width = len(text1) * font_big.WIDTH
-        text2_width = len(text2) * font_big.WIDTH
-        x1 = (screen_width - text1_width) // 2
-        x2 = (screen_width - text2_width) // 2
-        self.print_text(text1, x1, self.FIRST_COLUMN_X, color, font=font_big)
-        self.print_text(text2, x2, self.FIRST_COLUMN_X + font_big.HEIGHT + 4, 
-                        color, font=font_big)
+        # Center the lines under each other
+        screen_width = self.tft.width
+        y = self.FIRST_COLUMN_X
+        for line in title:
+            name = f"title_{line.lower()}"
+            _, text_width, _ = self.layers.get(name, font_big, line, color)
+            self.layers.blit(name, (screen_width - text_width) // 2, y)
+            y += font_big.HEIGHT + 4
+        if self.stale:
+            self._stale_marker(True)
+
+    def _stale_marker(self, show):
+        # A small "STALE" in the top right corner, above the title
+        x = self.tft.width - 5 * font_small.WIDTH - 2
+        if show:
+            self.tft.text(font_small, "STALE", x, 1, st7789.YELLOW)
+        else:
+            self.tft.fill_rect(x, 1, 5 * font_small.WIDTH, font_small.HEIGHT,
+                               st7789.BLACK)
         
     def clear_display_under_title(self):
         """
@@ -67,8 +128,8 @@ class LCDPrinter:
         This method fills the area below the title with black color.
         :return: None
         """
-        screen_height = self.tft.physical_height
-        screen_width = self.tft.physical_width
+        screen_height = self.tft.height
+        screen_width = self.tft.width
         title_height = 2 * (font_big.HEIGHT + 4)
         # Fill the area below the title with black color
         self.tft.fill_rect(0, title_height, screen_width, 
@@ -82,67 +143,110 @@ class LCDPrinter:
         :param x: The x-coordinate for the text.
         :param y: The y-coordinate for the text.
         :param color: The color of the text (default is white).
-        :param font: The font to use for the text (default is font_schmol).
+        :param font: The font to use for the text (default is font_pretty).
+                     Proportional fonts are drawn with ST7789.write.
         :return: None
         """
-        
-        screen_width = self.tft.physical_width
-        words = text.split()
-        lines = []
-        current_line = ""
-        for word in words:
-            # Predict width if we add this word
-            test_line = (current_line + " " + word).strip()
-            test_width = len(test_line) * font.WIDTH
-            if test_width + x > screen_width and current_line:
-                lines.append(current_line)
-                current_line = word
-            else:
-                if current_line:
-                    current_line += " "
-                current_line += word
-        if current_line:
-            lines.append(current_line)
-        for i, line in enumerate(lines):
-            self.tft.text(font, line, x, y + i * (font.HEIGHT + 2), color)
+        screen_width = self.tft.width
+        # Break positions are cached, only the drawn lines are sliced out
+        breaks = self.wrap.breaks(text, font, x, screen_width)
+        step = font.HEIGHT + 2
+        if is_proportional(font):
+            for i, (start, end) in enumerate(breaks):
+                self.tft.write(font, line_text(text, start, end), x, y + i * step, color)
+        else:
+            for i, (start, end) in enumerate(breaks):
+                self.tft.text(font, line_text(text, start, end), x, y + i * step, color)
 
             
     def print_usage(self, usage_dict):
         """
         Display Usage statistics on the TFT display.
+        The values are retained for every page, but only the slots of the
+        active page whose keys are present in usage_dict are drawn, and a
+        value that did not change is not drawn again.
         :param usage_dict: A dictionary containing usage data with keys "User", "System", "Idle", etc.
         """
+        if self.last_usage is None:
+            self.last_usage = {}
+        self.last_usage.update(usage_dict)
+        if self.stale:
+            # Live data replaces the restored values
+            self.stale = False
+            self._stale_marker(False)
+        compositor = self.compositor
+        if compositor is None:
+            self.pages.update(usage_dict)
+            return
+        compositor.begin()
+        try:
+            self.pages.update(usage_dict)
+        finally:
+            compositor.end()
 
-        # Clear the display area under the title
-        self.clear_display_under_title()
+    def draw_slot(self, slot, value_text):
+        """
+        Draw one compiled slot: its label once, then the value if it changed.
+        Leftovers of a wider previous value are cleared around the new one.
+        :param slot: The layout.Slot to draw.
+        :param value_text: The value as a string.
+        :return: None
+        """
+        font = slot.font
+        if not slot.label_drawn:
+            self.layers.draw(f"label_{slot.key}", font, slot.label,
+                             slot.label_x, slot.label_y, slot.color)
+            slot.label_drawn = True
+        if value_text == slot.value:
+            return
+        value_width = len(value_text) * font.WIDTH
+        value_x = slot.value_x_for(value_width)
+        self.print_text(value_text, value_x, slot.value_y, slot.color, font=font)
+        old_x = slot.value_x
+        old_end = old_x + slot.value_w
+        if slot.value_w:
+            if old_x < value_x:
+                self.tft.fill_rect(old_x, slot.value_y, value_x - old_x,
+                                   font.HEIGHT, st7789.BLACK)
+            if old_end > value_x + value_width:
+                self.tft.fill_rect(value_x + value_width, slot.value_y,
+                                   old_end - value_x - value_width,
+                                   font.HEIGHT, st7789.BLACK)
+        slot.value = value_text
+        slot.value_x = value_x
+        slot.value_w = value_width
 
-        # Print the usage statistics
-        screen_width = self.tft.physical_width
-        order = ["User", "System", "Idle", "RAM_USED", "OUT_OF"]
-        max_height = 0
-        for idx, key in enumerate(order):
-            if key in usage_dict:
-                value = usage_dict[key]
-                color = self.colors[idx % len(self.colors)]
-                y = self.FIRST_ROW_Y + idx * (font_schmol.HEIGHT * 2 + 8)
-                max_height += y
-                key_text = f"{key}:"
-                value_text = f"{value}"
-                key_width = len(key_text) * font_schmol.WIDTH
-                value_width = len(value_text) * font_schmol.WIDTH
-                key_x = (screen_width - key_width) // 2
-                value_x = (screen_width - value_width) // 2
-
-                self.print_text(key_text, 
-                    key_x, 
-                    y, 
-                    color, 
-                    font=font_schmol)
-                self.print_text(value_text, 
-                    value_x, 
-                    y + font_schmol.HEIGHT + 2, 
-                    color, 
-                    font=font_schmol)
+    def repaint(self):
+        """
+        Repaint the whole screen, e.g. after a reconnect or a mode change.
+        The title and labels are restored from the static layer cache, so only
+        the values of the active page are rendered again.
+        :return: None
+        """
+        self.pages.repaint()
+
+    def restore(self, usage_dict, page):
+        """
+        Show values saved before a reset, marked stale until the next
+        print_usage.
+        :param usage_dict: A dictionary of the restored values.
+        :param page: The name of the page that was active.
+        :return: None
+        """
+        self.stale = True
+        if self.last_usage is None:
+            self.last_usage = {}
+        self.last_usage.update(usage_dict)
+        if self.pages.switch(page) < 0:
+            self.pages.repaint()
+
+    def show_page(self, name):
+        """
+        Switch to another page.
+        :param name: The page name ("overview", "cpu", "net", "disk", "log").
+        :return: The switch time in microseconds, or -1 for an unknown page.
+        """
+        return self.pages.switch(name)
 
 
 # Example usage
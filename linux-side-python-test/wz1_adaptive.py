@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# Adaptive send policy for the host agent.
+# A frame is only sent when a displayed value changed by more than its
+# threshold (or a keepalive is due), and never faster than the device can
+# draw: the minimum interval follows the render time reported in the acks
+# and backs off when acks come back slower than the send interval.
+
+import math
+import re
+
+_NUMBER = re.compile(r"\s*(-?\d+(?:\.\d+)?)")
+
+# Per-key change thresholds for the print_usage keys; percentages move in
+# steps of one, memory in tenths of a GiB
+DEFAULT_THRESHOLDS = {
+    "User": 1,
+    "System": 1,
+    "Idle": 1,
+    "RAM_USED": 0.1,
+    "OUT_OF": 0.1,
+}
+
+
+def _number(value):
+    """
+    Leading number of a value such as 47 or "4.2 GiB", or None.
+    """
+    if isinstance(value, (int, float)):
+        return value
+    m = _NUMBER.match(str(value))
+    return float(m.group(1)) if m else None
+
+
+class AdaptivePolicy:
+    """
+    Decides for one device whether a sample is worth sending.
+    """
+    def __init__(self, thresholds=None, min_interval=0.02, max_interval=2.0,
+                 keepalive=5.0, headroom=2.0):
+        """
+        thresholds: key -> change a value must exceed to be worth a redraw.
+                    Keys not listed use 0 (any change); non-numeric values
+                    are compared as they are.
+        min_interval/max_interval: bounds of the send interval in seconds.
+        keepalive: send at least this often even if nothing changed.
+        headroom: the interval is kept at least headroom times the device's
+                  parse + render time.
+        """
+        self.thresholds = DEFAULT_THRESHOLDS if thresholds is None else thresholds
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.keepalive = keepalive
+        self.headroom = headroom
+        self.interval = min_interval
+        self.render_s = None  # Smoothed device parse + render time
+        self.last_sample = None
+        self.last_time = -math.inf
+        self.sent = 0
+        self.suppressed = 0
+
+    def changed(self, sample):
+        """
+        True if any value moved beyond its threshold since the last send.
+        """
+        last = self.last_sample
+        if last is None or last.keys() != sample.keys():
+            return True
+        for key, value in sample.items():
+            old = last[key]
+            a, b = _number(value), _number(old)
+            if a is None or b is None:
+                if value != old:
+                    return True
+            elif abs(a - b) > self.thresholds.get(key, 0):
+                return True
+        return False
+
+    def should_send(self, sample, now):
+        """
+        Decide whether to send sample at time now (seconds, monotonic).
+        """
+        elapsed = now - self.last_time
+        if elapsed < self.interval:
+            self.suppressed += 1
+            return False
+        if not self.changed(sample) and elapsed < self.keepalive:
+            self.suppressed += 1
+            return False
+        self.last_sample = dict(sample)
+        self.last_time = now
+        self.sent += 1
+        return True
+
+    def on_ack(self, ack, rtt_us):
+        """
+        Adapt the interval to the reported render time and the round trip.
+        """
+        render = (ack.parse_us + ack.render_us) / 1e6
+        if self.render_s is None:
+            self.render_s = render
+        else:
+            self.render_s += (render - self.render_s) / 8
+        floor = max(self.min_interval, self.headroom * self.render_s)
+        if rtt_us / 1e6 > self.interval:
+            # Acks are slower than we send, back off
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        else:
+            self.interval = max(floor, self.interval * 0.9)
+        self.interval = min(self.max_interval, max(self.interval, floor))
+
+    def on_error(self):
+        """
+        A send failed or timed out.
+        """
+        self.interval = min(self.max_interval, self.interval * 2)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# Host metric collector producing the keys LCDPrinter.print_usage expects:
+# User, System, Idle (CPU %), RAM_USED and OUT_OF.
+# The /proc files are kept open and re-read with seek(0) into preallocated
+# buffers; CPU usage is computed from the deltas between two samples. There
+# is no process spawn and no psutil, so sampling at 50 Hz costs next to
+# nothing.
+#
+# Usage: wz1_collect.py [hz] [--send]
+
+import sys
+import time
+
+GIB = 1024 * 1024  # /proc/meminfo reports kB
+
+
+class ProcFile:
+    """
+    A /proc file kept open and re-read into a preallocated buffer.
+    """
+    def __init__(self, path, size=4096):
+        self.path = path
+        self.f = open(path, "rb", buffering=0)
+        self.buf = bytearray(size)
+
+    def read(self):
+        """
+        Re-read the file into self.buf and return the number of valid bytes.
+        """
+        while True:
+            self.f.seek(0)
+            n = self.f.readinto(self.buf)
+            if n < len(self.buf):
+                return n
+            # The file outgrew the buffer, grow it once and retry
+            self.buf = bytearray(len(self.buf) * 2)
+
+    def close(self):
+        self.f.close()
+
+
+class CpuCollector:
+    """
+    CPU time split from the aggregate "cpu" line of /proc/stat.
+    """
+    def __init__(self, path="/proc/stat"):
+        self.file = ProcFile(path)
+        self.last = None
+
+    def _times(self):
+        n = self.file.read()
+        buf = self.file.buf
+        end = buf.find(b"\n", 0, n)
+        # cpu user nice system idle iowait irq softirq steal ...
+        f = [int(v) for v in buf[:end if end >= 0 else n].split()[1:9]]
+        f += [0] * (8 - len(f))
+        user = f[0] + f[1]
+        system = f[2] + f[5] + f[6] + f[7]
+        idle = f[3] + f[4]
+        return user, system, idle
+
+    def sample(self, out):
+        """
+        Add User/System/Idle percentages since the previous sample to out.
+        The first sample reports the averages since boot.
+        """
+        now = self._times()
+        last = self.last or (0, 0, 0)
+        self.last = now
+        d = [a - b for a, b in zip(now, last)]
+        total = sum(d) or 1
+        out["User"] = f"{100 * d[0] // total}"
+        out["System"] = f"{100 * d[1] // total}"
+        out["Idle"] = f"{100 * d[2] // total}"
+
+
+class MemCollector:
+    """
+    Used and total RAM from /proc/meminfo.
+    """
+    def __init__(self, path="/proc/meminfo"):
+        self.file = ProcFile(path)
+
+    @staticmethod
+    def _field(buf, n, name):
+        start = buf.find(name, 0, n)
+        if start < 0:
+            return 0
+        end = buf.find(b"kB", start, n)
+        return int(buf[start + len(name):end])
+
+    def sample(self, out):
+        n = self.file.read()
+        buf = self.file.buf
+        total = self._field(buf, n, b"MemTotal:")
+        available = self._field(buf, n, b"MemAvailable:")
+        out["RAM_USED"] = f"{(total - available) / GIB:.1f} GiB"
+        out["OUT_OF"] = f"{total / GIB:.1f} GiB"
+
+
+class Collector:
+    """
+    Combines the individual collectors into one metrics dict.
+    """
+    def __init__(self, collectors=None):
+        self.collectors = collectors or [CpuCollector(), MemCollector()]
+
+    def sample(self):
+        out = {}
+        for c in self.collectors:
+            c.sample(out)
+        return out
+
+    def cached(self, max_age):
+        """
+        Return a source sampling at most every max_age seconds, so several
+        devices fed in the same tick share one sample (and one CPU delta).
+        """
+        state = [0.0, None]
+
+        def source():
+            now = time.monotonic()
+            if state[1] is None or now - state[0] >= max_age:
+                state[0] = now
+                state[1] = self.sample()
+            return state[1]
+        return source
+
+
+def main(argv):
+    hz = float(argv[1]) if len(argv) > 1 and not argv[1].startswith("--") else 50.0
+    collector = Collector()
+    if "--send" in argv:
+        from wz1_fanout import FanoutManager
+        from wz1_device import find_devices, WZ1Device
+        devices = [WZ1Device(dev) for dev in find_devices()]
+        from wz1_adaptive import AdaptivePolicy
+        source = collector.cached(0.5 / hz)
+        # Sample at hz, but only send what changed at a rate the panel keeps up with
+        mgr = FanoutManager(devices, lambda dev, i: source, 1.0 / hz,
+                            policy=lambda dev, i: AdaptivePolicy())
+        mgr.start()
+        try:
+            mgr.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            mgr.stop()
+        return 0
+    # Measure the sampling cost
+    n = int(hz * 2)
+    cpu0 = time.process_time()
+    for _ in range(n):
+        sample = collector.sample()
+        time.sleep(1.0 / hz)
+    cost = (time.process_time() - cpu0) / n
+    print(sample)
+    print(f"{n} samples at {hz:g} Hz, {cost * 1e6:.0f} us CPU per sample "
+          f"({cost * hz * 100:.2f}% of one core)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
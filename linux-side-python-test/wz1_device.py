@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# Helpers to find WZ1 devices and claim their interface.
+# Endpoint pairs of the WZ1 interface, in descriptor order:
+#   0: data (key:value telemetry), 1: control, 2: image upload (only on
+#   devices with tft_config.IMAGE_PIPE on)
+
+import usb.core
+import usb.util
+
+VENDOR_ID = 0x303a
+PRODUCT_ID = 0x4001
+
+DATA = 0
+CONTROL = 1
+IMAGE = 2
+
+
+class WZ1Device:
+    """
+    A claimed WZ1 interface with its OUT/IN endpoint pairs.
+    """
+    def __init__(self, dev):
+        self.dev = dev
+        intf = None
+        for cfg in dev:
+            for candidate in cfg:
+                if usb.util.get_string(dev, candidate.iInterface) == 'WZ1':
+                    # This is our interface
+                    intf = candidate
+        if intf is None:
+            raise ValueError('WZ1 interface not found')
+        self.intfn = intf.bInterfaceNumber
+        usb.util.claim_interface(dev, self.intfn)
+        eps = intf.endpoints()
+        # OUT and IN endpoints alternate: (out, in) per channel
+        self.pairs = [(eps[i], eps[i + 1]) for i in range(0, len(eps) - 1, 2)]
+
+    @property
+    def name(self):
+        return f"{self.dev.bus}-{self.dev.address}"
+
+    def _pair(self, channel):
+        if channel >= len(self.pairs):
+            raise ValueError(f"The device has no endpoint pair {channel}"
+                             + (" (image pipe disabled)" if channel == IMAGE else ""))
+        return self.pairs[channel]
+
+    def out_ep(self, channel):
+        return self._pair(channel)[0]
+
+    def in_ep(self, channel):
+        return self._pair(channel)[1]
+
+    def close(self):
+        usb.util.release_interface(self.dev, self.intfn)
+        usb.util.dispose_resources(self.dev)
+
+
+def find_devices(vendor=VENDOR_ID, product=PRODUCT_ID):
+    """
+    Return all attached WZ1 USB devices (not yet claimed).
+    """
+    return list(usb.core.find(find_all=True, idVendor=vendor, idProduct=product))
+
+
+def open_first():
+    """
+    Find and claim the first attached WZ1 device.
+    """
+    dev = usb.core.find(idVendor=VENDOR_ID, idProduct=PRODUCT_ID)
+    if dev is None:
+        raise ValueError('Device not found')
+    return WZ1Device(dev)
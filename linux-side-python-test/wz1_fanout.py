@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# Drive every attached WZ1 panel concurrently.
+# Each device gets its own worker thread and a short write queue. When a
+# panel is slow or stalled, its queue drops the oldest frame instead of
+# holding back the others, since only the newest metrics matter.
+# With --adaptive, every device gets an AdaptivePolicy deciding which samples
+# are worth a redraw and how fast that device can take them.
+#
+# Usage: wz1_fanout.py [period_s] [--adaptive]
+
+import collections
+import random
+import sys
+import threading
+import time
+
+from wz1_protocol import (send_frame, encode_usage, is_binary_reply,
+                          decode_ack, AckStats)
+
+DATA = 0  # Endpoint pair used for telemetry, see wz1_device.py
+
+
+class DeviceWorker(threading.Thread):
+    """
+    Sends queued frames to one device and collects its acks.
+    The device only needs out_ep(channel), in_ep(channel) and a name, so fake
+    devices can stand in for real ones.
+    """
+    def __init__(self, device, source, queue_len=2, timeout=1000, policy=None):
+        super().__init__(daemon=True)
+        self.device = device
+        self.source = source
+        self.policy = policy
+        self.timeout = timeout
+        self.queue = collections.deque(maxlen=queue_len)
+        self.cond = threading.Condition()
+        self.stats = AckStats()
+        self.sent = 0
+        self.superseded = 0  # Frames dropped because the device fell behind
+        self.errors = 0
+        self.last_error = None
+        self.running = True
+
+    def submit(self, payload):
+        """
+        Queue a frame; the oldest queued frame is dropped if the queue is full.
+        """
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.superseded += 1
+            self.queue.append(payload)
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def run(self):
+        epout = self.device.out_ep(DATA)
+        epin = self.device.in_ep(DATA)
+        while True:
+            with self.cond:
+                while self.running and not self.queue:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                payload = self.queue.popleft()
+            try:
+                reply, rtt = send_frame(epout, epin, payload, self.timeout)
+            except Exception as e:  # usb.core.USBError, timeouts, unplugging
+                self.errors += 1
+                self.last_error = e
+                if self.policy is not None:
+                    self.policy.on_error()
+                continue
+            self.sent += 1
+            if is_binary_reply(reply):
+                ack = decode_ack(reply)
+                self.stats.add(ack, rtt)
+                if self.policy is not None:
+                    self.policy.on_ack(ack, rtt)
+
+
+class FanoutManager:
+    """
+    Assigns a metric source to every device and feeds them all periodically.
+    """
+    def __init__(self, devices, assign, period=1.0, queue_len=2, timeout=1000,
+                 policy=None):
+        """
+        devices: device objects (see DeviceWorker).
+        assign: assign(device, index) -> source, a callable returning the
+                metrics dict to send to that device.
+        policy: optional policy(device, index) -> AdaptivePolicy; without it
+                every sample is sent.
+        """
+        self.period = period
+        self.workers = [DeviceWorker(dev, assign(dev, i), queue_len, timeout,
+                                     policy(dev, i) if policy else None)
+                        for i, dev in enumerate(devices)]
+
+    def start(self):
+        for w in self.workers:
+            w.start()
+
+    def stop(self):
+        for w in self.workers:
+            w.stop()
+        for w in self.workers:
+            w.join(timeout=2)
+
+    def tick(self):
+        """
+        Sample every source once and queue the frames.
+        """
+        now = time.monotonic()
+        for w in self.workers:
+            sample = w.source()
+            if w.policy is None or w.policy.should_send(sample, now):
+                w.submit(encode_usage(sample))
+
+    def run(self, duration=None, should_run=lambda: True):
+        """
+        Tick at the configured period until duration elapses or should_run()
+        returns False.
+        """
+        end = None if duration is None else time.monotonic() + duration
+        next_tick = time.monotonic()
+        while should_run() and (end is None or time.monotonic() < end):
+            self.tick()
+            next_tick += self.period
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def summary(self):
+        """
+        Per device statistics, keyed by device name.
+        """
+        out = {}
+        for w in self.workers:
+            s = w.stats.summary()
+            s.update(sent=w.sent, superseded=w.superseded, errors=w.errors)
+            if w.policy is not None:
+                s.update(suppressed=w.policy.suppressed,
+                         interval_s=w.policy.interval)
+            out[w.device.name] = s
+        return out
+
+
+def demo_source(device, index):
+    # Random values, one generator per device
+    rnd = random.Random(index)
+
+    def source():
+        return {
+            "User": rnd.randint(45, 55),
+            "System": rnd.randint(17, 23),
+            "Idle": rnd.randint(8, 12),
+            "RAM_USED": f"{rnd.randint(4, 16)} GiB",
+            "OUT_OF": "16 GiB",
+        }
+    return source
+
+
+def main(argv):
+    import signal
+    from wz1_device import find_devices, WZ1Device
+
+    args = [a for a in argv[1:] if not a.startswith("--")]
+    period = float(args[0]) if args else 1.0
+    devices = [WZ1Device(dev) for dev in find_devices()]
+    if not devices:
+        raise ValueError('Device not found')
+    print(f"Driving {len(devices)} device(s): {[d.name for d in devices]}")
+    running = [True]
+    signal.signal(signal.SIGINT, lambda sig, frame: running.__setitem__(0, False))
+    policy = None
+    if "--adaptive" in argv:
+        from wz1_adaptive import AdaptivePolicy
+        policy = lambda dev, i: AdaptivePolicy()
+    mgr = FanoutManager(devices, demo_source, period, policy=policy)
+    mgr.start()
+    try:
+        mgr.run(should_run=lambda: running[0])
+    finally:
+        mgr.stop()
+        for name, s in mgr.summary().items():
+            print(name, s)
+        for d in devices:
+            d.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
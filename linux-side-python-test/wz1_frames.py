@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# Delta-compressed screen updates for the WZ1 display.
+# Frames are compared with the previous frame tile by tile, changed tiles are
+# merged into horizontal spans and each span is sent as the smallest of a
+# FILL, RLE or RAW rectangle. Must be kept in sync with image_stream.py.
+#
+# Usage: wz1_frames.py --bench   (compression-ratio benchmark, no device needed)
+
+import random
+import struct
+import sys
+
+from wz1_image import rle_encode, rgb565, ENC_RAW, ENC_RLE
+
+MAGIC_FRAME = b"FRM0"
+RECT_FORMAT = "<HHHHB"
+ENC_FILL = 2
+
+
+def _rect_bytes(frame, width, x, y, w, h):
+    stride = width * 2
+    return b"".join(frame[(y + r) * stride + x * 2:(y + r) * stride + (x + w) * 2]
+                    for r in range(h))
+
+
+def encode_rect(data, x, y, w, h):
+    """
+    Encode one rectangle of RGB565 bytes with the smallest encoding.
+    """
+    if data == data[:2] * (w * h):
+        return struct.pack(RECT_FORMAT, x, y, w, h, ENC_FILL) + data[:2]
+    packed = rle_encode(data)
+    if len(packed) < len(data):
+        return struct.pack(RECT_FORMAT, x, y, w, h, ENC_RLE) + packed
+    return struct.pack(RECT_FORMAT, x, y, w, h, ENC_RAW) + data
+
+
+class FrameEncoder:
+    """
+    Keeps the last frame sent to one display and encodes the next frame as
+    the rectangles that changed.
+    """
+    def __init__(self, width=240, height=320, tile=16):
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.previous = None
+
+    def changed_rects(self, frame):
+        """
+        Return (x, y, w, h) spans of changed tiles, merged along each tile row.
+        """
+        if self.previous is None:
+            return [(0, 0, self.width, self.height)]
+        rects = []
+        t = self.tile
+        stride = self.width * 2
+        prev = self.previous
+        for ty in range(0, self.height, t):
+            th = min(t, self.height - ty)
+            start = None
+            for tx in range(0, self.width + t, t):
+                dirty = False
+                if tx < self.width:
+                    tw = min(t, self.width - tx)
+                    for r in range(ty, ty + th):
+                        a = r * stride + tx * 2
+                        if frame[a:a + tw * 2] != prev[a:a + tw * 2]:
+                            dirty = True
+                            break
+                if dirty and start is None:
+                    start = tx
+                elif not dirty and start is not None:
+                    rects.append((start, ty, min(tx, self.width) - start, th))
+                    start = None
+        return rects
+
+    def encode(self, frame):
+        """
+        Encode a full RGB565 frame (width * height * 2 bytes) as a FRM0 update
+        relative to the previous frame. Returns b"" if nothing changed.
+        """
+        frame = bytes(frame)
+        rects = self.changed_rects(frame)
+        self.previous = frame
+        if not rects:
+            return b""
+        out = bytearray(MAGIC_FRAME + struct.pack("<H", len(rects)))
+        for x, y, w, h in rects:
+            out += encode_rect(_rect_bytes(frame, self.width, x, y, w, h), x, y, w, h)
+        return bytes(out)
+
+    def reset(self):
+        """
+        Forget the previous frame, e.g. after the device reconnected.
+        """
+        self.previous = None
+
+
+def _dashboard(width, height, values, seed=0):
+    # A synthetic dashboard: flat background, title bar, bars and some noise
+    # standing in for text
+    rnd = random.Random(seed)
+    bg = struct.pack(">H", rgb565(0, 0, 0))
+    frame = bytearray(bg * (width * height))
+    colors = [rgb565(255, 0, 0), rgb565(0, 255, 0), rgb565(0, 0, 255),
+              rgb565(255, 255, 0)]
+
+    def fill(x, y, w, h, color):
+        px = struct.pack(">H", color)
+        for r in range(y, y + h):
+            frame[(r * width + x) * 2:(r * width + x + w) * 2] = px * w
+
+    fill(0, 0, width, 40, rgb565(40, 40, 120))
+    for i, v in enumerate(values):
+        y = 60 + i * 50
+        fill(10, y, max(1, (width - 20) * v // 100), 20, colors[i % len(colors)])
+        # "Text" next to the bar
+        for _ in range(40):
+            x = rnd.randrange(10, 90)
+            fill(x, y + 25, 2, 2, rgb565(255, 255, 255))
+    return bytes(frame)
+
+
+def bench(width=240, height=320, frames=50):
+    """
+    Print the compression ratio of full and delta updates on synthetic
+    dashboards, compared with sending raw pixels.
+    """
+    rnd = random.Random(1)
+    enc = FrameEncoder(width, height)
+    values = [50, 20, 30, 70]
+    raw_bytes = sent_bytes = 0
+    first = None
+    for n in range(frames):
+        values = [max(0, min(100, v + rnd.randint(-3, 3))) for v in values]
+        # The "text" only changes every few frames
+        frame = _dashboard(width, height, values, seed=n // 5)
+        update = enc.encode(frame)
+        if first is None:
+            first = len(update)
+        raw_bytes += len(frame)
+        sent_bytes += len(update)
+    full = width * height * 2
+    print(f"first frame: {full} raw -> {first} bytes ({full / first:.1f}x)")
+    print(f"{frames} frames: {raw_bytes} raw -> {sent_bytes} bytes "
+          f"({raw_bytes / max(sent_bytes, 1):.1f}x)")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        bench()
+    else:
+        print("Usage: wz1_frames.py --bench")
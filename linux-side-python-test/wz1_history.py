@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# Read the telemetry history kept on a WZ1 device.
+# The device samples every value once a second and keeps 1 s samples and
+# 10 s and 1 min min/max/avg rollups (the last minute, ten minutes, hour),
+# also across host reconnects.
+#
+# Usage: wz1_history.py key [key ...] [--period 60]
+#   e.g. wz1_history.py User System --period 10
+
+import sys
+
+from wz1_device import open_first, CONTROL
+from wz1_protocol import (encode_history, decode_history, is_binary_reply,
+                          HIST_HEADER_SIZE, HIST_ENTRY_SIZE, HIST_PERIODS)
+
+_BARS = " .:-=+*#%@"
+
+
+def sparkline(values):
+    """
+    One character per value, scaled between the smallest and largest;
+    missing values are blank.
+    """
+    known = [v for v in values if v is not None]
+    if not known:
+        return ""
+    lo, hi = min(known), max(known)
+    span = (hi - lo) or 1
+    return "".join(" " if v is None else
+                   _BARS[1 + int((v - lo) * (len(_BARS) - 2) / span)]
+                   for v in values)
+
+
+def fetch_history(dev, key, period=60, timeout=1000):
+    dev.out_ep(CONTROL).write(encode_history(key, period), timeout)
+    reply = dev.in_ep(CONTROL).read(HIST_HEADER_SIZE + 4096 * HIST_ENTRY_SIZE,
+                                    timeout)
+    if not is_binary_reply(reply):
+        raise ValueError(bytes(reply).decode(errors="replace"))
+    return decode_history(reply)
+
+
+def main(argv):
+    args = [a for a in argv[1:] if not a.startswith("--")]
+    period = 60
+    if "--period" in argv:
+        period = int(argv[argv.index("--period") + 1])
+        args.remove(argv[argv.index("--period") + 1])
+    if not args or period not in HIST_PERIODS:
+        print("Usage: wz1_history.py key [key ...] [--period 1|10|60]")
+        return 1
+    dev = open_first()
+    try:
+        for key in args:
+            try:
+                period, open_s, buckets = fetch_history(dev, key, period)
+            except ValueError as e:
+                print(f"{key}: {e}")
+                continue
+            known = [b for b in buckets if b is not None]
+            print(f"{key}: {len(buckets)} x {period} s, newest ended "
+                  f"{open_s} s ago")
+            if known:
+                print(f"  min {min(b[0] for b in known):g} "
+                      f"max {max(b[1] for b in known):g} "
+                      f"avg {sum(b[2] for b in known) / len(known):g}")
+            print(f"  |{sparkline([b and b[2] for b in buckets])}|")
+    finally:
+        dev.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -12,6 +12,8 @@ import usb.util
 import struct
 import time
 import signal
+import sys
+from wz1_protocol import send_frame, is_binary_reply, decode_ack, AckStats
 
 # Globals are kept in a single variable 
 # That trick enables accessing them from 
@@ -64,7 +66,13 @@ epout2=glb.eps[2]
 # epout.write(b"CPU:30;RAM:20;DISK:10")
 # res=epin.read(1000)
 # print(res.tobytes())
-epout2.write(b"CPU:40;RAM:50;DISK:30")
-res=epin2.read(1000)
-print(res.tobytes())
+stats = AckStats()
+res, rtt = send_frame(epout2, epin2, b"CPU:40;RAM:50;DISK:30")
+if is_binary_reply(res):
+    ack = decode_ack(res)
+    stats.add(ack, rtt)
+    print(ack)
+    print(stats.summary())
+else:
+    print(res)
 
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# Push images to the WZ1 display over the bulk image pipe.
+# Must be kept in sync with image_stream.py on the device.
+#
+# Usage: wz1_image.py picture.png [x y] [--raw]
+
+import struct
+import sys
+
+MAGIC_IMAGE = b"IMG0"
+HEADER_FORMAT = "<4sHHHHB"
+
+ENC_RAW = 0
+ENC_RLE = 1
+
+MAX_RUN = 0xFFFF
+
+
+def rgb565(r, g, b):
+    """
+    Convert 8 bit red, green and blue into a 16-bit 565 colour.
+    """
+    return (r & 0xF8) << 8 | (g & 0xFC) << 3 | b >> 3
+
+
+def pixels_to_rgb565(pixels, swap=False):
+    """
+    Convert an iterable of (r, g, b[, a]) tuples into RGB565 bytes.
+    The panel takes big endian pixels unless the driver needs a swap.
+    """
+    out = bytearray()
+    fmt = "<H" if swap else ">H"
+    for p in pixels:
+        out += struct.pack(fmt, rgb565(p[0], p[1], p[2]))
+    return bytes(out)
+
+
+def png_to_rgb565(path, size=None, swap=False):
+    """
+    Load a PNG (or any image Pillow can read) and convert it to RGB565.
+    Returns (data, width, height).
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError("Pillow is required to convert images: pip install Pillow")
+    img = Image.open(path).convert("RGB")
+    if size is not None:
+        img = img.resize(size)
+    width, height = img.size
+    return pixels_to_rgb565(img.getdata(), swap), width, height
+
+
+def rle_encode(data):
+    """
+    Run-length encode RGB565 pixel bytes into count (u16 little endian) +
+    pixel (2 bytes, unchanged byte order) records.
+    """
+    out = bytearray()
+    n = len(data) - len(data) % 2
+    i = 0
+    while i < n:
+        pixel = data[i:i + 2]
+        j = i + 2
+        while j < n and data[j:j + 2] == pixel and (j - i) // 2 < MAX_RUN:
+            j += 2
+        out += struct.pack("<H", (j - i) // 2)
+        out += pixel
+        i = j
+    return bytes(out)
+
+
+def image_header(x, y, width, height, enc=ENC_RAW):
+    return struct.pack(HEADER_FORMAT, MAGIC_IMAGE, x, y, width, height, enc)
+
+
+def encode_image(data, x, y, width, height, rle=True):
+    """
+    Build the complete stream for one image, picking RLE only when it is
+    actually smaller than the raw pixels.
+    """
+    if rle:
+        packed = rle_encode(data)
+        if len(packed) < len(data):
+            return image_header(x, y, width, height, ENC_RLE) + packed
+    return image_header(x, y, width, height, ENC_RAW) + data
+
+
+def send_image(epout, epin, stream, chunk=4096, timeout=5000):
+    """
+    Write an encoded image stream and wait for the device ack.
+    """
+    for i in range(0, len(stream), chunk):
+        epout.write(stream[i:i + chunk], timeout)
+    return epin.read(64, timeout).tobytes()
+
+
+def main(argv):
+    from wz1_device import open_first, IMAGE
+    from wz1_protocol import decode_ack
+
+    args = [a for a in argv[1:] if not a.startswith("--")]
+    if not args:
+        print("Usage: wz1_image.py picture.png [x y] [--raw]")
+        return 1
+    x, y = (int(args[1]), int(args[2])) if len(args) >= 3 else (0, 0)
+    data, width, height = png_to_rgb565(args[0])
+    stream = encode_image(data, x, y, width, height, rle="--raw" not in argv)
+    print(f"{width}x{height}: {len(data)} raw bytes, {len(stream)} sent")
+    dev = open_first()
+    try:
+        reply = send_image(dev.out_ep(IMAGE), dev.in_ep(IMAGE), stream)
+        print(decode_ack(reply))
+    finally:
+        dev.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
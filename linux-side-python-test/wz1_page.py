@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# Switch the page shown by a WZ1 device and report the switch latency.
+#
+# Usage: wz1_page.py page [page ...]
+#   e.g. wz1_page.py cpu overview log
+
+import sys
+
+from wz1_device import open_first, CONTROL
+from wz1_protocol import send_frame, encode_page, decode_ack, STATUS_OK
+
+
+def main(argv):
+    if len(argv) < 2:
+        print("Usage: wz1_page.py page [page ...]")
+        print("Pages: overview, cpu, net, disk, log")
+        return 1
+    dev = open_first()
+    try:
+        for name in argv[1:]:
+            reply, rtt = send_frame(dev.out_ep(CONTROL), dev.in_ep(CONTROL),
+                                    encode_page(name))
+            ack = decode_ack(reply)
+            if ack.status != STATUS_OK:
+                print(f"{name}: unknown page")
+                continue
+            print(f"{name}: switched in {ack.render_us} us (round trip {rtt} us)")
+    finally:
+        dev.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# Host side of the WZ1 binary reply format.
+# Must be kept in sync with protocol.py on the device.
+
+import struct
+import time
+
+REPLY_ACK = 0x81
+
+STATUS_OK = 0
+STATUS_BAD_FORMAT = 1
+STATUS_ERROR = 2  # The device failed handling the frame and dropped it
+
+# type, status, seq, parse_us, render_us, dropped, free_heap
+ACK_FORMAT = "<BBHHIHI"
+ACK_SIZE = struct.calcsize(ACK_FORMAT)
+
+# Trace dump, see tracer.py on the device
+REPLY_TRACE = 0x82
+TRACE_HEADER = "<BBHH"  # type, reserved, count, entry size
+TRACE_HEADER_SIZE = struct.calcsize(TRACE_HEADER)
+TRACE_ENTRY = "<HBBI"  # seq, stage, channel, ticks_us
+TRACE_ENTRY_SIZE = struct.calcsize(TRACE_ENTRY)
+# MicroPython's ticks_us wraps at 2**30 on the ESP32
+TICKS_PERIOD = 1 << 30
+STAGE_NAMES = {1: "rx", 2: "sched", 3: "parsed", 4: "spi", 5: "drawn",
+               6: "ack"}
+
+# History dump, see history.py on the device
+REPLY_HIST = 0x83
+# type, reserved, count, seconds per bucket, seconds into the open bucket
+HIST_HEADER = "<BBHHH"
+HIST_HEADER_SIZE = struct.calcsize(HIST_HEADER)
+HIST_ENTRY = "<iii"  # min, max, avg in hundredths
+HIST_ENTRY_SIZE = struct.calcsize(HIST_ENTRY)
+NO_HISTORY = -0x40000000  # Value of buckets without data
+HIST_PERIODS = (1, 10, 60)
+
+
+class Ack:
+    """
+    A decoded ack reply.
+    """
+    __slots__ = ("status", "seq", "parse_us", "render_us", "dropped", "free_heap")
+
+    def __init__(self, status, seq, parse_us, render_us, dropped, free_heap):
+        self.status = status
+        self.seq = seq
+        self.parse_us = parse_us
+        self.render_us = render_us
+        self.dropped = dropped
+        self.free_heap = free_heap
+
+    def __repr__(self):
+        return (f"Ack(status={self.status}, seq={self.seq}, "
+                f"parse_us={self.parse_us}, render_us={self.render_us}, "
+                f"dropped={self.dropped}, free_heap={self.free_heap})")
+
+
+def is_binary_reply(data):
+    """
+    Binary replies start with a byte outside the ASCII range.
+    """
+    return len(data) > 0 and data[0] >= 0x80
+
+
+def decode_ack(data):
+    """
+    Decode an ack reply. Raises ValueError if data is not an ack.
+    """
+    if len(data) < ACK_SIZE or data[0] != REPLY_ACK:
+        raise ValueError(f"Not an ack reply: {bytes(data)!r}")
+    _, status, seq, parse_us, render_us, dropped, free_heap = struct.unpack_from(
+        ACK_FORMAT, bytes(data))
+    return Ack(status, seq, parse_us, render_us, dropped, free_heap)
+
+
+def decode_trace(data):
+    """
+    Decode a trace dump into a list of (seq, stage, channel, ticks_us)
+    tuples, oldest first. Raises ValueError if data is not a trace dump.
+    """
+    data = bytes(data)
+    if len(data) < TRACE_HEADER_SIZE or data[0] != REPLY_TRACE:
+        raise ValueError(f"Not a trace dump: {data[:16]!r}")
+    _, _, count, size = struct.unpack_from(TRACE_HEADER, data)
+    return [struct.unpack_from(TRACE_ENTRY, data, TRACE_HEADER_SIZE + i * size)
+            for i in range(count)]
+
+
+def decode_history(data):
+    """
+    Decode a history dump. Returns (seconds per bucket, seconds into the open
+    bucket, buckets), the buckets oldest first as (min, max, avg) tuples of
+    floats, or None where there was no data. Raises ValueError if data is not
+    a history dump.
+    """
+    data = bytes(data)
+    if len(data) < HIST_HEADER_SIZE or data[0] != REPLY_HIST:
+        raise ValueError(f"Not a history dump: {data[:32]!r}")
+    _, _, count, period, open_s = struct.unpack_from(HIST_HEADER, data)
+    buckets = []
+    for i in range(count):
+        entry = struct.unpack_from(HIST_ENTRY, data,
+                                   HIST_HEADER_SIZE + i * HIST_ENTRY_SIZE)
+        if entry[2] == NO_HISTORY:
+            buckets.append(None)
+        else:
+            buckets.append(tuple(v / 100 for v in entry))
+    return period, open_s, buckets
+
+
+class AckStats:
+    """
+    Aggregates acks and the host-measured round trip time of each frame.
+    """
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.lost = 0
+        self.last_seq = None
+        self.dropped = 0
+        self.min_free_heap = None
+        self.parse_us = 0
+        self.render_us = 0
+        self.rtt_us = []
+
+    def add(self, ack, rtt_us=None):
+        """
+        Account one ack. rtt_us is the host-side send to reply time.
+        """
+        self.count += 1
+        if ack.status != STATUS_OK:
+            self.errors += 1
+        if self.last_seq is not None:
+            # Sequence numbers are 16 bit and wrap
+            self.lost += (ack.seq - self.last_seq - 1) & 0xFFFF
+        self.last_seq = ack.seq
+        self.dropped = ack.dropped
+        if self.min_free_heap is None or ack.free_heap < self.min_free_heap:
+            self.min_free_heap = ack.free_heap
+        self.parse_us += ack.parse_us
+        self.render_us += ack.render_us
+        if rtt_us is not None:
+            self.rtt_us.append(rtt_us)
+
+    def summary(self):
+        """
+        Return the aggregated values as a dict.
+        """
+        n = max(self.count, 1)
+        rtt = sorted(self.rtt_us)
+        out = {
+            "acks": self.count,
+            "errors": self.errors,
+            "lost": self.lost,
+            "dropped": self.dropped,
+            "min_free_heap": self.min_free_heap,
+            "avg_parse_us": self.parse_us / n,
+            "avg_render_us": self.render_us / n,
+        }
+        if rtt:
+            out["rtt_min_us"] = rtt[0]
+            out["rtt_p50_us"] = rtt[len(rtt) // 2]
+            out["rtt_p99_us"] = rtt[min(len(rtt) - 1, len(rtt) * 99 // 100)]
+            out["rtt_max_us"] = rtt[-1]
+        return out
+
+
+def send_frame(epout, epin, payload, timeout=1000):
+    """
+    Send one frame and wait for its reply.
+    Returns (reply bytes, round trip time in microseconds).
+    """
+    start = time.perf_counter_ns()
+    epout.write(payload, timeout)
+    reply = epin.read(1000, timeout)
+    return reply.tobytes(), (time.perf_counter_ns() - start) // 1000
+
+
+def encode_usage(usage):
+    """
+    Encode a metrics dict in the device's "key:value;..." text format.
+    """
+    return ";".join(f"{k}:{v}" for k, v in usage.items()).encode()
+
+
+def encode_page(name):
+    """
+    Encode the control command switching the page shown by the device.
+    Pages: overview, cpu, net, disk, log. The ack's render_us is the time the
+    switch took; an unknown page is answered with STATUS_BAD_FORMAT.
+    """
+    return f"PAGE:{name}".encode()
+
+
+def encode_history(key, period=60):
+    """
+    Encode the control command reading the device's history of one key.
+    period is the resolution in seconds per bucket, one of HIST_PERIODS.
+    The reply is a history dump, or a text error for an unknown key.
+    """
+    return f"HIST:{key}:{period}".encode()
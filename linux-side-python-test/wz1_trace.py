@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# Per-stage latency histograms of the telemetry path.
+# Sends frames on the data channel, timing the host side stages (encode,
+# USB OUT write, round trip), and regularly fetches the device's trace ring
+# ("TRACE" on the control channel) to reconstruct the device side stages of
+# every frame: USB OUT completion -> scheduled handler -> parsed -> layout
+# and SPI flushes -> ack queued.
+# The device must run with tracing enabled, e.g. WZab1Interface(trace=256).
+#
+# Usage: wz1_trace.py [frames] [--batch 4]
+
+import collections
+import sys
+import time
+
+from wz1_device import open_first, DATA, CONTROL
+from wz1_protocol import (encode_usage, decode_trace, is_binary_reply,
+                          TRACE_HEADER_SIZE, TRACE_ENTRY_SIZE, TICKS_PERIOD,
+                          STAGE_NAMES)
+
+# Device stage pairs reported as latencies
+SEGMENTS = (
+    ("usb->sched", "rx", "sched"),
+    ("parse", "sched", "parsed"),
+    ("layout+spi", "parsed", "drawn"),
+    ("ack", "drawn", "ack"),
+    ("device total", "rx", "ack"),
+)
+
+
+def frames_from_trace(entries):
+    """
+    Group trace entries by (channel, seq).
+    Returns {(channel, seq): {stage name: first ticks_us, "spi": [ticks...]}}.
+    """
+    frames = collections.OrderedDict()
+    for seq, stage, chan, ticks in entries:
+        frame = frames.setdefault((chan, seq), {"spi": []})
+        name = STAGE_NAMES.get(stage, str(stage))
+        if name == "spi":
+            frame["spi"].append(ticks)
+        else:
+            frame.setdefault(name, ticks)
+    return frames
+
+
+def histogram(name, values, width=40):
+    """
+    Print a log2 bucketed histogram of microsecond values.
+    """
+    if not values:
+        return
+    values = sorted(values)
+    print(f"{name}: n={len(values)} min={values[0]} "
+          f"p50={values[len(values) // 2]} "
+          f"p99={values[min(len(values) - 1, len(values) * 99 // 100)]} "
+          f"max={values[-1]} us")
+    buckets = collections.Counter(max(0, v).bit_length() for v in values)
+    peak = max(buckets.values())
+    for b in range(min(buckets), max(buckets) + 1):
+        lo = 0 if b == 0 else 1 << (b - 1)
+        n = buckets.get(b, 0)
+        print(f"  {lo:>9} us {n:>6} {'#' * (n * width // peak)}")
+
+
+def latencies(frames, channel=DATA):
+    """
+    Device side latencies per segment, plus SPI flushes per frame.
+    """
+    out = {name: [] for name, _, _ in SEGMENTS}
+    out["spi flushes"] = []
+    for (chan, _), frame in frames.items():
+        if chan != channel or "rx" not in frame:
+            continue  # Frames whose start was overwritten in the ring
+        for name, a, b in SEGMENTS:
+            if a in frame and b in frame:
+                out[name].append((frame[b] - frame[a]) % TICKS_PERIOD)
+        out["spi flushes"].append(len(frame["spi"]))
+    return out
+
+
+def fetch_trace(dev, timeout=1000):
+    dev.out_ep(CONTROL).write(b"TRACE", timeout)
+    reply = dev.in_ep(CONTROL).read(TRACE_HEADER_SIZE + 4096 * TRACE_ENTRY_SIZE,
+                                    timeout)
+    if not is_binary_reply(reply):
+        raise ValueError(bytes(reply).decode(errors="replace"))
+    return decode_trace(reply)
+
+
+def main(argv):
+    args = [a for a in argv[1:] if not a.startswith("--")]
+    batch = 4
+    if "--batch" in argv:
+        batch = int(argv[argv.index("--batch") + 1])
+        args.remove(argv[argv.index("--batch") + 1])
+    count = int(args[0]) if args else 200
+    dev = open_first()
+    host = {"encode": [], "usb write": [], "round trip": []}
+    entries = []
+    try:
+        fetch_trace(dev)  # Start from an empty ring
+        epout, epin = dev.out_ep(DATA), dev.in_ep(DATA)
+        for i in range(count):
+            t0 = time.perf_counter_ns()
+            payload = encode_usage({"User": i % 100, "System": (i * 7) % 100,
+                                    "Idle": (i * 3) % 100})
+            t1 = time.perf_counter_ns()
+            epout.write(payload, 1000)
+            t2 = time.perf_counter_ns()
+            epin.read(1000, 1000)
+            t3 = time.perf_counter_ns()
+            host["encode"].append((t1 - t0) // 1000)
+            host["usb write"].append((t2 - t1) // 1000)
+            host["round trip"].append((t3 - t1) // 1000)
+            if (i + 1) % batch == 0 or i == count - 1:
+                # Fetch before the ring wraps
+                entries += fetch_trace(dev)
+    finally:
+        dev.close()
+    print("Host side")
+    for name, values in host.items():
+        histogram(name, values)
+    print("Device side")
+    for name, values in latencies(frames_from_trace(entries)).items():
+        histogram(name, values)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -6,15 +6,45 @@
 # Modified by Piotr Baprawski and Piotr Polnau for SWIS25L Project.
 
 from micropython import schedule
-from usb.device.core import Interface, Buffer
+from usb.device.core import Interface
+from channel import Channel
 from lcd_printer import LCDPrinter
+from image_stream import ImageStream
+from parser import UsageParser
+from history import History
+from snapshot import Snapshot
+from supervisor import Supervisor
+from protocol import (pack_ack, ACK_SIZE, STATUS_OK, STATUS_BAD_FORMAT,
+                      STATUS_ERROR)
+from tracer import STAGE_PARSED, STAGE_DRAWN
+from time import ticks_us, ticks_ms, ticks_diff
+from gc import mem_free
+from machine import idle, WDT
+import touch
 import usb.device
 
 
 
-_EP_IN_FLAG = const(1 << 7)
 NUM_ITFS = const(1)
-NUM_EPS = const(4)  # 4 endpoints (2 IN and 2 OUT)
+
+# Default buffer layout of the channels, in endpoint order. Every entry can be
+# overridden per channel through the config argument of WZab1Interface, e.g.
+# WZab1Interface({"data": {"rxlen": 512, "xfer_len": 128}}).
+#   rxlen/txlen: RX/TX buffer sizes in bytes
+#   mps: max packet size in the endpoint descriptors
+#   xfer_len: max OUT transfer length, None for all free RX space
+CHANNEL_CONFIG = (
+    ("data", {"rxlen": 3000, "txlen": 3000, "mps": 64, "xfer_len": None}),
+    ("control", {"rxlen": 3000, "txlen": 3000, "mps": 64, "xfer_len": None}),
+    # Acks are the only thing sent back on the image pipe
+    ("image", {"rxlen": 4096, "txlen": 256, "mps": 64, "xfer_len": None}),
+)
+
+# Channels only declared when the config argument names them, e.g.
+# WZab1Interface({"image": {}}). With the builtin CDC driver a third endpoint
+# pair exceeds the IN endpoints the ESP32-S3 OTG controller can have active,
+# so the image pipe stays off until enumeration was checked on the board.
+OPTIONAL_CHANNELS = ("image",)
 
 
 class WZab1Interface(Interface):
@@ -22,133 +52,269 @@ class WZab1Interface(Interface):
     Base class to implement a USB WZab1 device in Python.
     This class handles USB transfers and provides a simple interface for
     sending and receiving data over USB.
+    Every bulk endpoint pair is a Channel; the data and control channels are
+    always present (endpoint pairs 0 and 1), more can be added with
+    add_channel before the USB device is initialised. Opted in through
+    config, endpoint pair 2 is the bulk image and compressed screen-update
+    pipe, streamed straight into the display.
     """
-    def __init__(self,rxlen=3000, txlen=3000):
+    def __init__(self, config=None, instrument=False, trace=0, history=True,
+                 snapshot="/snap"):
         super().__init__()
-        self.ep_out = None # RX direction (host to device)
-        self.ep_in = None # TX direction (device to host)
-        self.ep_c_out = None # RX direction (host to device)
-        self.ep_c_in = None # TX direction (device to host)
-        self._rx = Buffer(rxlen)
-        self._tx = Buffer(txlen)
-        self._rx_c = Buffer(rxlen)
-        self._tx_c = Buffer(txlen)
+        self.channels = []
+        handlers = {"data": self._on_data, "control": self._on_control,
+                    "image": self._on_image}
+        for name, defaults in CHANNEL_CONFIG:
+            if name in OPTIONAL_CHANNELS and not (config and name in config):
+                setattr(self, name, None)
+                continue
+            cfg = dict(defaults)
+            if config and name in config:
+                cfg.update(config[name])
+            setattr(self, name, self.add_channel(name, handlers[name], **cfg))
         self.lcd_printer = LCDPrinter()
-    
-    def _tx_xfer(self):
-        # Keep an active IN transfer to send data to the host, whenever
-        # there is data to send.
-        if self.is_open() and not self.xfer_pending(self.ep_in) and self._tx.readable():
-            self.submit_xfer(self.ep_in, self._tx.pend_read(), self._tx_cb)
-
-    def _tx_cb(self, ep, res, num_bytes):
-        #print(num_bytes,self._tx._n)
-        if res == 0:
-            self._tx.finish_read(num_bytes)
-        self._tx_xfer()
-
-    def _rx_xfer(self):
-        # Keep an active OUT transfer to receive messages from the host
-        if self.is_open() and not self.xfer_pending(self.ep_out) and self._rx.writable():
-            self.submit_xfer(self.ep_out, self._rx.pend_write(), self._rx_cb)
-
-    def _rx_cb(self, ep, res, num_bytes):
-        #print("rx:"+str(num_bytes)+"\n")
-        if res == 0:
-            self._rx.finish_write(num_bytes)
-            schedule(self._on_rx, ep)
-        self._rx_xfer()
-
-    def _tx_c_xfer(self):
-        # Keep an active IN transfer to send data to the host, whenever
-        # there is data to send.
-        if self.is_open() and not self.xfer_pending(self.ep_c_in) and self._tx_c.readable():
-            self.submit_xfer(self.ep_c_in, self._tx_c.pend_read(), self._tx_c_cb)
-
-    def _tx_c_cb(self, ep, res, num_bytes):
-        #print(num_bytes,self._tx_c._n)
-        if res == 0:
-            self._tx_c.finish_read(num_bytes)
-        self._tx_c_xfer()
-
-    def _rx_c_xfer(self):
-        # Keep an active OUT transfer to receive messages from the host
-        if self.is_open() and not self.xfer_pending(self.ep_c_out) and self._rx_c.writable():
-            self.submit_xfer(self.ep_c_out, self._rx_c.pend_write(), self._rx_c_cb)
-
-    def _rx_c_cb(self, ep, res, num_bytes):
-        # Same here
-        if res == 0:
-            self._rx_c.finish_write(num_bytes)
-            schedule(self._on_rx_c, ep)
-        self._rx_c_xfer()
-   
-    def _on_rx(self, ep):
-        # Receive received data. Called via micropython.schedule, outside of the USB callback function.
-        m = self._rx.pend_read()
-        dt = bytes(m)        
-        self._rx.finish_read(len(m))
-
-        # Extract the data and print it on the LCD
+        self.image_stream = None
+        if self.image is not None:
+            self.image_stream = ImageStream(self.lcd_printer.tft,
+                                            self._on_image_done)
+        # Values of the keys shown by the pages are kept in interned slots
+        self.parser = UsageParser(self.lcd_printer.pages.slot_keys())
+        # Values of the slots sampled every second, read with "HIST:..."
+        self.history = None
+        if history:
+            try:
+                self.history = History(self.parser.keys, self.parser.numbers)
+            except MemoryError:
+                pass
+        # The shown values are saved to flash and restored after a reset
+        self.snapshot = None
+        if snapshot:
+            self.snapshot = Snapshot(self.lcd_printer, self.parser.keys,
+                                     snapshot)
+            self._restore()
+        # Reply state: the number of frames that were not rendered and
+        # a reusable buffer for the binary ack
+        self.dropped = 0
+        self._ack = bytearray(ACK_SIZE)
+        # Every handler runs under the supervisor, which catches failures and
+        # restarts stuck transfers; it feeds a watchdog once one is set
+        self.supervisor = Supervisor(self.channels, on_error=self._on_error)
+        for ch in self.channels:
+            ch.supervisor = self.supervisor
+        self.instrument = None
+        # Optional power.IdleManager, woken by every received packet
+        self.idle = None
+        self._touch_scheduled = False
+        if instrument:
+            self._instrument()
+        self.tracer = None
+        if trace:
+            self._trace(trace)
+
+    def add_channel(self, name, handler, rxlen=3000, txlen=3000, priority=0,
+                    mps=64, xfer_len=None):
+        """
+        Declare another endpoint pair. Endpoints are numbered in the order
+        the channels were added.
+        :param name: The channel role.
+        :param handler: Called with the channel whenever data was received.
+        :param rxlen: Size of the RX buffer in bytes.
+        :param txlen: Size of the TX buffer in bytes.
+        :param priority: Higher priority channels are kicked off first.
+        :param mps: Max packet size of the endpoints.
+        :param xfer_len: Max OUT transfer length (see Channel).
+        :return: The new Channel.
+        """
+        ch = Channel(name, handler, rxlen, txlen, priority, mps, xfer_len)
+        self.channels.append(ch)
+        return ch
+
+    def _instrument(self):
+        # Opt-in: wrap the USB and display hot paths to collect heap/timing stats.
+        # Imported lazily so the module costs nothing when instrumentation is off.
+        from instrument import Instrument
+        self.instrument = Instrument()
+        for ch in self.channels:
+            self.instrument.wrap(ch, "handler", f"usb.{ch.name}")
+        self.instrument.wrap_all(self.lcd_printer, ("print_usage",), "lcd")
+        self.instrument.wrap_all(self.lcd_printer.tft,
+            ("_text8", "_text16", "fill_rect", "blit_buffer"), "tft")
+        self.instrument.gauge("pool", self.lcd_printer.tft.pool.stats)
+        self.instrument.gauge("supervisor", self.supervisor.stats)
+        self.instrument.gauge("pages", self.lcd_printer.pages.stats)
+        if self.lcd_printer.compositor is not None:
+            self.instrument.gauge("compose", self.lcd_printer.compositor.stats)
+
+    def _trace(self, size):
+        # Opt-in: record per-stage trace points of every frame in a ring of
+        # size entries, dumped with the "TRACE" control command
+        from tracer import Tracer
+        self.tracer = Tracer(size)
+        for i, ch in enumerate(self.channels):
+            ch.trace = self.tracer
+            ch.trace_id = i
+        self.tracer.wrap_write(self.lcd_printer.tft)
+
+    def _handle_usage(self, buf, seq):
+        # Parse a "key:value;..." frame in place, print what changed on the
+        # LCD and build the reply
+        start = ticks_us()
         try:
-            parts = dt.decode('utf-8').split(';')
-            usage_dict = {}
-            for part in parts:
-                part = part.strip()
-                key, value = part.split(':')
-                key = key.strip()
-                value = value.strip()
-                usage_dict[key] = value
-            self.lcd_printer.print_usage(usage_dict)
-
-            # Send a response back to the host
-            m = self._tx.write(b"Data received successfully")
-            self._tx_xfer()
-        except (ValueError, IndexError):
-            # If the data is not in the expected format, send an error message
-            m = self._tx.write(b"Error: Invalid data format")
-            self._tx_xfer()
-        
+            usage_dict = self.parser.parse(buf)
+        except ValueError:
+            # If the data is not in the expected format, report it to the host
+            self.dropped += 1
+            return pack_ack(self._ack, STATUS_BAD_FORMAT, seq,
+                            ticks_diff(ticks_us(), start), 0, self._dropped(),
+                            mem_free())
+        parsed = ticks_us()
+        if self.history is not None:
+            self.history.record()
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.mark(STAGE_PARSED)
+        self.lcd_printer.print_usage(usage_dict)
+        if tracer is not None:
+            tracer.mark(STAGE_DRAWN)
+        return pack_ack(self._ack, STATUS_OK, seq, ticks_diff(parsed, start),
+                        ticks_diff(ticks_us(), parsed), self._dropped(), mem_free())
 
-    def _on_rx_c(self, ep):
-        # Receive received data. Called via micropython.schedule, outside of the USB callback function.
-        m = self._rx_c.pend_read()
-        dt = bytes(m)        
-        self._rx_c.finish_read(len(m))
-        # check if data is correctly formatted
+    def _restore(self):
+        # Draw the last snapshot, marked stale, until the host sends data.
+        # Nothing in a snapshot may keep the board from booting: one that
+        # cannot be restored is deleted.
         try:
-            parts = dt.decode('utf-8').split(';')
-            usage_dict = {}
-            for part in parts:
-                part = part.strip()
-                key, value = part.split(':')
-                key = key.strip()
-                value = value.strip()
-                usage_dict[key] = value
-            self.lcd_printer.print_usage(usage_dict)
-
-            # Send a response back to the host
-            m = self._tx_c.write(b"Data received successfully")
-            self._tx_c_xfer()
-        except (ValueError, IndexError):
-            # If the data is not in the expected format, send an error message
-            m = self._tx_c.write(b"Error: Invalid data format")
-            self._tx_c_xfer()
+            state = self.snapshot.load()
+            if state is None:
+                return
+            page, frame = state
+            self.lcd_printer.restore(self.parser.parse(frame), page)
+        except Exception:
+            self.snapshot.discard()
+
+    def _activity(self):
+        # Telemetry arrived: undo any dimming or panel sleep before drawing
+        if self.idle is not None:
+            self.idle.activity()
+
+    def _dropped(self):
+        # Frames rejected by the parser plus frames that could not be scheduled
+        n = self.dropped
+        for ch in self.channels:
+            n += ch.dropped
+        return n
+
+    def _on_data(self, ch):
+        # Parse the data straight from the RX buffer, print it on the LCD and
+        # send a response back to the host
+        self._activity()
+        m = ch.pend_read()
+        reply = self._handle_usage(m, ch.seq + 1)
+        ch.finish_read(len(m))
+        ch.write(reply)
+
+    def _on_control(self, ch):
+        # Only telemetry frames wake the display, polling STATS/TRACE/HIST
+        # must not keep it on
+        dt = ch.read()
+        if dt == b"STATS":
+            # Report the instrumentation stats instead of rendering
+            if self.instrument is not None:
+                ch.write(self.instrument.encode())
+            else:
+                ch.write(b"Error: Instrumentation disabled")
+            return
+        if dt == b"TRACE":
+            # Dump and clear the trace ring
+            if self.tracer is not None:
+                # Only as many entries as the TX buffer can take
+                ch.write(self.tracer.dump(ch.tx.writable()))
+            else:
+                ch.write(b"Error: Tracing disabled")
+            return
+        if dt.startswith(b"HIST:"):
+            # Dump the history of one key: "HIST:<key>[:<seconds per bucket>]"
+            if self.history is None:
+                ch.write(b"Error: History disabled")
+                return
+            key, _, period = dt[5:].decode().strip().partition(":")
+            try:
+                reply = self.history.dump(key, int(period or 60))
+            except ValueError:
+                reply = None
+            ch.write(b"Error: Unknown key or period" if reply is None else reply)
+            return
+        if dt.startswith(b"PAGE:"):
+            # Switch the page on screen; the ack carries the switch time
+            switch_us = self.lcd_printer.show_page(dt[5:].decode().strip())
+            status = STATUS_OK if switch_us >= 0 else STATUS_BAD_FORMAT
+            ch.write(pack_ack(self._ack, status, ch.seq, 0, max(switch_us, 0),
+                              self._dropped(), mem_free()))
+            return
+        self._activity()
+        ch.write(self._handle_usage(dt, ch.seq))
+
+    def _on_image(self, ch):
+        # Stream the received chunk straight from the RX buffer into the display
+        self._activity()
+        m = ch.rx.pend_read()
+        n = len(m)
+        self.image_stream.feed(m)
+        ch.rx.finish_read(n)
+        ch.rx_xfer()
+
+    def _on_error(self, ch, e):
+        # A handler failed: the supervisor dropped the frame, tell the host
+        if ch is self.image:
+            self.image_stream.abort()
+            return
+        ch.write(pack_ack(self._ack, STATUS_ERROR, ch.seq, 0, 0,
+                          self._dropped(), mem_free()))
+
+    def _on_image_done(self, ok, render_us):
+        status = STATUS_OK if ok else STATUS_BAD_FORMAT
+        if not ok:
+            self.dropped += 1
+        self.image.write(pack_ack(self._ack, status, self.image_stream.count, 0,
+                                  render_us, self._dropped(), mem_free()))
+
+    def _on_touch(self, touch_input):
+        # Called via micropython.schedule, so the gestures draw in the same
+        # context as the USB handlers and never interrupt one of them
+        self._touch_scheduled = False
+        touch_input.service(ticks_ms())
+        event = touch_input.get()
+        if event is not None:
+            self._activity()
+        pages = self.lcd_printer.pages
+        while event is not None:
+            gesture = event[0]
+            if gesture == touch.SWIPE_LEFT:
+                pages.step(1)
+            elif gesture == touch.SWIPE_RIGHT:
+                pages.step(-1)
+            elif gesture == touch.SWIPE_UP:
+                pages.scroll(1)
+            elif gesture == touch.SWIPE_DOWN:
+                pages.scroll(-1)
+            elif gesture == touch.LONG_PRESS:
+                pages.repaint()
+            event = touch_input.get()
+
+    def _on_open(self, _):
+        # Called via micropython.schedule, outside of the USB callback function.
+        self.lcd_printer.repaint()
 
     def desc_cfg(self, desc, itf_num, ep_num, strs):
         """
         Configure the USB device descriptor for this interface.
         """
         strs.append("WZ1")
-        desc.interface(itf_num, 4, iInterface = len(strs)-1)
-        self.ep_out = ep_num
-        self.ep_in = (ep_num) | _EP_IN_FLAG
-        self.ep_c_out = ep_num+1
-        self.ep_c_in = (ep_num+1) | _EP_IN_FLAG
-        desc.endpoint(self.ep_out,"bulk",64,0)
-        desc.endpoint(self.ep_in,"bulk",64,0)
-        desc.endpoint(self.ep_c_out,"bulk",64,0)
-        desc.endpoint(self.ep_c_in,"bulk",64,0)
+        desc.interface(itf_num, 2 * len(self.channels), iInterface = len(strs)-1)
+        for i, ch in enumerate(self.channels):
+            ch.attach(self, ep_num + i)
+            desc.endpoint(ch.ep_out,"bulk",ch.mps,0)
+            desc.endpoint(ch.ep_in,"bulk",ch.mps,0)
         
     def num_itfs(self):
         """
@@ -160,7 +326,7 @@ class WZab1Interface(Interface):
         """
         Return the number of endpoints for this interface.
         """
-        return NUM_EPS
+        return 2 * len(self.channels)  # One IN and one OUT per channel
 
     def on_open(self):
         """
@@ -168,13 +334,55 @@ class WZab1Interface(Interface):
         """
         super().on_open()
 
+        # The host (re)connected, restore the screen from the cached layers
+        schedule(self._on_open, None)
+
         # kick off any transfers that may have queued while the device was not open
-        self._tx_xfer()
-        self._rx_xfer()
-        self._tx_c_xfer()
-        self._rx_c_xfer()
+        for ch in sorted(self.channels, key=lambda ch: -ch.priority):
+            ch.kick()
+
+
+def main_loop(wz, touch_input=None):
+    """
+    The device's main loop. USB traffic is handled in scheduled callbacks;
+    the loop hands the touch gestures queued by the touch IRQ over to a
+    scheduled callback as well, dims or sleeps the display when idle and
+    otherwise waits for interrupts. Everything that draws thus runs in the
+    scheduled context, one callback at a time.
+    It also samples the telemetry history every second, saves the shown
+    values to flash now and then, and lets the supervisor recover stuck
+    channels and feed the watchdog.
+    Swipe left/right switches pages, swipe up/down scrolls, a long press
+    repaints the screen.
+    :param wz: The WZab1Interface.
+    :param touch_input: Optional touch.Touch.
+    """
+    while True:
+        now = ticks_ms()
+        if wz.idle is not None:
+            wz.idle.service(now)
+        if wz.history is not None:
+            wz.history.service(now)
+        if wz.snapshot is not None:
+            wz.snapshot.service(now)
+        wz.supervisor.service(now)
+        if (touch_input is not None and not wz._touch_scheduled
+                and touch_input.pending(now)):
+            wz._touch_scheduled = True
+            try:
+                schedule(wz._on_touch, touch_input)
+            except RuntimeError:
+                wz._touch_scheduled = False  # Queue full, retried next loop
+        idle()
 
 
 if __name__ == "__main__":
-    wz = WZab1Interface()
+    import tft_config
+    from power import IdleManager
+    wz = WZab1Interface({"image": {}} if tft_config.IMAGE_PIPE else None)
+    wz.idle = IdleManager(wz.lcd_printer.tft, tft_config.backlight_config())
     usb.device.get().init(wz, builtin_driver=True)
+    if tft_config.WATCHDOG_MS:
+        # Resets the board unless the main loop runs and the handlers succeed
+        wz.supervisor.wdt = WDT(timeout=tft_config.WATCHDOG_MS)
+    main_loop(wz, tft_config.touch_config())
@@ -0,0 +1,265 @@
+# Page manager for the LCD.
+# The device shows one of several pages (overview, per-core CPU, network,
+# disk, log). Every page keeps its retained state while it is hidden: the
+# values it was sent and, for the log, its recent lines. Updates to a hidden
+# page only touch that state; switching back restores the title and labels
+# from the static layer cache and redraws the retained values, without
+# waiting for the host to send them again.
+
+from time import ticks_us, ticks_diff
+
+WAITING = "Waiting for data..."
+
+
+class Page:
+    """
+    A page showing the keys of a compiled layout.
+    """
+    def __init__(self, name, title, layout):
+        """
+        :param name: The name the host selects the page by.
+        :param title: The title lines, drawn with the big font.
+        :param layout: The layout.Layout of the page's values.
+        """
+        self.name = name
+        self.title = title
+        self.layout = layout
+        self.keys = [entry[0] for entry in layout.entries]
+        self.shown = False  # True once values replaced the waiting message
+
+    def update(self, printer, values, active):
+        """
+        Take the values meant for this page and draw them if it is shown.
+        The values themselves are retained by the printer (last_usage).
+        :param printer: The LCDPrinter.
+        :param values: A dictionary of newly received values.
+        :param active: True if this page is on screen.
+        :return: None
+        """
+        if not active:
+            return
+        tft = printer.tft
+        slots = self.layout.compile(tft.width, tft.height)
+        for key, value in values.items():
+            slot = slots.get(key)
+            if slot is None:
+                continue
+            if not self.shown:
+                # Clear the display area under the title (the waiting message)
+                printer.clear_display_under_title()
+                self.layout.reset()
+                self.shown = True
+            printer.draw_slot(slot, f"{value}")
+
+    def show(self, printer):
+        """
+        Repaint the page from the layer cache and the retained values.
+        :param printer: The LCDPrinter.
+        :return: None
+        """
+        printer.print_title(title=self.title)
+        self.shown = False
+        self.layout.reset()
+        if printer.last_usage:
+            self.update(printer, printer.last_usage, True)
+        if not self.shown:
+            printer.print_info(WAITING, printer.FIRST_COLUMN_X,
+                               printer.FIRST_ROW_Y)
+
+    def scroll(self, printer, delta):
+        """
+        Scroll the page by delta entries; pages that fit do nothing.
+        :return: None
+        """
+        pass
+
+    def wrap_entries(self):
+        """
+        Return how many texts the page word-wraps, here the waiting message.
+        """
+        return 1
+
+
+class LogPage(Page):
+    """
+    A page showing the most recent messages sent under one key.
+    """
+    def __init__(self, name, title, key, font, max_lines=8):
+        """
+        :param name: The name the host selects the page by.
+        :param title: The title lines, drawn with the big font.
+        :param key: The key whose values are log messages.
+        :param font: The font of the messages.
+        :param max_lines: How many messages are retained.
+        """
+        self.name = name
+        self.title = title
+        self.layout = None
+        self.keys = [key]
+        self.key = key
+        self.font = font
+        self.max_lines = max_lines
+        self.lines = []
+        self.offset = 0  # Number of newest lines scrolled past
+        self.shown = False
+
+    def update(self, printer, values, active):
+        message = values.get(self.key)
+        if message is None:
+            return
+        # The lines are retained here even while another page is shown
+        self.lines.append(message)
+        if len(self.lines) > self.max_lines:
+            self.lines.pop(0)
+        if active:
+            self._draw(printer)
+
+    def _draw(self, printer):
+        printer.clear_display_under_title()
+        self.shown = True
+        tft = printer.tft
+        x = printer.FIRST_COLUMN_X
+        y = printer.FIRST_ROW_Y
+        step = self.font.HEIGHT + 2
+        # Newest messages first, as many as fit
+        for i in range(len(self.lines) - 1 - self.offset, -1, -1):
+            message = self.lines[i]
+            n = len(printer.wrap.breaks(message, self.font, x, tft.width))
+            if y + n * step > tft.height:
+                break
+            printer.print_info(message, x, y, font=self.font)
+            y += n * step
+
+    def scroll(self, printer, delta):
+        offset = max(0, min(len(self.lines) - 1, self.offset + delta))
+        if offset != self.offset:
+            self.offset = offset
+            self._draw(printer)
+
+    def wrap_entries(self):
+        # Every retained line plus the waiting message
+        return self.max_lines + 1
+
+    def show(self, printer):
+        printer.print_title(title=self.title)
+        if self.lines:
+            self._draw(printer)
+        else:
+            self.shown = False
+            printer.print_info(WAITING, printer.FIRST_COLUMN_X,
+                               printer.FIRST_ROW_Y)
+
+
+class PageManager:
+    """
+    Routes updates to the pages and switches the page on screen.
+    """
+    def __init__(self, printer, pages):
+        """
+        :param printer: The LCDPrinter the pages draw with.
+        :param pages: The pages, the first one is shown initially.
+        """
+        self.printer = printer
+        self.pages = pages
+        self.active = pages[0]
+        # Switch latency statistics in microseconds
+        self.switches = 0
+        self.last_switch_us = 0
+        self.max_switch_us = 0
+
+    def slot_keys(self):
+        """
+        Return the keys shown in the layouts of all pages.
+        """
+        keys = []
+        for page in self.pages:
+            if page.layout is not None:
+                for key in page.keys:
+                    if key not in keys:
+                        keys.append(key)
+        return keys
+
+    def wrap_entries(self):
+        """
+        Return the word-wrap cache size that holds the texts of any page.
+        """
+        return max(page.wrap_entries() for page in self.pages)
+
+    def stats(self):
+        """
+        Return the switch latency statistics as a dict.
+        """
+        return {"switches": self.switches, "last_switch_us": self.last_switch_us,
+                "max_switch_us": self.max_switch_us}
+
+    def get(self, name):
+        """
+        Return the page called name, or None.
+        """
+        for page in self.pages:
+            if page.name == name:
+                return page
+        return None
+
+    def update(self, values):
+        """
+        Pass newly received values to every page; only the active one draws.
+        :param values: A dictionary of received values.
+        :return: None
+        """
+        for page in self.pages:
+            page.update(self.printer, values, page is self.active)
+
+    def switch(self, name):
+        """
+        Show another page and measure how long the switch took.
+        :param name: The name of the page.
+        :return: The switch time in microseconds, or -1 for an unknown page.
+        """
+        page = self.get(name)
+        if page is None:
+            return -1
+        start = ticks_us()
+        self.active = page
+        self._composed(page.show)
+        dt = ticks_diff(ticks_us(), start)
+        self.switches += 1
+        self.last_switch_us = dt
+        if dt > self.max_switch_us:
+            self.max_switch_us = dt
+        return dt
+
+    def step(self, delta):
+        """
+        Switch to the page delta positions after the active one, wrapping
+        around, e.g. for swipe gestures.
+        :return: The switch time in microseconds.
+        """
+        index = self.pages.index(self.active)
+        return self.switch(self.pages[(index + delta) % len(self.pages)].name)
+
+    def scroll(self, delta):
+        """
+        Scroll the active page, e.g. for vertical swipes.
+        :return: None
+        """
+        self._composed(self.active.scroll, delta)
+
+    def repaint(self):
+        """
+        Repaint the active page, e.g. after a reconnect.
+        :return: None
+        """
+        self._composed(self.active.show)
+
+    def _composed(self, draw, *args):
+        # Draw a whole page as one compositor frame, if there is a compositor
+        compositor = self.printer.compositor
+        if compositor is None:
+            draw(self.printer, *args)
+            return
+        compositor.begin()
+        try:
+            draw(self.printer, *args)
+        finally:
+            compositor.end()
@@ -0,0 +1,217 @@
+# Zero-copy parser for the "key:value;..." telemetry frames.
+# The received buffer is scanned in place (viper where available) for the
+# key/value spans; nothing is decoded or split. Known keys map to interned
+# slot indices whose raw values and numbers live in preallocated storage,
+# and only values that actually changed are materialised as strings for
+# rendering. Unknown keys are still passed on, they just take the slow path.
+
+import micropython
+from array import array
+from micropython import const
+
+try:
+    ptr8
+except NameError:
+    # Outside viper code (e.g. CPython with a plain micropython.viper
+    # decorator) the buffers are indexed directly
+    ptr8 = ptr16 = lambda buf: buf
+
+MAX_FIELDS = const(32)
+
+# numbers[] value of a slot whose value does not start with a number
+NO_NUMBER = const(-0x40000000)
+
+_COLON = const(0x3A)
+_SEMICOLON = const(0x3B)
+_SPACE = const(0x20)
+
+
+@micropython.viper
+def _scan(buf, n: int, spans, max_fields: int) -> int:
+    # Find the fields of buf[:n]. For field i, spans[4*i:4*i+4] receives the
+    # whitespace-trimmed key start/end and value start/end. Returns the number
+    # of fields, or -1 if a field has no colon or more than one, or there are
+    # more than max_fields.
+    b = ptr8(buf)
+    s = ptr16(spans)
+    field = 0
+    start = 0
+    colon = -1
+    i = 0
+    while i <= n:
+        c = _SEMICOLON
+        if i < n:
+            c = int(b[i])
+        if c == _COLON:
+            if colon >= 0:
+                return -1
+            colon = i
+        elif c == _SEMICOLON:
+            if colon < 0:
+                # Only the end of the frame may follow a trailing ';'
+                while start < n and int(b[start]) <= _SPACE:
+                    start += 1
+                if i == n and start == n and field > 0:
+                    return field
+                return -1
+            if field >= max_fields:
+                return -1
+            ks = start
+            ke = colon
+            while ks < ke and int(b[ks]) <= _SPACE:
+                ks += 1
+            while ke > ks and int(b[ke - 1]) <= _SPACE:
+                ke -= 1
+            vs = colon + 1
+            ve = i
+            while vs < ve and int(b[vs]) <= _SPACE:
+                vs += 1
+            while ve > vs and int(b[ve - 1]) <= _SPACE:
+                ve -= 1
+            o = field * 4
+            s[o] = ks
+            s[o + 1] = ke
+            s[o + 2] = vs
+            s[o + 3] = ve
+            field += 1
+            start = i + 1
+            colon = -1
+        i += 1
+    return field
+
+
+@micropython.viper
+def _equal(buf, start: int, key, n: int) -> int:
+    # 1 if buf[start:start+n] == key[:n]
+    b = ptr8(buf)
+    k = ptr8(key)
+    i = 0
+    while i < n:
+        if int(b[start + i]) != int(k[i]):
+            return 0
+        i += 1
+    return 1
+
+
+@micropython.viper
+def _update(buf, start: int, n: int, store, off: int, old: int) -> int:
+    # Copy buf[start:start+n] to store[off:], return 0 if it was already there
+    b = ptr8(buf)
+    d = ptr8(store)
+    i = 0
+    if n == old:
+        while i < n:
+            if int(b[start + i]) != int(d[off + i]):
+                break
+            i += 1
+        if i == n:
+            return 0
+    while i < n:
+        d[off + i] = b[start + i]
+        i += 1
+    return 1
+
+
+@micropython.viper
+def _number(buf, start: int, end: int) -> int:
+    # The leading decimal number of buf[start:end] in hundredths, or NO_NUMBER
+    b = ptr8(buf)
+    i = start
+    neg = 0
+    if i < end and int(b[i]) == 0x2D:  # '-'
+        neg = 1
+        i += 1
+    value = 0
+    digits = 0
+    while i < end and int(b[i]) >= 0x30 and int(b[i]) <= 0x39:
+        value = value * 10 + int(b[i]) - 0x30
+        digits += 1
+        i += 1
+    value *= 100
+    if i < end and int(b[i]) == 0x2E:  # '.'
+        i += 1
+        scale = 10
+        while i < end and int(b[i]) >= 0x30 and int(b[i]) <= 0x39:
+            value += (int(b[i]) - 0x30) * scale
+            digits += 1
+            scale = scale // 10
+            i += 1
+    if digits == 0:
+        return NO_NUMBER
+    if neg:
+        return 0 - value
+    return value
+
+
+class UsageParser:
+    """
+    Parses telemetry frames into the values that changed since the last one.
+    """
+    def __init__(self, keys, max_len=24):
+        """
+        :param keys: The known keys, e.g. every key shown by a page.
+        :param max_len: Bytes of storage per value; longer values are
+                        always treated as changed.
+        """
+        self.keys = list(keys)
+        self._key_bytes = [key.encode() for key in self.keys]
+        self.max_len = max_len
+        n = len(self.keys)
+        self._store = bytearray(n * max_len)
+        self._lens = array("h", [-1] * n)  # -1: never received
+        # Four u16 spans per field; a bytes initializer is copied as raw
+        # memory, hence 2 bytes per entry
+        self._spans = array("H", bytes(8 * MAX_FIELDS))
+        # Latest value of every slot as a string, and in hundredths
+        self.text = [None] * n
+        self.numbers = array("i", [NO_NUMBER] * n)
+        # The changed values of the last frame, key -> string
+        self.changed = {}
+
+    def slot(self, buf, start, end):
+        """
+        Return the slot index of the key buf[start:end], or -1.
+        """
+        n = end - start
+        key_bytes = self._key_bytes
+        for i in range(len(key_bytes)):
+            key = key_bytes[i]
+            if len(key) == n and _equal(buf, start, key, n):
+                return i
+        return -1
+
+    def parse(self, buf):
+        """
+        Parse one frame.
+        :param buf: The received bytes (bytes, bytearray or memoryview).
+        :return: A dictionary key -> string of the values that changed; it
+                 is reused by the next call.
+        :raises ValueError: If the frame is not in the expected format.
+        """
+        spans = self._spans
+        count = _scan(buf, len(buf), spans, len(spans) // 4)
+        if count < 0:
+            raise ValueError("Bad frame")
+        changed = self.changed
+        changed.clear()
+        max_len = self.max_len
+        lens = self._lens
+        for f in range(0, count * 4, 4):
+            ks, ke, vs, ve = spans[f], spans[f + 1], spans[f + 2], spans[f + 3]
+            i = self.slot(buf, ks, ke)
+            if i < 0:
+                # Unknown key, materialise both
+                changed[str(buf[ks:ke], "utf-8")] = str(buf[vs:ve], "utf-8")
+                continue
+            n = ve - vs
+            if n > max_len:
+                lens[i] = -1
+            elif not _update(buf, vs, n, self._store, i * max_len, lens[i]):
+                continue
+            else:
+                lens[i] = n
+            text = str(buf[vs:ve], "utf-8")
+            self.text[i] = text
+            self.numbers[i] = _number(buf, vs, ve)
+            changed[self.keys[i]] = text
+        return changed
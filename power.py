@@ -0,0 +1,75 @@
+# Idle manager for the display.
+# After a while without telemetry the backlight is dimmed through PWM, later
+# it is switched off and the panel is put into SLPIN. The ST7789 keeps its
+# frame memory while sleeping, so the next packet only has to send SLPOUT
+# and restore the backlight; the retained frame reappears without a redraw.
+
+from micropython import const
+from time import ticks_ms, ticks_diff, sleep_ms
+
+ACTIVE = const(0)
+DIMMED = const(1)
+SLEEPING = const(2)
+
+_FULL = const(65535)
+
+
+class IdleManager:
+    """
+    Dims and then sleeps the display when no telemetry arrives.
+    """
+    def __init__(self, tft, backlight, dim_after=30, sleep_after=300,
+                 dim_duty=6554):
+        """
+        :param tft: The ST7789 driver instance.
+        :param backlight: A machine.PWM on the backlight pin, or None to only
+                          use the panel sleep mode.
+        :param dim_after: Seconds without activity before dimming.
+        :param sleep_after: Seconds without activity before sleeping.
+        :param dim_duty: The 16-bit PWM duty of the dimmed backlight.
+        """
+        self.tft = tft
+        self.backlight = backlight
+        self.dim_after_ms = dim_after * 1000
+        self.sleep_after_ms = sleep_after * 1000
+        self.dim_duty = dim_duty
+        self.state = ACTIVE
+        self.last_ms = ticks_ms()
+        self.sleeps = 0
+        self._set_backlight(_FULL)
+
+    def _set_backlight(self, duty):
+        if self.backlight is not None:
+            self.backlight.duty_u16(duty)
+
+    def activity(self):
+        """
+        Called for every received packet (and touch); wakes the display.
+        :return: None
+        """
+        self.last_ms = ticks_ms()
+        if self.state == ACTIVE:
+            return
+        if self.state == SLEEPING:
+            self.tft.sleep_mode(False)
+            sleep_ms(5)  # SLPOUT needs 5 ms before the next command
+        self._set_backlight(_FULL)
+        self.state = ACTIVE
+
+    def service(self, now):
+        """
+        Called from the main loop: dim or sleep once the timeouts expire.
+        :param now: The current time in milliseconds (ticks_ms).
+        :return: None
+        """
+        if self.state == SLEEPING:
+            return
+        idle = ticks_diff(now, self.last_ms)
+        if idle >= self.sleep_after_ms:
+            self._set_backlight(0)
+            self.tft.sleep_mode(True)
+            self.state = SLEEPING
+            self.sleeps += 1
+        elif idle >= self.dim_after_ms and self.state == ACTIVE:
+            self._set_backlight(self.dim_duty)
+            self.state = DIMMED
@@ -0,0 +1,59 @@
+# Binary reply format sent back to the host after every received frame.
+# Must be kept in sync with linux-side-python-test/wz1_protocol.py.
+
+import struct
+from micropython import const
+
+# Reply types. They are outside the ASCII range, so the host can tell binary
+# replies apart from text replies (e.g. the STATS dump) by the first byte.
+REPLY_ACK = const(0x81)
+
+# Reply status codes
+STATUS_OK = const(0)
+STATUS_BAD_FORMAT = const(1)
+STATUS_ERROR = const(2)  # The handler failed, the frame was dropped
+
+# type, status, seq, parse_us, render_us, dropped, free_heap
+ACK_FORMAT = "<BBHHIHI"
+ACK_SIZE = struct.calcsize(ACK_FORMAT)
+
+
+def pack_ack(buf, status, seq, parse_us, render_us, dropped, free_heap):
+    """
+    Pack an ack reply into a preallocated buffer of ACK_SIZE bytes.
+    Counters wrap and the parse time saturates to fit their fields.
+    :param buf: The bytearray to pack into.
+    :param status: One of the STATUS_* codes.
+    :param seq: The frame sequence number.
+    :param parse_us: Time spent parsing the frame in microseconds.
+    :param render_us: Time spent rendering the frame in microseconds.
+    :param dropped: Number of frames dropped so far.
+    :param free_heap: Free heap in bytes.
+    :return: The buffer.
+    """
+    struct.pack_into(ACK_FORMAT, buf, 0, REPLY_ACK, status, seq & 0xFFFF,
+                     min(parse_us, 0xFFFF), render_us, dropped & 0xFFFF,
+                     free_heap)
+    return buf
+
+# Trace dump, the reply to the "TRACE" control command: a header followed by
+# count entries, oldest first. Timestamps are time.ticks_us values, which
+# wrap at TICKS_PERIOD.
+REPLY_TRACE = const(0x82)
+# type, reserved, count, entry size
+TRACE_HEADER = "<BBHH"
+TRACE_HEADER_SIZE = struct.calcsize(TRACE_HEADER)
+# seq, stage, channel, ticks_us
+TRACE_ENTRY = "<HBBI"
+TRACE_ENTRY_SIZE = struct.calcsize(TRACE_ENTRY)
+
+# History dump, the reply to the "HIST:<key>:<period>" control command (see
+# history.py): a header followed by count buckets, oldest first. Values are
+# in hundredths, buckets without data hold parser.NO_NUMBER in every field.
+REPLY_HIST = const(0x83)
+# type, reserved, count, seconds per bucket, seconds into the open bucket
+HIST_HEADER = "<BBHHH"
+HIST_HEADER_SIZE = struct.calcsize(HIST_HEADER)
+# min, max, avg
+HIST_ENTRY = "<iii"
+HIST_ENTRY_SIZE = struct.calcsize(HIST_ENTRY)
@@ -0,0 +1,137 @@
+# Flash snapshot of the shown telemetry, for an instant screen after a reset.
+# The values of the page slots and the active page are written to flash at a
+# throttled rate, and only when they changed. On boot the last snapshot is
+# drawn at once and marked stale until the host sends again.
+# Writes rotate through a few slot files, each with a sequence number and a
+# CRC: a write cut short by a reset leaves the older slots intact, and the
+# rewrites are spread over the slots on top of LittleFS's wear levelling.
+
+import os
+import struct
+from binascii import crc32
+from time import ticks_ms, ticks_diff
+
+_MAGIC = b"SNP1"
+# magic, sequence number, payload length, payload crc32
+_HEADER = "<4sIHI"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+
+class Snapshot:
+    """
+    Persists the shown values and the active page in rotating flash slots.
+    The payload is the page name, a newline and a "key:value;..." frame.
+    """
+    def __init__(self, printer, keys, path="/snap", slots=4, interval=60):
+        """
+        :param printer: The LCDPrinter whose values are saved.
+        :param keys: The keys to save, e.g. the parser's slot keys.
+        :param path: The flash directory of the slot files.
+        :param slots: Number of slot files written in turn.
+        :param interval: Minimum seconds between two writes.
+        """
+        self.printer = printer
+        self.keys = list(keys)
+        self.path = path
+        self.slots = slots
+        self.interval_ms = interval * 1000
+        self.seq = 0  # Sequence number of the newest slot
+        self.writes = 0
+        self._saved = None  # Payload of the newest slot
+        self._last_ms = ticks_ms()
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass  # Already exists
+
+    def _file(self, slot):
+        return f"{self.path}/{slot}.bin"
+
+    def _read(self, slot):
+        # Return (seq, payload) of a slot, or None if it is missing or torn
+        try:
+            with open(self._file(slot), "rb") as f:
+                header = f.read(_HEADER_SIZE)
+                if len(header) != _HEADER_SIZE:
+                    return None
+                magic, seq, length, crc = struct.unpack(_HEADER, header)
+                if magic != _MAGIC:
+                    return None
+                payload = f.read(length)
+        except OSError:
+            return None
+        if len(payload) != length or crc32(payload) != crc:
+            return None
+        return seq, payload
+
+    def load(self):
+        """
+        Find the newest intact snapshot.
+        :return: A (page name, frame bytes) tuple, or None.
+        """
+        best = None
+        for slot in range(self.slots):
+            entry = self._read(slot)
+            if entry is not None and (best is None or entry[0] > best[0]):
+                best = entry
+        if best is None:
+            return None
+        self.seq, self._saved = best
+        page, _, frame = best[1].partition(b"\n")
+        return page.decode(), frame
+
+    def discard(self):
+        """
+        Delete every slot, e.g. after the snapshot could not be restored.
+        :return: None
+        """
+        for slot in range(self.slots):
+            try:
+                os.remove(self._file(slot))
+            except OSError:
+                pass  # Missing already
+        self.seq = 0
+        self._saved = None
+
+    def encode(self):
+        """
+        Return the payload for the printer's current state.
+        """
+        usage = self.printer.last_usage or {}
+        fields = [f"{key}:{usage[key]}" for key in self.keys if key in usage]
+        return (self.printer.pages.active.name + "\n"
+                + ";".join(fields)).encode()
+
+    def save(self, payload):
+        """
+        Write a payload to the next slot.
+        :return: True if it was written.
+        """
+        seq = self.seq + 1
+        try:
+            with open(self._file(seq % self.slots), "wb") as f:
+                f.write(struct.pack(_HEADER, _MAGIC, seq, len(payload),
+                                    crc32(payload)))
+                f.write(payload)
+        except OSError:
+            return False  # Best effort, e.g. a full filesystem
+        self.seq = seq
+        self._saved = payload
+        self.writes += 1
+        return True
+
+    def service(self, now):
+        """
+        Called from the main loop: write the state if it changed, at most
+        once per interval.
+        :param now: The current time in milliseconds (ticks_ms).
+        :return: None
+        """
+        if ticks_diff(now, self._last_ms) < self.interval_ms:
+            return
+        self._last_ms = now
+        if not self.printer.last_usage:
+            return  # Nothing received yet, keep the previous snapshot
+        payload = self.encode()
+        if payload != self._saved:
+            self.save(payload)
@@ -63,6 +63,13 @@ except ImportError:
     uint = int
     const = lambda x: x
 
+    # Viper pointer types, so the packers also run under CPython
+    def ptr8(buf):
+        return memoryview(buf).cast("B")
+
+    def ptr16(buf):
+        return memoryview(buf).cast("B").cast("H")
+
     class micropython:
         @staticmethod
         def viper(func):
@@ -133,6 +140,9 @@ _ENCODE_PIXEL_SWAPPED = const("<H")
 _ENCODE_POS = const(">HH")
 _ENCODE_POS_16 = const("<HH")
 
+# Colour lookup used without a theme
+_NO_COLORS = {}
+
 # must be at least 128 for 8 bit wide fonts
 # must be at least 256 for 16 bit wide fonts
 _BUFFER_SIZE = const(256)
@@ -224,6 +234,55 @@ def color565(red, green=0, blue=0):
     return (red & 0xF8) << 8 | (green & 0xFC) << 3 | blue >> 3
 
 
+class BufferPool:
+    """
+    Preallocated scratch buffers for the drawing primitives.
+
+    The buffers come in a few size classes. A request is served from the
+    smallest class that is large enough, as a memoryview of exactly the
+    requested length; these views are cached per length, so drawing in
+    steady state allocates nothing. A request larger than every class gets
+    a fresh buffer and is counted in `misses`.
+
+    Args:
+        sizes (tuple): size in bytes of every class
+        max_views (int): number of cached views
+    """
+
+    def __init__(self, sizes, max_views=32):
+        self.buffers = [bytearray(size) for size in sorted(sizes)]
+        self.max_views = max_views
+        self._views = {}
+        self.misses = 0
+
+    def get(self, nbytes):
+        """
+        Return a scratch memoryview of nbytes.
+
+        The contents are undefined and only valid until the next request.
+
+        Args:
+            nbytes (int): length in bytes
+        """
+        view = self._views.get(nbytes)
+        if view is not None:
+            return view
+        for buffer in self.buffers:
+            if len(buffer) >= nbytes:
+                view = memoryview(buffer)[:nbytes]
+                if len(self._views) < self.max_views:
+                    self._views[nbytes] = view
+                return view
+        self.misses += 1
+        return memoryview(bytearray(nbytes))
+
+    def stats(self):
+        """
+        Return the pool counters as a dict.
+        """
+        return {"views": len(self._views), "misses": self.misses}
+
+
 class ST7789:
     """
     ST7789 driver class
@@ -256,6 +315,10 @@ class ST7789:
 
           - ((width, height, xstart, ystart, madctl, needs_swap), ...)
 
+        pool_sizes (tuple): size classes in bytes of the scratch buffer pool
+            used by bitmap, pbitmap and write; the largest should hold a
+            bitmap or the widest glyph of the fonts used
+
     """
 
     def __init__(
@@ -271,6 +334,7 @@ class ST7789:
         color_order=BGR,
         custom_init=None,
         custom_rotations=None,
+        pool_sizes=(640, 2048),
     ):
         """
         Initialize display.
@@ -299,6 +363,17 @@ class ST7789:
         self._rotation = rotation % 4
         self.color_order = color_order
         self.init_cmds = custom_init or _ST7789_INIT_CMDS
+        # Optional colour theme with pre-packed colours, see theme.Theme
+        self.theme = None
+        # Preallocated buffers, so drawing does not allocate
+        self.pool = BufferPool(pool_sizes)
+        self._window = bytearray(4)
+        self._pixel = bytearray(2)
+        self._glyph = bytearray(256)
+        self._glyph8 = memoryview(self._glyph)[:128]
+        self._fill = bytearray(_BUFFER_SIZE * 2)
+        self._fill_color = None  # Colour _fill holds, None for none
+        self._fill_swap = None
         self.hard_reset()
         # yes, twice, once is not always enough
         self.init(self.init_cmds)
@@ -412,6 +487,9 @@ class ST7789:
             self.ystart,
             self.needs_swap,
         ) = self.rotations[rotation]
+        if self.theme is not None:
+            # The packed colours depend on the byte order
+            self.theme.bind(self)
 
         if self.color_order == BGR:
             madctl |= _ST7789_MADCTL_BGR
@@ -431,14 +509,11 @@ class ST7789:
             y1 (int): row end address
         """
         if x0 <= x1 <= self.width and y0 <= y1 <= self.height:
-            self._write(
-                _ST7789_CASET,
-                struct.pack(_ENCODE_POS, x0 + self.xstart, x1 + self.xstart),
-            )
-            self._write(
-                _ST7789_RASET,
-                struct.pack(_ENCODE_POS, y0 + self.ystart, y1 + self.ystart),
-            )
+            window = self._window
+            struct.pack_into(_ENCODE_POS, window, 0, x0 + self.xstart, x1 + self.xstart)
+            self._write(_ST7789_CASET, window)
+            struct.pack_into(_ENCODE_POS, window, 0, y0 + self.ystart, y1 + self.ystart)
+            self._write(_ST7789_RASET, window)
             self._write(_ST7789_RAMWR)
 
     def vline(self, x, y, length, color):
@@ -475,12 +550,13 @@ class ST7789:
             color (int): 565 encoded color
         """
         self._set_window(x, y, x, y)
-        self._write(
-            None,
-            struct.pack(
-                _ENCODE_PIXEL_SWAPPED if self.needs_swap else _ENCODE_PIXEL, color
-            ),
-        )
+        pixel = None if self.theme is None else self.theme.pixels.get(color)
+        if pixel is None:
+            pixel = self._pixel
+            struct.pack_into(
+                _ENCODE_PIXEL_SWAPPED if self.needs_swap else _ENCODE_PIXEL, pixel, 0, color
+            )
+        self._write(None, pixel)
 
     def blit_buffer(self, buffer, x, y, width, height):
         """
@@ -524,17 +600,29 @@ class ST7789:
             color (int): 565 encoded color
         """
         self._set_window(x, y, x + width - 1, y + height - 1)
-        chunks, rest = divmod(width * height, _BUFFER_SIZE)
-        pixel = struct.pack(
-            _ENCODE_PIXEL_SWAPPED if self.needs_swap else _ENCODE_PIXEL, color
-        )
+        # Theme colours come with a ready fill pattern, other colours are
+        # filled into the driver's pattern buffer when they change
+        pattern = None if self.theme is None else self.theme.patterns.get(color)
+        if pattern is None:
+            pattern = self._fill
+            if color != self._fill_color or self.needs_swap != self._fill_swap:
+                struct.pack_into(
+                    _ENCODE_PIXEL_SWAPPED if self.needs_swap else _ENCODE_PIXEL,
+                    pattern, 0, color
+                )
+                n = 2
+                while n < len(pattern):
+                    k = min(n, len(pattern) - n)
+                    pattern[n : n + k] = pattern[0:k]
+                    n += k
+                self._fill_color = color
+                self._fill_swap = self.needs_swap
+        chunks, rest = divmod(width * height, len(pattern) // 2)
         self.dc.on()
-        if chunks:
-            data = pixel * _BUFFER_SIZE
-            for _ in range(chunks):
-                self._write(None, data)
+        for _ in range(chunks):
+            self._write(None, pattern)
         if rest:
-            self._write(None, pixel * rest)
+            self._write(None, memoryview(pattern)[: rest * 2])
 
     def fill(self, color):
         """
@@ -616,8 +704,7 @@ class ST7789:
 
     @micropython.viper
     @staticmethod
-    def _pack8(glyphs, idx: uint, fg_color: uint, bg_color: uint):
-        buffer = bytearray(128)
+    def _pack8(buffer, glyphs, idx: uint, fg_color: uint, bg_color: uint):
         bitmap = ptr16(buffer)
         glyph = ptr8(glyphs)
 
@@ -637,18 +724,21 @@ class ST7789:
 
     @micropython.viper
     @staticmethod
-    def _pack16(glyphs, idx: uint, fg_color: uint, bg_color: uint):
+    def _pack16(buffer, glyphs, idx: uint, fg_color: uint, bg_color: uint):
         """
-        Pack a character into a byte array.
+        Pack an 8 pixel high band of a character into a buffer.
 
         Args:
-            char (str): character to pack
+            buffer (bytearray): at least 256 bytes receiving the band
+            glyphs (bytes): font data
+            idx (int): offset of the band in the font data
+            fg_color (int): foreground color as the display expects it
+            bg_color (int): background color as the display expects it
 
         Returns:
-            128 bytes: character bitmap in color565 format
+            buffer: the band bitmap in color565 format
         """
 
-        buffer = bytearray(256)
         bitmap = ptr16(buffer)
         glyph = ptr8(glyphs)
 
@@ -710,7 +800,7 @@ class ST7789:
 
                 for line in range(passes):
                     idx = (ch - font.FIRST) * size + (each * line)
-                    buffer = self._pack8(font.FONT, idx, fg_color, bg_color)
+                    buffer = self._pack8(self._glyph8, font.FONT, idx, fg_color, bg_color)
                     self.blit_buffer(buffer, x0, y0 + 8 * line, 8, 8)
 
                 x0 += 8
@@ -746,7 +836,7 @@ class ST7789:
 
                 for line in range(passes):
                     idx = (ch - font.FIRST) * size + (each * line)
-                    buffer = self._pack16(font.FONT, idx, fg_color, bg_color)
+                    buffer = self._pack16(self._glyph, font.FONT, idx, fg_color, bg_color)
                     self.blit_buffer(buffer, x0, y0 + 8 * line, 16, 8)
             x0 += 16
 
@@ -763,12 +853,17 @@ class ST7789:
             color (int): 565 encoded color to use for characters
             background (int): 565 encoded color to use for background
         """
-        fg_color = color if self.needs_swap else ((color << 8) & 0xFF00) | (color >> 8)
-        bg_color = (
-            background
-            if self.needs_swap
-            else ((background << 8) & 0xFF00) | (background >> 8)
-        )
+        swapped = _NO_COLORS if self.theme is None else self.theme.swapped
+        fg_color = swapped.get(color)
+        if fg_color is None:
+            fg_color = color if self.needs_swap else ((color << 8) & 0xFF00) | (color >> 8)
+        bg_color = swapped.get(background)
+        if bg_color is None:
+            bg_color = (
+                background
+                if self.needs_swap
+                else ((background << 8) & 0xFF00) | (background >> 8)
+            )
 
         if font.WIDTH == 8:
             self._text8(font, text, x0, y0, fg_color, bg_color)
@@ -799,7 +894,7 @@ class ST7789:
         bs_bit = bpp * bitmap_size * index  # if index > 0 else 0
         palette = bitmap.PALETTE
         needs_swap = self.needs_swap
-        buffer = bytearray(buffer_len)
+        buffer = self.pool.get(buffer_len)
 
         for i in range(0, buffer_len, 2):
             color_index = 0
@@ -839,7 +934,7 @@ class ST7789:
         bs_bit = bpp * bitmap_size * index  # if index > 0 else 0
         palette = bitmap.PALETTE
         needs_swap = self.needs_swap
-        buffer = bytearray(bitmap.WIDTH * 2)
+        buffer = self.pool.get(bitmap.WIDTH * 2)
 
         for row in range(height):
             for col in range(width):
@@ -877,8 +972,7 @@ class ST7789:
             fg (int): foreground color, optional, defaults to WHITE
             bg (int): background color, optional, defaults to BLACK
         """
-        buffer_len = font.HEIGHT * font.MAX_WIDTH * 2
-        buffer = bytearray(buffer_len)
+        pool = self.pool
         fg_hi = fg >> 8
         fg_lo = fg & 0xFF
 
@@ -898,6 +992,7 @@ class ST7789:
 
                 char_width = font.WIDTHS[char_index]
                 buffer_needed = char_width * font.HEIGHT * 2
+                buffer = pool.get(buffer_needed)
 
                 for i in range(0, buffer_needed, 2):
                     if font.BITMAPS[bs_bit // 8] & 1 << (7 - (bs_bit % 8)) > 0:
@@ -913,7 +1008,7 @@ class ST7789:
                 to_row = y + font.HEIGHT - 1
                 if self.width > to_col and self.height > to_row:
                     self._set_window(x, y, to_col, to_row)
-                    self._write(None, buffer[:buffer_needed])
+                    self._write(None, buffer)
 
                 x += char_width
 
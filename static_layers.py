@@ -0,0 +1,194 @@
+# Static layer cache for the LCD.
+# Screen elements that never change (the title, the key labels) are rendered
+# once into RGB565 byte blobs and then restored with a single blit_buffer each,
+# instead of being re-rendered glyph by glyph on every repaint.
+# RAM holds the layers up to a byte budget, the least recently used ones are
+# dropped beyond it: those belong to pages not on screen and come back from
+# the flash copy (or are rendered again) when their page is shown.
+
+import os
+import struct
+import st7789py as st7789
+
+_MAGIC = b"SLYR"
+# magic, width, height, foreground, background, needs_swap
+_HEADER = "<4sHHHHB"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+
+def _swap(color):
+    """
+    Byte-swap a 565 colour the same way ST7789.text does for its glyph packers.
+    """
+    return ((color << 8) & 0xFF00) | (color >> 8)
+
+
+def render_text(tft, font, text, color=st7789.WHITE, background=st7789.BLACK):
+    """
+    Render text in a bitmap font into a row-major RGB565 blob.
+    The glyphs are packed with the driver's own viper packers, so the blob has
+    exactly the bytes ST7789.text would have sent.
+    :param tft: The ST7789 driver instance.
+    :param font: The 8 or 16 pixel wide bitmap font module.
+    :param text: The text to render.
+    :param color: The 565 encoded text colour.
+    :param background: The 565 encoded background colour.
+    :return: A (blob, width, height) tuple.
+    """
+    if tft.needs_swap:
+        fg, bg = color, background
+    else:
+        fg, bg = _swap(color), _swap(background)
+    cw = font.WIDTH
+    height = font.HEIGHT
+    width = len(text) * cw
+    pack = tft._pack8 if cw == 8 else tft._pack16
+    # Bytes of font data per glyph and per 8 pixel high band
+    size = cw * height // 8
+    row_bytes = cw * 2
+    stride = width * 2
+    blob = bytearray(stride * height)
+    dst = memoryview(blob)
+    band_buffer = bytearray(cw * 16)
+    for col, char in enumerate(text):
+        ch = ord(char)
+        if not font.FIRST <= ch < font.LAST:
+            ch = 0x20 if font.FIRST <= 0x20 else font.FIRST
+        for band in range(height // 8):
+            src = memoryview(pack(band_buffer, font.FONT,
+                                  (ch - font.FIRST) * size + cw * band, fg, bg))
+            for row in range(8):
+                off = (band * 8 + row) * stride + col * row_bytes
+                dst[off:off + row_bytes] = src[row * row_bytes:(row + 1) * row_bytes]
+    return blob, width, height
+
+
+class StaticLayerCache:
+    """
+    A cache of pre-rendered constant screen elements.
+    Layers are kept in RAM up to max_bytes and, if a path is given, persisted
+    to flash so that they survive a reset without being rendered again.
+    """
+    def __init__(self, tft, path=None, max_bytes=32 * 1024):
+        """
+        :param tft: The ST7789 driver instance the layers are rendered for.
+        :param path: Optional flash directory to persist the layers in.
+        :param max_bytes: RAM budget of the blobs, enough for the layers of
+                          one page; the least recently used layers beyond it
+                          are dropped. The newest layer is always kept.
+        """
+        self.tft = tft
+        self.path = path
+        self.max_bytes = max_bytes
+        # name -> (blob, width, height, color, background, needs_swap)
+        self.layers = {}
+        # Layer names, least recently used first (MicroPython dicts do not
+        # keep insertion order)
+        self._order = []
+        self.nbytes = 0  # Bytes of the blobs in RAM
+        self.evictions = 0
+        if path is not None:
+            try:
+                os.mkdir(path)
+            except OSError:
+                pass  # Already exists
+
+    def _file(self, name):
+        return f"{self.path}/{name}.bin"
+
+    def _load(self, name, color, background):
+        try:
+            with open(self._file(name), "rb") as f:
+                header = f.read(_HEADER_SIZE)
+                if len(header) != _HEADER_SIZE:
+                    return None
+                magic, width, height, fg, bg, swap = struct.unpack(_HEADER, header)
+                if (magic != _MAGIC or fg != color or bg != background
+                        or swap != self.tft.needs_swap):
+                    return None
+                blob = bytearray(width * height * 2)
+                if f.readinto(blob) != len(blob):
+                    return None
+                return blob, width, height
+        except OSError:
+            return None
+
+    def _save(self, name, blob, width, height, color, background):
+        try:
+            with open(self._file(name), "wb") as f:
+                f.write(struct.pack(_HEADER, _MAGIC, width, height, color,
+                                    background, self.tft.needs_swap))
+                f.write(blob)
+        except OSError:
+            pass  # Persisting is best effort, the layer stays cached in RAM
+
+    def get(self, name, font, text, color=st7789.WHITE, background=st7789.BLACK):
+        """
+        Return a layer, rendering (or loading it from flash) on first use.
+        A layer requested again with different colours, or after the
+        rotation changed the byte order, is re-rendered.
+        :param name: The layer name, also used as the file name on flash.
+        :param font: The bitmap font module to render with.
+        :param text: The text of the layer.
+        :param color: The 565 encoded text colour.
+        :param background: The 565 encoded background colour.
+        :return: A (blob, width, height) tuple.
+        """
+        swap = self.tft.needs_swap
+        layer = self.layers.get(name)
+        if layer is not None:
+            order = self._order
+            order.remove(name)
+            order.append(name)
+            if layer[3] == color and layer[4] == background and layer[5] == swap:
+                return layer[0], layer[1], layer[2]
+        loaded = self._load(name, color, background) if self.path else None
+        if loaded is None:
+            loaded = render_text(self.tft, font, text, color, background)
+            if self.path:
+                self._save(name, loaded[0], loaded[1], loaded[2], color, background)
+        blob, width, height = loaded
+        self._drop(name)
+        self.layers[name] = (blob, width, height, color, background, swap)
+        self._order.append(name)
+        self.nbytes += len(blob)
+        while self.nbytes > self.max_bytes and len(self._order) > 1:
+            self._drop(self._order[0])
+            self.evictions += 1
+        return loaded
+
+    def _drop(self, name):
+        layer = self.layers.pop(name, None)
+        if layer is not None:
+            self.nbytes -= len(layer[0])
+            self._order.remove(name)
+
+    def blit(self, name, x, y):
+        """
+        Restore a cached layer with a single blit_buffer.
+        :param name: The layer name.
+        :param x: The x-coordinate of the top left corner.
+        :param y: The y-coordinate of the top left corner.
+        :return: None
+        """
+        blob, width, height = self.layers[name][:3]
+        self.tft.blit_buffer(blob, x, y, width, height)
+
+    def draw(self, name, font, text, x, y, color=st7789.WHITE,
+             background=st7789.BLACK):
+        """
+        Get a layer (rendering it if needed) and blit it at the given position.
+        :return: The (width, height) of the layer.
+        """
+        blob, width, height = self.get(name, font, text, color, background)
+        self.tft.blit_buffer(blob, x, y, width, height)
+        return width, height
+
+    def clear(self):
+        """
+        Drop all layers from RAM. Persisted copies are kept.
+        :return: None
+        """
+        self.layers = {}
+        self._order = []
+        self.nbytes = 0
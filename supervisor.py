@@ -0,0 +1,158 @@
+# Supervisor of the USB receive and render pipeline.
+# Every channel handler runs through the supervisor, which times it and
+# catches any exception: the frame is dropped, the RX buffer released and
+# the host told, instead of the channel silently wedging. The main loop lets
+# it check the channels: handlers for data that was never handled (e.g. when
+# the schedule queue was full) and OUT/IN transfers that stayed missing are
+# scheduled again, so they run in the same context as the USB callbacks and
+# never interrupt a handler. The hardware watchdog is fed only while the
+# pipeline is healthy. A handler hanging on SPI blocks the main loop, so the
+# watchdog resets the board in either case.
+
+from micropython import schedule
+from time import ticks_ms, ticks_diff
+
+
+class Supervisor:
+    """
+    Times the channel handlers, counts failures and keeps transfers alive.
+    """
+    def __init__(self, channels, wdt=None, on_error=None, max_failures=5,
+                 stall_ms=2000, slow_ms=500):
+        """
+        :param channels: The channels to supervise.
+        :param wdt: A machine.WDT, fed from service() while healthy; can be
+                    set later, as starting it cannot be undone.
+        :param on_error: Called as on_error(channel, exception) after a
+                         handler failed, e.g. to answer the host.
+        :param max_failures: Consecutive handler failures after which the
+                             watchdog is no longer fed.
+        :param stall_ms: Time received data may wait unhandled, or a
+                         transfer may stay missing, before the handler or
+                         the transfer is scheduled again.
+        :param slow_ms: Handlers taking longer are counted as slow.
+        """
+        self.channels = channels
+        self.wdt = wdt
+        self.on_error = on_error
+        self.max_failures = max_failures
+        self.stall_ms = stall_ms
+        self.slow_ms = slow_ms
+        self.failures = 0  # Handler exceptions in total
+        self.consecutive = 0  # Handler exceptions since the last success
+        self.slow = 0
+        self.rescheduled = 0  # Handlers scheduled again for data left waiting
+        self.kicks = 0  # Transfers re-issued
+        self.last_error = None
+        # Per channel name: duration of the last and the slowest handler run
+        self.last_ms = {}
+        self.max_ms = {}
+        self._waiting = {}  # Channel name -> ticks_ms data was seen waiting
+        self._missing = {}  # Channel name -> ticks_ms a transfer was missing
+
+    def run(self, ch):
+        """
+        Run the handler of a channel; called by Channel for received data.
+        :param ch: The channel.
+        :return: None
+        """
+        start = ticks_ms()
+        try:
+            ch.handler(ch)
+        except Exception as e:
+            self._failed(ch, e)
+        else:
+            self.consecutive = 0
+        dt = ticks_diff(ticks_ms(), start)
+        self.last_ms[ch.name] = dt
+        if dt > self.max_ms.get(ch.name, -1):
+            self.max_ms[ch.name] = dt
+        if dt > self.slow_ms:
+            self.slow += 1
+
+    def _failed(self, ch, e):
+        self.failures += 1
+        self.consecutive += 1
+        self.last_error = f"{ch.name}: {e!r}"
+        # Release what the handler left in the RX buffer, the channel would
+        # stay stuck on it otherwise
+        n = ch.rx.readable()
+        if n:
+            ch.finish_read(n)
+        ch.dropped += 1
+        if self.on_error is not None:
+            try:
+                self.on_error(ch, e)
+            except Exception:
+                pass  # Answering is best effort
+        ch.rx_xfer()
+
+    def healthy(self):
+        """
+        Return False once the handlers keep failing.
+        """
+        return self.consecutive < self.max_failures
+
+    def service(self, now):
+        """
+        Called from the main loop: reschedule stuck channels and feed the
+        watchdog while healthy. Nothing here touches the channels directly,
+        the main loop may have interrupted a USB callback or a handler.
+        :param now: The current time in milliseconds (ticks_ms).
+        :return: None
+        """
+        for ch in self.channels:
+            itf = ch.itf
+            if itf is None or not itf.is_open():
+                continue
+            if self._stalled(self._waiting, ch, now, ch.rx.readable()):
+                # Received but never handled
+                if self._schedule(ch._on_rx, None):
+                    self.rescheduled += 1
+            if self._stalled(self._missing, ch, now,
+                             (ch.rx.writable() and not itf.xfer_pending(ch.ep_out))
+                             or (ch.tx.readable() and not itf.xfer_pending(ch.ep_in))):
+                # A transfer that should be active is not; kick() checks
+                # again where no callback can race it
+                if self._schedule(self._kick, ch):
+                    self.kicks += 1
+        if self.wdt is not None and self.healthy():
+            self.wdt.feed()
+
+    def _stalled(self, since, ch, now, condition):
+        # True once condition held for stall_ms, then the timer restarts
+        if not condition:
+            if ch.name in since:
+                del since[ch.name]
+            return False
+        start = since.get(ch.name)
+        if start is None:
+            since[ch.name] = now
+            return False
+        if ticks_diff(now, start) < self.stall_ms:
+            return False
+        since[ch.name] = now
+        return True
+
+    def _schedule(self, func, arg):
+        try:
+            schedule(func, arg)
+        except RuntimeError:
+            return False  # Queue full, try again after the next stall_ms
+        return True
+
+    def _kick(self, ch):
+        # Called via micropython.schedule
+        ch.kick()
+
+    def stats(self):
+        """
+        Return the counters as a dict, with the slowest handler run per
+        channel as max_ms_<name>.
+        """
+        out = {"failures": self.failures, "consecutive": self.consecutive,
+               "slow": self.slow, "rescheduled": self.rescheduled,
+               "kicks": self.kicks}
+        for name, ms in self.max_ms.items():
+            out["max_ms_" + name] = ms
+        return out
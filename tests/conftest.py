@@ -0,0 +1,27 @@
+# Runs the device modules under CPython. tests/sim stands in for the
+# MicroPython firmware modules (machine, micropython, usb.device.core) and
+# the builtins the viper code uses; the host tools are imported from
+# linux-side-python-test.
+
+import os
+import sys
+
+import pytest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.dirname(_HERE)
+sys.path[:0] = [os.path.join(_HERE, "sim"), _ROOT,
+                os.path.join(_ROOT, "linux-side-python-test")]
+
+import firmware  # noqa: E402
+
+firmware.install()
+
+import micropython  # noqa: E402  (the stand-in from tests/sim)
+
+
+@pytest.fixture(autouse=True)
+def _empty_schedule():
+    micropython.clear_scheduled()
+    yield
+    micropython.clear_scheduled()
@@ -0,0 +1,34 @@
+# The WZab1 interface on a simulated board: descriptor and open handshake.
+
+import micropython
+
+
+class Descriptor:
+    """
+    Records what desc_cfg() declares.
+    """
+    def __init__(self):
+        self.interfaces = []
+        self.endpoints = []
+
+    def interface(self, *args, **kwargs):
+        self.interfaces.append(args)
+
+    def endpoint(self, *args):
+        self.endpoints.append(args)
+
+
+def open_interface(**kwargs):
+    """
+    Build a WZab1Interface and open it as the host would.
+    Keyword arguments go to WZab1Interface; snapshots default to off, so
+    nothing is written to the host's filesystem.
+    """
+    import main
+
+    kwargs.setdefault("snapshot", None)
+    wz = main.WZab1Interface(**kwargs)
+    wz.desc_cfg(Descriptor(), 0, 1, [])
+    wz.on_open()
+    micropython.run_scheduled()
+    return wz
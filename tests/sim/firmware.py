@@ -0,0 +1,36 @@
+# Installs the MicroPython firmware stand-ins under CPython: the modules in
+# this directory (machine, micropython, usb.device.core) on sys.path, the
+# builtins the viper code uses, and the time and gc extensions.
+
+import builtins
+import gc
+import os
+import sys
+import time
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def install():
+    """
+    Make the device modules importable under CPython; idempotent.
+    :return: None
+    """
+    if _HERE not in sys.path:
+        sys.path.insert(0, _HERE)
+    import micropython
+
+    builtins.micropython = micropython
+    builtins.const = micropython.const
+    builtins.uint = int
+    builtins.ptr8 = lambda buf: memoryview(buf).cast("B")
+    builtins.ptr16 = lambda buf: memoryview(buf).cast("B").cast("H")
+    # The firmware's clocks; ticks_diff ignores the 2**30 wrap, which no
+    # run is long enough to reach
+    time.ticks_ms = lambda: time.perf_counter_ns() // 1000000
+    time.ticks_us = lambda: time.perf_counter_ns() // 1000
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
+    time.sleep_ms = lambda ms: None
+    gc.mem_free = lambda: 100000
+    gc.mem_alloc = lambda: 10000
@@ -0,0 +1,76 @@
+# Stand-in for MicroPython's machine module under CPython.
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, *args, **kwargs):
+        self.v = 0
+        self.handler = None
+
+    def on(self):
+        self.v = 1
+
+    def off(self):
+        self.v = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self.v
+        self.v = v
+
+    def irq(self, trigger=None, handler=None):
+        self.handler = handler
+
+
+class SPI:
+    """
+    Records the bytes written, see panel.py for a display behind it.
+    """
+    def __init__(self, *args, **kwargs):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+
+
+class PWM:
+    def __init__(self, pin=None, freq=0, duty_u16=0):
+        self.duty = duty_u16
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self.duty
+        self.duty = value
+
+    def freq(self, value=None):
+        pass
+
+
+class I2C:
+    def __init__(self, *args, **kwargs):
+        raise OSError("no I2C bus in the simulator, pass a fake one")
+
+
+class WDT:
+    def __init__(self, id=0, timeout=5000):
+        self.timeout = timeout
+        self.fed = 0
+
+    def feed(self):
+        self.fed += 1
+
+
+def idle():
+    pass
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state):
+    pass
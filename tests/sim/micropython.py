@@ -0,0 +1,45 @@
+# Stand-in for MicroPython's micropython module under CPython.
+# schedule() queues the callbacks like the firmware does; a test runs them
+# with run_scheduled() where the firmware would, between bytecodes of the
+# main loop. viper and native code runs as plain Python.
+
+QUEUE_DEPTH = 8  # The firmware's default scheduler depth
+
+_queue = []
+
+
+def const(x):
+    return x
+
+
+def viper(func):
+    return func
+
+
+native = viper
+
+
+def schedule(func, arg):
+    if len(_queue) >= QUEUE_DEPTH:
+        raise RuntimeError("schedule queue full")
+    _queue.append((func, arg))
+
+
+def scheduled():
+    """
+    Return the number of queued callbacks.
+    """
+    return len(_queue)
+
+
+def run_scheduled():
+    """
+    Run the queued callbacks, including the ones they schedule.
+    """
+    while _queue:
+        func, arg = _queue.pop(0)
+        func(arg)
+
+
+def clear_scheduled():
+    del _queue[:]
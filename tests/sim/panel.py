@@ -0,0 +1,73 @@
+# An ST7789 behind a simulated SPI bus: the commands and data written are
+# decoded into a frame memory, so tests can compare what reached the panel.
+
+import struct
+from machine import Pin
+
+
+class PanelSPI:
+    """
+    Decodes CASET/RASET/RAMWR into the frame memory ram (RGB565 as sent,
+    row-major, width * height pixels). Other commands are only counted.
+    """
+    def __init__(self, dc, width=240, height=320):
+        self.dc = dc
+        self.width = width
+        self.height = height
+        self.ram = bytearray(width * height * 2)
+        self.window = (0, 0, 0, 0)
+        self.command = None
+        self.commands = 0
+        self.ramwr = 0  # RAMWR commands, i.e. windows sent
+        self.bytes = 0
+        self._arg = b""
+        self._pos = 0
+        self._odd = b""
+
+    def write(self, data):
+        data = bytes(data)
+        self.bytes += len(data)
+        if not self.dc.value():
+            self.command = data[0]
+            self.commands += 1
+            self._arg = b""
+            if self.command == 0x2C:
+                self.ramwr += 1
+                self._pos = 0
+                self._odd = b""
+            return
+        if self.command in (0x2A, 0x2B):
+            self._arg += data
+            if len(self._arg) >= 4:
+                start, end = struct.unpack(">HH", self._arg[:4])
+                x0, y0, x1, y1 = self.window
+                if self.command == 0x2A:
+                    self.window = (start, y0, end, y1)
+                else:
+                    self.window = (x0, start, x1, end)
+        elif self.command == 0x2C:
+            x0, y0, x1, y1 = self.window
+            columns = x1 - x0 + 1
+            data = self._odd + data
+            n = len(data) // 2 * 2
+            self._odd = data[n:]
+            for i in range(0, n, 2):
+                row, col = divmod(self._pos, columns)
+                if y0 + row > y1:
+                    break
+                off = ((y0 + row) * self.width + x0 + col) * 2
+                self.ram[off:off + 2] = data[i:i + 2]
+                self._pos += 1
+
+
+def make(width=240, height=320, rotation=0):
+    """
+    Return an (ST7789 driver, PanelSPI) pair.
+    """
+    import st7789py
+
+    dc = Pin()
+    spi = PanelSPI(dc, width, height)
+    tft = st7789py.ST7789(spi, width, height, reset=Pin(), cs=Pin(), dc=dc,
+                          rotation=rotation)
+    return tft, spi
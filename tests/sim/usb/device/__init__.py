@@ -0,0 +1,7 @@
+# Stand-in for micropython-lib's usb.device package.
+
+_device = None
+
+
+def get():
+    return _device
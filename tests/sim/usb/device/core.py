@@ -0,0 +1,102 @@
+# Stand-in for micropython-lib's usb.device.core under CPython.
+# Buffer behaves like the real one: the readable data always starts at index
+# 0 and a pending write starts where it ends. Interface keeps the submitted
+# transfers; a test plays the host with host_write() and host_read().
+
+import machine
+
+
+class Buffer:
+    def __init__(self, length):
+        self._b = memoryview(bytearray(length))
+        self._n = 0  # Readable bytes, from index 0
+        self._w = length  # Start of the pending write, length if none
+
+    def writable(self):
+        return len(self._b) - self._n
+
+    def readable(self):
+        return self._n
+
+    def pend_write(self, wmax=None):
+        self._w = self._n
+        end = (self._w + wmax) if wmax else len(self._b)
+        return self._b[self._w:end]
+
+    def finish_write(self, nbytes):
+        ist = machine.disable_irq()
+        try:
+            assert nbytes <= len(self._b) - self._w
+            if self._n != self._w:
+                # Data was read while the write was pending
+                self._b[self._n:self._n + nbytes] = self._b[self._w:self._w + nbytes]
+            self._n += nbytes
+            self._w = len(self._b)
+        finally:
+            machine.enable_irq(ist)
+
+    def write(self, data):
+        m = self.pend_write()
+        n = min(len(m), len(data))
+        if n:
+            m[:n] = data[:n]
+            self.finish_write(n)
+        return n
+
+    def pend_read(self):
+        return self._b[:self._n]
+
+    def finish_read(self, nbytes):
+        if not nbytes:
+            return
+        assert nbytes <= self._n
+        i = self._n - nbytes
+        self._n = i
+        if i:
+            self._b[:i] = self._b[nbytes:nbytes + i]
+
+
+class Interface:
+    def __init__(self):
+        self.pending = {}  # Endpoint -> (buffer, callback)
+        self.open = False
+
+    def is_open(self):
+        return self.open
+
+    def on_open(self):
+        self.open = True
+
+    def xfer_pending(self, ep):
+        return ep in self.pending
+
+    def submit_xfer(self, ep, data, done_cb=None):
+        if ep in self.pending:
+            raise RuntimeError("xfer_pending")
+        self.pending[ep] = (data, done_cb)
+        return True
+
+    # The host side
+
+    def host_write(self, ep, data):
+        """
+        Complete the pending OUT transfer of ep with data.
+        :return: The number of bytes the transfer took.
+        """
+        buf, cb = self.pending.pop(ep)
+        n = min(len(buf), len(data))
+        buf[:n] = data[:n]
+        cb(ep, 0, n)
+        return n
+
+    def host_read(self, ep):
+        """
+        Complete the pending IN transfer of ep.
+        :return: The bytes sent, or None if no transfer is pending.
+        """
+        if ep not in self.pending:
+            return None
+        buf, cb = self.pending.pop(ep)
+        data = bytes(buf)
+        cb(ep, 0, len(data))
+        return data
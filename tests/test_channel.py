@@ -0,0 +1,54 @@
+import struct
+
+import micropython
+from image_stream import MAGIC_IMAGE, RECT_FORMAT, ENC_RAW
+from wz1_protocol import decode_ack, STATUS_OK
+
+
+def test_full_rx_buffer_does_not_wedge_the_channel():
+    from board import open_interface
+
+    wz = open_interface(config={"image": {}})
+    ch = wz.image
+    payload = bytes(range(256)) * 30  # 240 x 16 pixels
+    message = MAGIC_IMAGE + struct.pack(RECT_FORMAT, 0, 0, 240, 16, ENC_RAW) + payload
+    sizes = []
+    while sum(sizes) < len(message):
+        # With the buffer full no OUT transfer is left pending; handling the
+        # data must start one again
+        assert ch.ep_out in wz.pending
+        sizes.append(wz.host_write(ch.ep_out, message[sum(sizes):]))
+        micropython.run_scheduled()
+    assert sizes[0] == len(ch.rx._b)
+    assert decode_ack(wz.host_read(ch.ep_in)).status == STATUS_OK
+    assert wz.image_stream.count == 1 and ch.ep_out in wz.pending
+
+
+def test_full_data_buffer_is_read_and_received_again():
+    from board import open_interface
+
+    wz = open_interface()
+    ch = wz.data
+    frame = b"User:1;" + b"x" * (len(ch.rx._b) - 7)
+    assert wz.host_write(ch.ep_out, frame) == len(frame)
+    assert ch.ep_out not in wz.pending
+    micropython.run_scheduled()
+    wz.host_read(ch.ep_in)
+    assert ch.ep_out in wz.pending
+    wz.host_write(ch.ep_out, b"User:2")
+    micropython.run_scheduled()
+    assert decode_ack(wz.host_read(ch.ep_in)).status == STATUS_OK
+
+
+def test_image_pipe_is_opt_in():
+    import main
+    from board import Descriptor
+
+    for config, pairs in ((None, 2), ({"image": {"rxlen": 2048}}, 3)):
+        wz = main.WZab1Interface(config, snapshot=None)
+        desc = Descriptor()
+        wz.desc_cfg(desc, 0, 1, [])
+        assert len(desc.endpoints) == wz.num_eps() == 2 * pairs
+        assert (wz.image is None) == (pairs == 2)
+        assert (wz.image_stream is None) == (pairs == 2)
+    assert len(wz.image.rx._b) == 2048
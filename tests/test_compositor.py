@@ -0,0 +1,125 @@
+import random
+import struct
+
+import pytest
+
+import panel
+from compositor import Compositor
+
+
+def draw(tft, compositor, seed, colors=3, frames=30):
+    # Random fills, blits and raw pixel writes, most of them in frames
+    rnd = random.Random(seed)
+    palette = [rnd.randrange(65536) for _ in range(colors)] + [0]
+    for _ in range(frames):
+        framed = rnd.random() < 0.7 and compositor is not None
+        if framed:
+            compositor.begin()
+        for _ in range(rnd.randrange(1, 12)):
+            w, h = rnd.randrange(1, 60), rnd.randrange(1, 40)
+            x, y = rnd.randrange(0, 240 - w), rnd.randrange(0, 320 - h)
+            k = rnd.random()
+            if k < 0.5:
+                tft.fill_rect(x, y, w, h, rnd.choice(palette))
+            elif k < 0.9:
+                a, b = rnd.choice(palette), rnd.choice(palette)
+                buf = b"".join(struct.pack(">H", a if rnd.random() < 0.5 else b)
+                               for _ in range(w * h))
+                tft.blit_buffer(buf, x, y, w, h)
+            else:
+                tft.pixel(x, y, rnd.choice(palette))
+        if framed:
+            compositor.end()
+
+
+def composed(seed, bpp=16, colors=3, **kwargs):
+    tft, spi = panel.make()
+    # A region smaller than the screen, so calls are also clipped
+    compositor = Compositor(tft, 3, 7, 201, 250, bpp=bpp, **kwargs)
+    draw(tft, compositor, seed, colors)
+    return spi, compositor
+
+
+def direct(seed, colors=3):
+    tft, spi = panel.make()
+    draw(tft, None, seed, colors)
+    return spi
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_frames_reach_the_panel_like_direct_drawing(seed):
+    spi, _ = composed(seed)
+    assert spi.ram == direct(seed).ram
+
+
+def test_frame_damage_is_merged_into_fewer_windows():
+    tft, spi = panel.make()
+    compositor = Compositor(tft, 0, 0, 240, 320)
+    compositor.begin()
+    for i in range(10):
+        # Touching text cells, e.g. the characters of a value
+        tft.fill_rect(20 + 8 * i, 100, 8, 16, 0xF800)
+    tft.fill_rect(200, 300, 4, 4, 0x001F)
+    before = spi.ramwr
+    assert compositor.end() == 2
+    assert spi.ramwr - before == 2
+    stats = compositor.stats()
+    assert (stats["rects"], stats["windows"]) == (11, 2)
+    assert (stats["total_rects"], stats["total_windows"]) == (11, 2)
+
+
+def test_raw_writes_are_never_covered_by_a_merge():
+    tft, spi = panel.make()
+    ref, ref_spi = panel.make()
+    compositor = Compositor(tft, 0, 0, 240, 320)
+    for t in (tft, ref):
+        t.fill_rect(0, 0, 240, 320, 0x1111)
+    compositor.begin()
+    tft.fill_rect(10, 10, 20, 20, 0x2222)
+    tft.pixel(40, 15, 0x3333)  # Behind the canvas' back
+    tft.fill_rect(60, 10, 20, 20, 0x2222)
+    compositor.end()
+    ref.fill_rect(10, 10, 20, 20, 0x2222)
+    ref.pixel(40, 15, 0x3333)
+    ref.fill_rect(60, 10, 20, 20, 0x2222)
+    assert spi.ram == ref_spi.ram
+    # The two fills would merge, but not across the unknown pixel
+    assert compositor.stats()["windows"] >= 2
+
+
+@pytest.mark.parametrize("bpp", (4, 8))
+@pytest.mark.parametrize("colors", (3, 14, 40, 300))
+def test_indexed_canvas_matches_direct_drawing(bpp, colors):
+    # More colours than the palette holds fall back to direct drawing
+    spi, compositor = composed(colors, bpp=bpp, colors=colors)
+    assert spi.ram == direct(colors, colors=colors).ram
+    assert compositor.stats()["colors"] <= 1 << bpp
+
+
+def test_indexed_canvas_size():
+    tft, _ = panel.make()
+    assert len(Compositor(tft, 0, 0, 240, 320, bpp=4).canvas) == 38400
+    with pytest.raises(ValueError):
+        Compositor(tft, 0, 0, 240, 320, bpp=2)
+
+
+def test_frames_with_more_damage_than_the_array_holds():
+    spi, compositor = composed(5, max_damage=2)
+    assert spi.ram == direct(5).ram
+    assert len(compositor.damage) == 8 and compositor.ndamage == 0
+
+
+def test_printer_composes_only_when_asked():
+    from lcd_printer import LCDPrinter
+
+    screens = []
+    for compose in (None, True):
+        tft, spi = panel.make()
+        printer = LCDPrinter(tft, compose=compose)
+        assert (printer.compositor is not None) == bool(compose)
+        printer.print_usage({"User": "12.5", "System": "3", "Idle": "84.5",
+                             "RAM_USED": "3.1 GiB", "OUT_OF": "16 GiB"})
+        printer.show_page("cpu")
+        printer.print_usage({"CPU0": "7", "CPU5": "93"})
+        screens.append(bytes(spi.ram))
+    assert screens[0] == screens[1]
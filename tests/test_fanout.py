@@ -0,0 +1,131 @@
+import struct
+import threading
+
+from wz1_fanout import FanoutManager, DeviceWorker
+from wz1_protocol import ACK_FORMAT, REPLY_ACK, STATUS_OK
+
+
+class FakeEndpoint:
+    def __init__(self, device):
+        self.device = device
+
+    def write(self, payload, timeout):
+        self.device.receive(bytes(payload))
+
+    def read(self, size, timeout):
+        return memoryview(self.device.reply())
+
+
+class FakeDevice:
+    """
+    A panel answering every frame with an ack. A gate, if given, holds each
+    frame until the test releases it, like a stalled panel.
+    """
+    def __init__(self, name, gate=None, fail=False):
+        self.name = name
+        self.gate = gate
+        self.fail = fail
+        self.frames = []
+        self.received = threading.Event()
+
+    def out_ep(self, channel):
+        return FakeEndpoint(self)
+
+    def in_ep(self, channel):
+        return FakeEndpoint(self)
+
+    def receive(self, payload):
+        if self.fail:
+            raise OSError("device unplugged")
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.frames.append(payload)
+        self.received.set()
+
+    def reply(self):
+        return struct.pack(ACK_FORMAT, REPLY_ACK, STATUS_OK, len(self.frames),
+                           10, 200, 0, 50000)
+
+
+def counting_source(device, index):
+    count = [0]
+
+    def source():
+        count[0] += 1
+        return {"User": index, "n": count[0]}
+    return source
+
+
+def wait_for(predicate, timeout=5):
+    done = threading.Event()
+    for _ in range(int(timeout * 100)):
+        if predicate():
+            return True
+        done.wait(0.01)
+    return predicate()
+
+
+def test_every_device_gets_its_own_source():
+    devices = [FakeDevice(f"panel{i}") for i in range(3)]
+    mgr = FanoutManager(devices, counting_source, period=0)
+    mgr.start()
+    try:
+        mgr.tick()
+        assert wait_for(lambda: all(d.frames for d in devices))
+    finally:
+        mgr.stop()
+    assert [d.frames for d in devices] == [
+        [b"User:0;n:1"], [b"User:1;n:1"], [b"User:2;n:1"]]
+    summary = mgr.summary()
+    assert summary["panel1"]["sent"] == 1
+
+
+def test_stalled_device_does_not_hold_back_the_others():
+    gate = threading.Event()
+    slow = FakeDevice("slow", gate=gate)
+    fast = FakeDevice("fast")
+    mgr = FanoutManager([slow, fast], counting_source, period=0, queue_len=2)
+    mgr.start()
+    try:
+        mgr.tick()
+        # The first frame is stuck in the stalled panel's write
+        assert wait_for(lambda: not mgr.workers[0].queue)
+        for i in range(1, 10):
+            mgr.tick()
+            n = i + 1
+            assert wait_for(lambda: len(fast.frames) == n)
+        assert slow.frames == []
+        gate.set()
+        assert wait_for(lambda: len(slow.frames) == 3)
+    finally:
+        gate.set()
+        mgr.stop()
+    # The stalled panel got its first frame and then only the newest two
+    assert slow.frames == [b"User:0;n:1", b"User:0;n:9", b"User:0;n:10"]
+    assert mgr.summary()["slow"]["superseded"] == 7
+    assert mgr.summary()["fast"]["superseded"] == 0
+    assert mgr.summary()["fast"]["acks"] == 10
+
+
+def test_failing_device_is_counted_and_isolated():
+    broken = FakeDevice("broken", fail=True)
+    ok = FakeDevice("ok")
+    mgr = FanoutManager([broken, ok], counting_source, period=0)
+    mgr.start()
+    try:
+        mgr.tick()
+        mgr.tick()
+        assert wait_for(lambda: len(ok.frames) == 2)
+        assert wait_for(lambda: mgr.workers[0].errors == 2)
+    finally:
+        mgr.stop()
+    assert isinstance(mgr.workers[0].last_error, OSError)
+    assert mgr.summary()["ok"]["sent"] == 2
+
+
+def test_worker_queue_drops_the_oldest_frame():
+    worker = DeviceWorker(FakeDevice("idle"), None, queue_len=2)
+    for payload in (b"a", b"b", b"c"):
+        worker.submit(payload)
+    assert list(worker.queue) == [b"b", b"c"]
+    assert worker.superseded == 1
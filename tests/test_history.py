@@ -0,0 +1,111 @@
+from array import array
+
+import pytest
+
+import history
+from parser import NO_NUMBER
+from wz1_protocol import decode_history
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(history, "ticks_ms", lambda: now[0])
+    return now
+
+
+def feed(h, numbers, clock, seconds, value=lambda s: s, gap=()):
+    # Two frames a second; seconds in gap get no frames
+    start = clock[0] // 1000
+    for s in range(start + 1, start + seconds + 1):
+        for ms in (300, 700):
+            clock[0] = (s - 1) * 1000 + ms
+            if s not in gap:
+                numbers[0] = value(s) * 100
+                h.record()
+        clock[0] = s * 1000
+        h.service(clock[0])
+
+
+def test_tiers_roll_up_min_max_avg(clock):
+    numbers = array("i", [0, NO_NUMBER])
+    h = history.History(["A", "B"], numbers)
+    feed(h, numbers, clock, 130)
+    period, open_s, buckets = decode_history(h.dump("A", 1))
+    assert (period, open_s, len(buckets)) == (1, 0, 60)
+    assert buckets[-1] == (130, 130, 130) and buckets[0] == (71, 71, 71)
+    period, open_s, buckets = decode_history(h.dump("A", 10))
+    assert len(buckets) == 13 and buckets[0] == (1, 10, 5.5)
+    period, open_s, buckets = decode_history(h.dump("A", 60))
+    assert open_s == 10 and buckets == [(1, 60, 30.5), (61, 120, 90.5)]
+    # Keys without numeric values only have gaps
+    assert set(decode_history(h.dump("B", 10))[2]) == {None}
+
+
+def test_seconds_without_frames_are_gaps(clock):
+    numbers = array("i", [0])
+    h = history.History(["A"], numbers, stale_ms=1500)
+    feed(h, numbers, clock, 50, gap=range(11, 41))
+    buckets = decode_history(h.dump("A", 10))[2]
+    assert buckets[0] == (1, 10, 5.5)
+    # The last values count until they are stale_ms old
+    assert buckets[1] == (10, 10, 10)
+    assert buckets[2] is None and buckets[3] is None
+    assert buckets[4] == (41, 50, 45.5)
+
+
+def test_long_stall_is_capped_at_the_span(clock):
+    numbers = array("i", [0])
+    h = history.History(["A"], numbers, tiers=((1, 10), (10, 6)))
+    feed(h, numbers, clock, 20)
+    clock[0] += 3600 * 1000
+    h.service(clock[0])
+    assert h.seconds == 3620
+    assert decode_history(h.dump("A", 10))[2] == [None] * 6
+
+
+def test_unknown_key_or_period(clock):
+    h = history.History(["A"], array("i", [0]))
+    assert h.dump("C", 10) is None
+    assert h.dump("A", 5) is None
+
+
+def test_storage_is_fixed(clock):
+    h = history.History(["A", "B", "C"], array("i", [0, 0, 0]))
+    nbytes = h.nbytes()
+    assert nbytes == (4 * 60 * 3 * 1 + 30) + 2 * (4 * 60 * 3 * 3 + 30)
+    feed(h, h.numbers, clock, 200)
+    assert h.nbytes() == nbytes
+
+
+def test_hist_command(clock):
+    import micropython
+    from board import open_interface
+
+    wz = open_interface()
+    wz.history._last_ms = 0
+    data, control = wz.data, wz.control
+
+    def request(ch, payload):
+        wz.host_write(ch.ep_out, payload)
+        micropython.run_scheduled()
+        return bytes(wz.host_read(ch.ep_in))
+
+    for s in range(1, 25):
+        clock[0] = s * 1000 - 500
+        request(data, f"User:{s};System:{s * 2}.5;Idle:x".encode())
+        clock[0] = s * 1000
+        wz.history.service(clock[0])
+    period, open_s, buckets = decode_history(request(control, b"HIST:User:10"))
+    assert (period, open_s) == (10, 4)
+    assert buckets[-2:] == [(1, 10, 5.5), (11, 20, 15.5)]
+    period, _, buckets = decode_history(request(control, b"HIST:System:1"))
+    assert period == 1 and buckets[-1] == (48.5, 48.5, 48.5)
+    # The period defaults to 60 s, nothing closed yet
+    period, open_s, buckets = decode_history(request(control, b"HIST:User"))
+    assert (period, open_s, buckets) == (60, 24, [])
+    # A key without numbers has only gaps
+    buckets = decode_history(request(control, b"HIST:Idle:1"))[2]
+    assert buckets and set(buckets) == {None}
+    assert request(control, b"HIST:Nope:10") == b"Error: Unknown key or period"
+    assert request(control, b"HIST:User:abc").startswith(b"Error")
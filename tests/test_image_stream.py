@@ -0,0 +1,62 @@
+import struct
+
+import panel
+from image_stream import (ImageStream, MAGIC_IMAGE, MAGIC_FRAME, RECT_FORMAT,
+                          ENC_RAW, ENC_RLE, ENC_FILL)
+
+
+def rect(x, y, w, h, enc, payload):
+    return struct.pack(RECT_FORMAT, x, y, w, h, enc) + payload
+
+
+def stream():
+    tft, spi = panel.make()
+    done = []
+    return ImageStream(tft, lambda ok, us: done.append(ok)), spi, done
+
+
+def feed(s, data, chunk):
+    for i in range(0, len(data), chunk):
+        s.feed(memoryview(data[i:i + chunk]))
+
+
+def pixels(spi, x, y, w, h):
+    row = 2 * spi.width
+    return b"".join(bytes(spi.ram[(y + j) * row + 2 * x:(y + j) * row + 2 * (x + w)])
+                    for j in range(h))
+
+
+def test_frame_of_all_encodings():
+    s, spi, done = stream()
+    raw = bytes(range(2 * 3 * 2))
+    frame = (MAGIC_FRAME + struct.pack("<H", 3)
+             + rect(0, 0, 3, 2, ENC_RAW, raw)
+             + rect(10, 10, 4, 1, ENC_RLE, struct.pack("<H", 4) + b"\xab\xcd")
+             + rect(20, 20, 2, 2, ENC_FILL, b"\x12\x34"))
+    for chunk in (1, 3, 64):
+        feed(s, frame, chunk)
+    assert done == [True] * 3 and s.rects == 9
+    assert pixels(spi, 0, 0, 3, 2) == raw
+    assert pixels(spi, 10, 10, 4, 1) == b"\xab\xcd" * 4
+    assert pixels(spi, 20, 20, 2, 2) == b"\x12\x34" * 4
+
+
+def test_rejected_message_is_reported_once_then_skipped():
+    good = MAGIC_IMAGE + rect(5, 5, 2, 1, ENC_FILL, b"\xff\xff")
+    # A rectangle outside the screen, its payload and more junk follow
+    bad = MAGIC_IMAGE + rect(230, 0, 20, 1, ENC_RAW, b"\x49" * 40) + b"xIMGjunk"
+    for chunk in (1, 2, 3, 7, 200):
+        s, spi, done = stream()
+        feed(s, bad + good, chunk)
+        assert done == [False, True], chunk
+        assert pixels(spi, 5, 5, 2, 1) == b"\xff\xff" * 2
+
+
+def test_bad_magic_resyncs_inside_the_rejected_bytes():
+    s, spi, done = stream()
+    # The real magic starts one byte into the first four
+    feed(s, b"F" + MAGIC_FRAME + struct.pack("<H", 0), 1)
+    assert done == [False, True]
+    feed(s, b"xx" + MAGIC_IMAGE[:2], 64)
+    feed(s, MAGIC_IMAGE[2:] + rect(0, 0, 1, 1, ENC_FILL, b"\x01\x02"), 64)
+    assert done == [False, True, False, True]
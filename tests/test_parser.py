@@ -0,0 +1,65 @@
+import pytest
+
+from parser import UsageParser, MAX_FIELDS, NO_NUMBER
+
+
+def frame(values):
+    return ";".join(f"{k}:{v}" for k, v in values.items()).encode()
+
+
+def test_more_than_sixteen_fields():
+    keys = [f"K{i}" for i in range(MAX_FIELDS)]
+    parser = UsageParser(keys)
+    values = {key: str(i) for i, key in enumerate(keys)}
+    assert parser.parse(frame(values)) == values
+    assert parser.numbers[MAX_FIELDS - 1] == (MAX_FIELDS - 1) * 100
+    with pytest.raises(ValueError):
+        parser.parse(frame(values) + b";Extra:1")
+
+
+def test_whitespace_is_trimmed_and_a_trailing_semicolon_allowed():
+    parser = UsageParser(["User", "RAM_USED"])
+    assert parser.parse(b" User : 12.5 ;\tRAM_USED:3 GiB ; ") == {
+        "User": "12.5", "RAM_USED": "3 GiB"}
+    assert list(parser.numbers) == [1250, 300]
+    for bad in (b"", b";", b"User:1;;RAM_USED:2", b"User", b"User:1:2"):
+        with pytest.raises(ValueError):
+            parser.parse(bad)
+
+
+def test_only_changed_values_are_returned():
+    parser = UsageParser(["User", "System"])
+    parser.parse(b"User:1;System:2")
+    assert parser.parse(b"User:1;System:3") == {"System": "3"}
+    assert parser.parse(b"User:1;System:3") == {}
+    assert parser.text == ["1", "3"]
+
+
+def test_unknown_keys_are_passed_on():
+    parser = UsageParser(["User"])
+    assert parser.parse(b"User:1;Fan:1200 rpm") == {"User": "1",
+                                                     "Fan": "1200 rpm"}
+    # Unknown keys have no slot, so they are always passed on
+    assert parser.parse(b"User:1;Fan:1200 rpm") == {"Fan": "1200 rpm"}
+
+
+def test_values_longer_than_the_slot_are_always_changed():
+    parser = UsageParser(["Name", "CPU"], max_len=4)
+    assert parser.parse(b"Name:abcdefgh;CPU:x") == {"Name": "abcdefgh",
+                                                    "CPU": "x"}
+    assert parser.parse(b"Name:abcdefgh;CPU:x") == {"Name": "abcdefgh"}
+    assert parser.numbers[1] == NO_NUMBER
+
+
+def test_frame_with_every_slot_key_is_acked():
+    import micropython
+    from board import open_interface
+    from wz1_protocol import decode_ack, STATUS_OK
+
+    wz = open_interface()
+    keys = wz.parser.keys
+    assert len(keys) > 16
+    wz.host_write(wz.data.ep_out, frame({key: i for i, key in enumerate(keys)}))
+    micropython.run_scheduled()
+    assert decode_ack(wz.host_read(wz.data.ep_in)).status == STATUS_OK
+    assert wz.supervisor.failures == 0
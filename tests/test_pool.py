@@ -0,0 +1,61 @@
+import random
+from types import SimpleNamespace
+
+import panel
+from fonts import vga2_8x8 as font8
+from fonts import vga2_16x16 as font16
+from st7789py import BufferPool
+
+
+def test_requests_are_served_from_the_smallest_class():
+    pool = BufferPool((2048, 640))
+    small = pool.get(100)
+    assert len(small) == 100 and small.obj is pool.buffers[0]
+    assert pool.get(1000).obj is pool.buffers[1]
+    assert pool.get(100) is small  # Views are cached per length
+    big = pool.get(4096)
+    assert len(big) == 4096 and pool.misses == 1
+    assert pool.stats() == {"views": 2, "misses": 1}
+
+
+def test_view_cache_is_bounded():
+    pool = BufferPool((640,), max_views=4)
+    for n in range(1, 10):
+        pool.get(n)
+    assert pool.stats()["views"] == 4
+
+
+# A converted bitmap module with two 12x10 images of 2 bits per pixel
+_rnd = random.Random(7)
+BITMAP = SimpleNamespace(
+    WIDTH=12, HEIGHT=10, BPP=2, PALETTE=[0x0000, 0xF800, 0x07E0, 0x1234],
+    BITMAP=bytes(_rnd.randrange(256) for _ in range(2 * 12 * 10 * 2 // 8)))
+
+
+def draw(pool_sizes):
+    rnd = random.Random(1)
+    tft, spi = panel.make()
+    tft.pool = BufferPool(pool_sizes)
+    for _ in range(100):
+        k = rnd.random()
+        color, background = rnd.randrange(65536), rnd.randrange(65536)
+        x, y = rnd.randrange(200), rnd.randrange(280)
+        if k < 0.3:
+            tft.fill_rect(x, y, rnd.randrange(1, 40), rnd.randrange(1, 40), color)
+        elif k < 0.5:
+            tft.pixel(x, y, color)
+        elif k < 0.6:
+            tft.line(x, y, rnd.randrange(240), rnd.randrange(320), color)
+        elif k < 0.7:
+            tft.bitmap(BITMAP, x, y, rnd.randrange(2))
+        elif k < 0.8:
+            tft.pbitmap(BITMAP, x, y, rnd.randrange(2))
+        else:
+            tft.text(rnd.choice([font8, font16]), "Wq7!", x, y, color,
+                     background)
+    return spi.ram
+
+
+def test_pooled_drawing_matches_fresh_buffers():
+    # Without classes every request gets a fresh buffer
+    assert draw((640, 2048)) == draw(())
@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+import pytest
+
+import micropython
+import panel
+import snapshot
+import tft_config
+from fonts import vga2_8x8 as font_small
+from snapshot import Snapshot
+
+
+class FakePrinter:
+    def __init__(self, usage=None, page="overview"):
+        self.last_usage = usage
+        self.pages = SimpleNamespace(active=SimpleNamespace(name=page))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(snapshot, "ticks_ms", lambda: now[0])
+    return now
+
+
+def test_newest_slot_is_loaded(tmp_path, clock):
+    path = str(tmp_path)
+    snap = Snapshot(FakePrinter(), ["User", "CPU0"], path, slots=3)
+    assert snap.load() is None
+    for i in range(5):
+        assert snap.save(f"cpu\nUser:{i}".encode())
+    assert len(list(tmp_path.iterdir())) == 3
+    assert Snapshot(FakePrinter(), [], path, slots=3).load() == ("cpu", b"User:4")
+
+
+def test_torn_slot_falls_back_to_the_previous_one(tmp_path, clock):
+    path = str(tmp_path)
+    snap = Snapshot(FakePrinter(), [], path)
+    snap.save(b"overview\nUser:1")
+    snap.save(b"overview\nUser:2")
+    newest = tmp_path / f"{snap.seq % snap.slots}.bin"
+    newest.write_bytes(newest.read_bytes()[:-2])
+    again = Snapshot(FakePrinter(), [], path)
+    assert again.load() == ("overview", b"User:1")
+    assert again.seq == 1
+    # The next write goes after the newest intact slot
+    again.save(b"overview\nUser:3")
+    assert Snapshot(FakePrinter(), [], path).load() == ("overview", b"User:3")
+
+
+def test_service_writes_changes_at_most_once_per_interval(tmp_path, clock):
+    printer = FakePrinter()
+    snap = Snapshot(printer, ["User", "CPU0"], str(tmp_path), interval=60)
+    clock[0] = 61000
+    snap.service(clock[0])
+    assert snap.writes == 0  # Nothing received yet
+    printer.last_usage = {"User": 12, "CPU0": 7, "Other": 1}
+    snap.service(30000 + clock[0])
+    assert snap.writes == 0
+    clock[0] = 125000
+    snap.service(clock[0])
+    assert snap.writes == 1
+    assert snap.load() == ("overview", b"User:12;CPU0:7")
+    clock[0] = 190000
+    snap.service(clock[0])
+    assert snap.writes == 1  # Unchanged
+    printer.pages.active.name = "cpu"
+    clock[0] = 250000
+    snap.service(clock[0])
+    assert snap.writes == 2
+
+
+def test_boot_restores_the_screen_marked_stale(tmp_path, clock, monkeypatch):
+    from board import open_interface
+
+    def boot():
+        tft, spi = panel.make()
+        monkeypatch.setattr(tft_config, "config", lambda *args: tft)
+        return open_interface(snapshot=str(tmp_path)), spi
+
+    def send(wz, ch, frame):
+        wz.host_write(ch.ep_out, frame)
+        micropython.run_scheduled()
+        wz.host_read(ch.ep_in)
+
+    wz, spi = boot()
+    assert not wz.lcd_printer.stale
+    send(wz, wz.data, b"User:12;System:34;Idle:54;CPU0:7")
+    send(wz, wz.control, b"PAGE:cpu")
+    clock[0] = 61000
+    wz.snapshot.service(clock[0])
+    assert wz.snapshot.writes == 1
+    shown = bytes(spi.ram)
+
+    wz, spi = boot()
+    printer = wz.lcd_printer
+    assert printer.stale and printer.pages.active.name == "cpu"
+    assert printer.last_usage["CPU0"] == "7"
+    # Only the stale marker in the top rows differs from the screen before
+    # the reset
+    row = 2 * spi.width
+    changed = {i // row for i in range(0, len(shown), 2)
+               if spi.ram[i:i + 2] != shown[i:i + 2]}
+    assert changed and max(changed) < 1 + font_small.HEIGHT
+    send(wz, wz.data, b"User:12")
+    assert not printer.stale
+    assert bytes(spi.ram) == shown
+
+
+def test_snapshot_with_every_slot_key_is_restored(tmp_path, clock, monkeypatch):
+    from board import open_interface
+
+    wz = open_interface(snapshot=str(tmp_path))
+    keys = wz.parser.keys
+    assert len(keys) > 16
+    wz.lcd_printer.last_usage = {key: str(i) for i, key in enumerate(keys)}
+    wz.snapshot.service(61000)
+    assert wz.snapshot.writes == 1
+    wz = open_interface(snapshot=str(tmp_path))
+    assert wz.lcd_printer.stale
+    assert wz.lcd_printer.last_usage[keys[-1]] == str(len(keys) - 1)
+
+
+@pytest.mark.parametrize("payload", (b"\xff\xfe\nUser:1", b"cpu\nUser",
+                                     b"cpu\n" + b"K:1;" * 40))
+def test_boot_with_a_bad_snapshot(tmp_path, clock, payload):
+    from board import open_interface
+
+    Snapshot(FakePrinter(), [], str(tmp_path)).save(payload)
+    wz = open_interface(snapshot=str(tmp_path))
+    assert not wz.lcd_printer.stale
+    # The bad snapshot is gone, the next boot starts clean
+    assert wz.snapshot.load() is None and not list(tmp_path.iterdir())
+
+
+def test_boot_when_drawing_the_snapshot_fails(tmp_path, clock, monkeypatch):
+    from board import open_interface
+    from lcd_printer import LCDPrinter
+
+    Snapshot(FakePrinter(), [], str(tmp_path)).save(b"cpu\nUser:1")
+
+    def restore(self, usage_dict, page):
+        raise IndexError
+
+    monkeypatch.setattr(LCDPrinter, "restore", restore)
+    wz = open_interface(snapshot=str(tmp_path))
+    assert wz.snapshot.load() is None
@@ -0,0 +1,44 @@
+import panel
+import st7789py as st7789
+from fonts import vga2_8x8 as font
+from static_layers import StaticLayerCache, render_text
+
+RED = st7789.RED
+
+
+def test_least_recently_used_layers_are_dropped():
+    tft, _ = panel.make()
+    # Each 4 character layer is 32 x 8 pixels, 512 bytes
+    cache = StaticLayerCache(tft, max_bytes=3 * 512)
+    for name in ("a", "b", "c"):
+        cache.get(name, font, name * 4)
+    cache.get("a", font, "aaaa")  # Used again, "b" is now the oldest
+    cache.get("d", font, "dddd")
+    assert sorted(cache.layers) == ["a", "c", "d"]
+    assert cache.nbytes == 3 * 512 and cache.evictions == 1
+    # A layer bigger than the budget is still kept, alone
+    cache.get("big", font, "x" * 20)
+    assert list(cache.layers) == ["big"] and cache.nbytes == 20 * 8 * 8 * 2
+    cache.clear()
+    assert cache.nbytes == 0 and not cache.layers
+
+
+def test_layer_is_rendered_again_for_the_other_byte_order():
+    tft, _ = panel.make()
+    cache = StaticLayerCache(tft)
+    blob = cache.get("t", font, "Title", RED)[0]
+    assert cache.get("t", font, "Title", RED)[0] is blob
+    tft.needs_swap = not tft.needs_swap
+    flipped = cache.get("t", font, "Title", RED)[0]
+    assert bytes(flipped) != bytes(blob)
+    assert bytes(flipped) == bytes(render_text(tft, font, "Title", RED)[0])
+    assert cache.nbytes == len(flipped)
+
+
+def test_persisted_layer_of_the_other_byte_order_is_not_loaded(tmp_path):
+    tft, _ = panel.make()
+    saved = StaticLayerCache(tft, str(tmp_path)).get("t", font, "Title", RED)[0]
+    tft.needs_swap = not tft.needs_swap
+    blob = StaticLayerCache(tft, str(tmp_path)).get("t", font, "Title", RED)[0]
+    assert bytes(blob) != bytes(saved)
+    assert bytes(blob) == bytes(render_text(tft, font, "Title", RED)[0])
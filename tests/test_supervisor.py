@@ -0,0 +1,126 @@
+import pytest
+
+import channel
+import machine
+import micropython
+import supervisor
+from wz1_protocol import decode_ack, STATUS_OK, STATUS_ERROR
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(supervisor, "ticks_ms", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def wz(clock):
+    from board import open_interface
+
+    wz = open_interface()
+    wz.supervisor.wdt = machine.WDT()
+    return wz
+
+
+def send(wz, frame):
+    wz.host_write(wz.data.ep_out, frame)
+    micropython.run_scheduled()
+    reply = wz.host_read(wz.data.ep_in)
+    return None if reply is None else decode_ack(reply)
+
+
+def service(wz, clock, ms):
+    clock[0] = ms
+    wz.supervisor.service(ms)
+    micropython.run_scheduled()
+
+
+def fail(wz):
+    def print_usage(usage_dict):
+        raise ZeroDivisionError
+    wz.lcd_printer.print_usage = print_usage
+
+
+def test_failing_handler_is_answered_and_the_channel_recovers(wz):
+    assert send(wz, b"User:1").status == STATUS_OK
+    print_usage = wz.lcd_printer.print_usage
+    fail(wz)
+    assert send(wz, b"User:2").status == STATUS_ERROR
+    assert "ZeroDivisionError" in wz.supervisor.last_error
+    wz.lcd_printer.print_usage = print_usage
+    assert send(wz, b"User:3").status == STATUS_OK
+    stats = wz.supervisor.stats()
+    assert (stats["failures"], stats["consecutive"]) == (1, 0)
+    assert wz.data.rx.readable() == 0
+
+
+def test_data_left_by_a_full_schedule_queue_is_handled(wz, clock, monkeypatch):
+    def full(func, arg):
+        raise RuntimeError("schedule queue full")
+
+    monkeypatch.setattr(channel, "schedule", full)
+    assert send(wz, b"User:4") is None
+    monkeypatch.setattr(channel, "schedule", micropython.schedule)
+    service(wz, clock, 100)
+    assert wz.host_read(wz.data.ep_in) is None  # Not waiting long enough
+    service(wz, clock, 100 + wz.supervisor.stall_ms)
+    assert decode_ack(wz.host_read(wz.data.ep_in)).status == STATUS_OK
+    assert wz.supervisor.rescheduled == 1
+
+
+def test_full_queue_during_service_is_retried(wz, clock, monkeypatch):
+    def full(func, arg):
+        raise RuntimeError("schedule queue full")
+
+    monkeypatch.setattr(channel, "schedule", full)
+    send(wz, b"User:4")
+    monkeypatch.setattr(supervisor, "schedule", full)
+    service(wz, clock, 100)
+    service(wz, clock, 100 + wz.supervisor.stall_ms)
+    assert wz.supervisor.rescheduled == 0
+    monkeypatch.setattr(supervisor, "schedule", micropython.schedule)
+    service(wz, clock, 100 + 2 * wz.supervisor.stall_ms)
+    assert wz.supervisor.rescheduled == 1
+    assert decode_ack(wz.host_read(wz.data.ep_in)).status == STATUS_OK
+
+
+def test_lost_transfer_is_kicked_from_the_schedule(wz, clock):
+    wz.pending.pop(wz.data.ep_out)
+    service(wz, clock, 100)
+    assert wz.supervisor.kicks == 0
+    clock[0] = 100 + wz.supervisor.stall_ms
+    wz.supervisor.service(clock[0])
+    # service() only scheduled the kick
+    assert wz.data.ep_out not in wz.pending
+    assert micropython.scheduled() == 1
+    micropython.run_scheduled()
+    assert wz.supervisor.kicks == 1 and wz.data.ep_out in wz.pending
+    assert send(wz, b"User:5").status == STATUS_OK
+
+
+def test_watchdog_is_starved_while_handlers_keep_failing(wz, clock):
+    wdt = wz.supervisor.wdt
+    print_usage = wz.lcd_printer.print_usage
+    fail(wz)
+    fed = wdt.fed
+    for i in range(wz.supervisor.max_failures):
+        service(wz, clock, 0)
+        send(wz, b"User:%d" % i)
+    assert wdt.fed - fed == wz.supervisor.max_failures
+    assert not wz.supervisor.healthy()
+    service(wz, clock, 0)
+    assert wdt.fed - fed == wz.supervisor.max_failures
+    wz.lcd_printer.print_usage = print_usage
+    send(wz, b"User:9")
+    service(wz, clock, 0)
+    assert wz.supervisor.healthy()
+    assert wdt.fed - fed == wz.supervisor.max_failures + 1
+
+
+def test_watchdog_is_off_by_default():
+    import tft_config
+    from board import open_interface
+
+    assert not tft_config.WATCHDOG_MS
+    assert open_interface().supervisor.wdt is None
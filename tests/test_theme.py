@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+import panel
+import st7789py as st7789
+from fonts import vga2_8x8 as font8
+from fonts import vga2_16x16 as font16
+from theme import Theme
+
+COLORS = [st7789.RED, st7789.GREEN, 0x1234, st7789.BLACK, st7789.WHITE, 0x4321]
+
+
+def draw(themed, rotation):
+    rnd = random.Random(rotation)
+    tft, spi = panel.make()
+    tft.rotation(rotation)
+    if themed:
+        # Not every colour drawn is in the theme
+        Theme([st7789.RED, st7789.GREEN, 0x1234]).bind(tft)
+    for _ in range(150):
+        k = rnd.random()
+        color, background = rnd.choice(COLORS), rnd.choice(COLORS)
+        if k < 0.4:
+            tft.fill_rect(rnd.randrange(100), rnd.randrange(100),
+                          rnd.randrange(1, 100), rnd.randrange(1, 100), color)
+        elif k < 0.6:
+            tft.pixel(rnd.randrange(200), rnd.randrange(200), color)
+        else:
+            tft.text(rnd.choice([font8, font16]), "Ab1%", rnd.randrange(150),
+                     rnd.randrange(200), color, background)
+    # Back to the first rotation, the theme is rebuilt for its byte order
+    tft.rotation(0)
+    tft.fill_rect(0, 0, 30, 30, st7789.RED)
+    tft.text(font8, "x", 40, 0, st7789.GREEN, 0x1234)
+    return spi.ram
+
+
+@pytest.mark.parametrize("rotation", range(4))
+def test_themed_drawing_matches_plain_drawing(rotation):
+    assert draw(True, rotation) == draw(False, rotation)
+
+
+def test_bind_follows_the_byte_order():
+    tft, _ = panel.make()
+    theme = Theme([st7789.RED], pattern_px=16)
+    theme.bind(tft)
+    assert tft.theme is theme
+    swap = tft.needs_swap
+    pixel = theme.pixels[st7789.RED]
+    assert len(theme.patterns[st7789.RED]) == 32
+    assert theme.colors() == [st7789.BLACK, st7789.WHITE, st7789.RED]
+    # A rotation with the other byte order rebuilds the forms
+    tft.needs_swap = not swap
+    theme.bind(tft)
+    assert theme.pixels[st7789.RED] == pixel[::-1]
+    assert theme.patterns[st7789.RED] == pixel[::-1] * 16
@@ -0,0 +1,166 @@
+import micropython
+import touch
+from machine import Pin
+from touch import (CST328, Touch, TAP, LONG_PRESS, SWIPE_LEFT, SWIPE_RIGHT,
+                   SWIPE_UP, SWIPE_DOWN)
+
+
+class FakeI2C:
+    """
+    A CST328 on a fake bus: serves the register reads from the current
+    report and counts the acknowledgements.
+    """
+    def __init__(self):
+        self.points = 0
+        self.x = 0
+        self.y = 0
+        self.acks = 0
+
+    def report(self, points, x=0, y=0):
+        self.points = points
+        self.x = x
+        self.y = y
+
+    def readfrom_mem_into(self, addr, reg, buf, addrsize=8):
+        assert addr == touch.CST328_ADDR and addrsize == 16
+        if reg == touch._REG_COUNT:
+            buf[0] = 0x80 | self.points
+        elif reg == touch._REG_XY:
+            buf[0] = 0x06
+            buf[1] = self.x >> 4
+            buf[2] = self.y >> 4
+            buf[3] = (self.x & 0x0F) << 4 | (self.y & 0x0F)
+            buf[4] = 0x20
+
+    def writeto_mem(self, addr, reg, buf, addrsize=8):
+        assert reg == touch._REG_COUNT and buf[0] == 0
+        self.acks += 1
+
+
+def replay(trace, **kwargs):
+    """
+    Feed a recorded trace of (ms, points, x, y) reports, one poll per
+    interrupt, and return the gestures and the Touch.
+    """
+    bus = FakeI2C()
+    t = Touch(CST328(bus), **kwargs)
+    for ms, points, x, y in trace:
+        bus.report(points, x, y)
+        t.poll(ms)
+    events = []
+    event = t.get()
+    while event is not None:
+        events.append(event)
+        event = t.get()
+    return events, t
+
+
+def stroke(t0, x0, y0, x1, y1, ms=150, steps=6):
+    # Reports every ms / steps milliseconds along a line, then the lift
+    trace = []
+    for i in range(steps + 1):
+        trace.append((t0 + ms * i // steps, 1, x0 + (x1 - x0) * i // steps,
+                      y0 + (y1 - y0) * i // steps))
+    trace.append((t0 + ms + 10, 0, 0, 0))
+    return trace
+
+
+def test_coordinates_are_decoded_and_reports_acknowledged():
+    bus = FakeI2C()
+    dev = CST328(bus)
+    bus.report(1, 0x123, 0x0AB)
+    assert dev.read() == 1
+    assert (dev.x, dev.y) == (0x123, 0x0AB)
+    bus.report(0)
+    assert dev.read() == 0
+    assert bus.acks == 2
+
+
+def test_swipes():
+    trace = (stroke(0, 200, 150, 40, 160) + stroke(1000, 40, 150, 200, 140)
+             + stroke(2000, 120, 280, 110, 60) + stroke(3000, 120, 60, 130, 280))
+    events, _ = replay(trace)
+    assert [e[0] for e in events] == [SWIPE_LEFT, SWIPE_RIGHT, SWIPE_UP,
+                                      SWIPE_DOWN]
+    # Gestures carry the starting point
+    assert events[0][1:] == (200, 150)
+
+
+def test_tap_and_long_press():
+    trace = stroke(0, 100, 100, 103, 98, ms=80) + stroke(500, 100, 100, 104, 104,
+                                                          ms=900, steps=9)
+    events, _ = replay(trace)
+    assert [e[0] for e in events] == [TAP, LONG_PRESS]
+
+
+def test_bounces_are_ignored():
+    trace = [(0, 1, 50, 50), (10, 0, 0, 0), (100, 1, 60, 60), (115, 0, 0, 0)]
+    events, _ = replay(trace)
+    assert events == []
+
+
+def test_missed_lift_is_finished_by_service():
+    trace = stroke(0, 200, 100, 60, 100)[:-1]  # The lift report was lost
+    events, t = replay(trace)
+    assert events == [] and t.down
+    assert not t.pending(200)
+    assert t.pending(400)
+    t.service(400)
+    assert t.get()[0] == SWIPE_LEFT
+    assert not t.down and not t.pending(400)
+
+
+def test_queue_keeps_the_newest_gestures():
+    trace = []
+    for i in range(5):
+        trace += stroke(i * 1000, 200, 100, 60, 100)
+    trace += stroke(5000, 60, 100, 200, 100)
+    events, t = replay(trace, queue_len=3)
+    assert [e[0] for e in events] == [SWIPE_LEFT, SWIPE_LEFT, SWIPE_RIGHT]
+    assert t.overflow == 3
+
+
+def test_interrupt_schedules_one_read():
+    bus = FakeI2C()
+    irq = Pin(4, Pin.IN)
+    t = Touch(CST328(bus), irq=irq)
+    bus.report(1, 100, 100)
+    irq.handler(irq)
+    irq.handler(irq)  # A second edge before the read ran
+    assert micropython.scheduled() == 1
+    micropython.run_scheduled()
+    assert t.down and bus.acks == 1
+    irq.handler(irq)
+    assert micropython.scheduled() == 1
+
+
+def test_gestures_are_drawn_from_the_scheduled_context():
+    import main
+    from board import open_interface
+
+    wz = open_interface()
+    pages = wz.lcd_printer.pages
+    first = pages.active
+    events, t = replay(stroke(0, 200, 150, 40, 160))
+    t.events.extend(events)
+    drawn = []
+    step = pages.step
+    pages.step = lambda delta: drawn.append(delta) or step(delta)
+
+    def stop():
+        raise KeyboardInterrupt
+
+    idle = main.idle
+    main.idle = stop
+    try:
+        main.main_loop(wz, t)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        main.idle = idle
+    # The loop only scheduled the handling
+    assert drawn == [] and micropython.scheduled() == 1
+    micropython.run_scheduled()
+    assert drawn == [1]
+    assert pages.active is pages.pages[1] and pages.active is not first
+    assert not wz._touch_scheduled
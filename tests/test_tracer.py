@@ -0,0 +1,33 @@
+import panel
+from protocol import TRACE_HEADER_SIZE, TRACE_ENTRY_SIZE
+from tracer import Tracer, STAGE_RX, STAGE_SPI
+from wz1_protocol import decode_trace
+
+
+def test_only_pixel_data_is_marked():
+    tft, spi = panel.make()
+    tracer = Tracer()
+    tracer.wrap_write(tft)
+    tracer.begin(7, 1)
+    before = spi.ramwr
+    tft.fill_rect(0, 0, 10, 10, 0xF800)
+    tft.pixel(20, 20, 0x07E0)
+    entries = decode_trace(tracer.dump())
+    # CASET and RASET carry data too, but only the two RAMWR payloads count
+    assert entries and all(e[:3] == (7, STAGE_SPI, 1) for e in entries)
+    assert len(entries) == spi.ramwr - before == 2
+
+
+def test_dump_keeps_the_newest_entries_that_fit():
+    tracer = Tracer(size=8)
+    for seq in range(12):
+        tracer.mark(STAGE_RX, seq, 0)
+    assert [e[0] for e in decode_trace(tracer.dump())] == list(range(4, 12))
+    for seq in range(5):
+        tracer.mark(STAGE_RX, seq, 0)
+    dump = tracer.dump(TRACE_HEADER_SIZE + 3 * TRACE_ENTRY_SIZE + 1)
+    assert len(dump) == TRACE_HEADER_SIZE + 3 * TRACE_ENTRY_SIZE
+    assert [e[0] for e in decode_trace(dump)] == [2, 3, 4]
+    # Too small for a single entry: an empty dump, still a valid reply
+    tracer.mark(STAGE_RX, 1, 0)
+    assert decode_trace(tracer.dump(TRACE_HEADER_SIZE)) == []
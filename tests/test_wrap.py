@@ -0,0 +1,27 @@
+from fonts import vga2_8x8 as font
+from wrap import WordWrap, line_text
+
+
+def test_breaks_fill_lines_with_whole_words():
+    text = "The quick brown fox jumps over the lazy dog"
+    lines = WordWrap().breaks(text, font, 0, 80)  # 10 characters a line
+    assert [line_text(text, s, e) for s, e in lines] == [
+        "The quick", "brown fox", "jumps over", "the lazy", "dog"]
+
+
+def test_cache_keeps_the_recently_used_texts():
+    wrap = WordWrap(max_entries=2)
+    a = wrap.breaks("one two", font, 0, 40)
+    wrap.breaks("three four", font, 0, 40)
+    assert wrap.breaks("one two", font, 0, 40) is a  # A hit, now the newest
+    wrap.breaks("five six", font, 0, 40)  # Evicts "three four"
+    assert wrap.breaks("one two", font, 0, 40) is a
+    assert len(wrap._cache) == 2 and ("three four", font, 0, 40) not in wrap._cache
+
+
+def test_printer_sizes_the_cache_for_its_pages():
+    from lcd_printer import LCDPrinter
+
+    printer = LCDPrinter()
+    assert printer.wrap.max_entries == printer.pages.wrap_entries()
+    assert printer.wrap.max_entries > 8
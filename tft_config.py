@@ -1,5 +1,5 @@
 # tft_config.py
-from machine import Pin, SPI
+from machine import Pin, SPI, PWM
 import st7789py as st7789
 
 # Your display pins (SPI3)
@@ -25,3 +25,33 @@ def config(mode=None):
     )
 
 WIDE = 0  # Used by example for optional orientation logic
+
+# Hardware watchdog timeout in ms, 0 leaves it off. A started watchdog cannot
+# be stopped: with it on, interrupting main.py (e.g. mpremote or
+# upload-to-esp.sh) resets the board a few seconds later. Enable it only on
+# panels that are not being developed on.
+WATCHDOG_MS = 0
+
+# Draw updates and page switches as frames through the compositor. Its 4 bpp
+# canvas takes 38 KB of heap for the whole screen; leave it off until the
+# heap budget and the CPU time per frame (benchmarks/compose_bench.py) were
+# checked on the board.
+COMPOSE = False
+
+# Declare the bulk image pipe (a third endpoint pair). Together with the
+# builtin CDC it may need more IN endpoints than the ESP32-S3 has; check that
+# the board still enumerates before turning it on.
+IMAGE_PIPE = False
+
+# Backlight PWM, takes the pin over from the driver for dimming
+def backlight_config():
+    return PWM(Pin(5), freq=1000, duty_u16=65535)
+
+# Touch controller pins (CST328 on I2C0)
+def touch_config():
+    from machine import I2C
+    from touch import CST328, Touch
+
+    i2c = I2C(0, scl=Pin(3), sda=Pin(1), freq=400_000)
+    dev = CST328(i2c, rst=Pin(2, Pin.OUT))
+    return Touch(dev, irq=Pin(4, Pin.IN, Pin.PULL_UP))
@@ -0,0 +1,70 @@
+# Colour theme for the display.
+# A theme lists the colours the printer draws with and keeps each of them in
+# the forms the driver's hot paths use: the 2 byte pixel as it is sent, the
+# integer the glyph packers take, and a fill pattern of a whole SPI burst for
+# fill_rect. The forms depend on the byte order of the current rotation, so
+# they are built when the theme is bound and again when the rotation changes;
+# drawing in a theme colour then packs and allocates nothing.
+
+import struct
+import st7789py as st7789
+
+
+class Theme:
+    """
+    The colours of the printer, pre-packed for the ST7789 driver.
+    """
+    def __init__(self, accents, foreground=st7789.WHITE,
+                 background=st7789.BLACK, pattern_px=256):
+        """
+        :param accents: The 565 encoded colours the values cycle through.
+        :param foreground: The 565 encoded colour of titles and info text.
+        :param background: The 565 encoded background colour.
+        :param pattern_px: Pixels per fill pattern, i.e. per fill_rect burst.
+        """
+        self.accents = list(accents)
+        self.foreground = foreground
+        self.background = background
+        self.pattern_px = pattern_px
+        # 565 colour -> pixel bytes as sent, packer integer, fill pattern
+        self.pixels = {}
+        self.swapped = {}
+        self.patterns = {}
+        self.needs_swap = None  # Byte order the forms were built for
+
+    def accent(self, idx):
+        """
+        Return the accent colour for the idx-th value, cycling.
+        """
+        return self.accents[idx % len(self.accents)]
+
+    def colors(self):
+        """
+        Return every colour of the theme once.
+        """
+        colors = [self.background, self.foreground]
+        for color in self.accents:
+            if color not in colors:
+                colors.append(color)
+        return colors
+
+    def bind(self, tft):
+        """
+        Build the packed forms for the driver's byte order and let the driver
+        use them. The driver binds the theme again when its rotation changes.
+        :param tft: The ST7789 driver instance.
+        :return: None
+        """
+        tft.theme = self
+        if self.needs_swap == tft.needs_swap:
+            return
+        encode = "<H" if tft.needs_swap else ">H"
+        for color in self.colors():
+            pixel = struct.pack(encode, color)
+            self.pixels[color] = pixel
+            # ST7789.text passes the colour swapped unless the rotation swaps
+            self.swapped[color] = (
+                color if tft.needs_swap
+                else ((color << 8) & 0xFF00) | (color >> 8))
+            self.patterns[color] = pixel * self.pattern_px
+        self.needs_swap = tft.needs_swap
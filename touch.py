@@ -0,0 +1,183 @@
+# CST328 touch driver and gesture recognition for the
+# Waveshare ESP32-S3-Touch-LCD-2.8.
+# The controller is only read when its interrupt line fires: the IRQ handler
+# schedules one read, the read feeds a small gesture state machine, and
+# recognised gestures are queued; the main loop only checks for them and
+# schedules their handling. Nothing is polled while the screen is not
+# touched.
+# The I2C bus only needs readfrom_mem_into/writeto_mem, so a fake bus
+# replaying a recorded trace can stand in for the real one.
+
+from micropython import const, schedule
+from time import ticks_ms, ticks_diff, sleep_ms
+
+CST328_ADDR = const(0x1A)
+
+# 16-bit register addresses
+_REG_XY = const(0xD000)  # First touch point: id/state, x hi, y hi, x/y lo, z
+_REG_COUNT = const(0xD005)  # Low nibble: number of touch points
+
+# Gestures
+TAP = const(1)
+LONG_PRESS = const(2)
+SWIPE_LEFT = const(3)
+SWIPE_RIGHT = const(4)
+SWIPE_UP = const(5)
+SWIPE_DOWN = const(6)
+
+
+class CST328:
+    """
+    Minimal CST328 reader, reporting the first touch point only.
+    """
+    def __init__(self, i2c, addr=CST328_ADDR, rst=None):
+        """
+        :param i2c: The machine.I2C bus (or a fake with the same methods).
+        :param addr: The I2C address of the controller.
+        :param rst: Optional reset Pin.
+        """
+        self.i2c = i2c
+        self.addr = addr
+        self.x = 0
+        self.y = 0
+        # Preallocated transfer buffers, a read allocates nothing
+        self._count = bytearray(1)
+        self._point = bytearray(5)
+        self._zero = bytearray(1)
+        if rst is not None:
+            rst.value(0)
+            sleep_ms(10)
+            rst.value(1)
+            sleep_ms(50)
+
+    def read(self):
+        """
+        Read the touch state and acknowledge the report.
+        :return: The number of touch points; the first one is in x and y.
+        """
+        i2c = self.i2c
+        i2c.readfrom_mem_into(self.addr, _REG_COUNT, self._count, addrsize=16)
+        n = self._count[0] & 0x0F
+        if n:
+            p = self._point
+            i2c.readfrom_mem_into(self.addr, _REG_XY, p, addrsize=16)
+            self.x = (p[1] << 4) | (p[3] >> 4)
+            self.y = (p[2] << 4) | (p[3] & 0x0F)
+        # Clear the report so the controller raises the next interrupt
+        i2c.writeto_mem(self.addr, _REG_COUNT, self._zero, addrsize=16)
+        return n
+
+
+class Touch:
+    """
+    Turns the touch reports into debounced gesture events.
+    """
+    def __init__(self, dev, irq=None, debounce_ms=30, long_ms=600,
+                 swipe_px=40, release_ms=100, queue_len=8):
+        """
+        :param dev: The CST328 (anything with read(), x and y).
+        :param irq: Optional interrupt Pin; without it poll() has to be
+                    called by the caller, e.g. when replaying a trace.
+        :param debounce_ms: Contacts shorter than this are ignored.
+        :param long_ms: A contact held this long without moving is a long press.
+        :param swipe_px: Minimum travel of a swipe.
+        :param release_ms: A contact without reports for this long is
+                           taken as lifted, in case the lift report was lost.
+        :param queue_len: Maximum number of queued gestures.
+        """
+        self.dev = dev
+        self.debounce_ms = debounce_ms
+        self.long_ms = long_ms
+        self.swipe_px = swipe_px
+        self.release_ms = release_ms
+        self.queue_len = queue_len
+        self.events = []  # (gesture, x, y), oldest first
+        self.overflow = 0
+        self.down = False
+        self.x0 = self.y0 = 0
+        self.t0 = self.last_ms = 0
+        self._pending = False
+        if irq is not None:
+            irq.irq(trigger=irq.IRQ_FALLING, handler=self._irq)
+
+    def _irq(self, pin):
+        # Hard IRQ context: only schedule the I2C read
+        if self._pending:
+            return
+        self._pending = True
+        try:
+            schedule(self._on_irq, None)
+        except RuntimeError:
+            self._pending = False  # Queue full, the next edge retries
+
+    def _on_irq(self, _):
+        self._pending = False
+        self.poll(ticks_ms())
+
+    def poll(self, now):
+        """
+        Read one report from the controller and update the gesture state.
+        :param now: The time of the report in milliseconds (ticks_ms).
+        :return: None
+        """
+        dev = self.dev
+        if dev.read():
+            if not self.down:
+                self.down = True
+                self.x0 = dev.x
+                self.y0 = dev.y
+                self.t0 = now
+            self.last_ms = now
+        elif self.down:
+            self._release(now)
+
+    def pending(self, now):
+        """
+        Return True if service() or get() have work: queued gestures, or a
+        contact whose lift was missed. Only reads the state, so the main loop
+        can call it while a scheduled read is updating it.
+        :param now: The current time in milliseconds (ticks_ms).
+        """
+        return bool(self.events) or (
+            self.down and ticks_diff(now, self.last_ms) > self.release_ms)
+
+    def service(self, now):
+        """
+        Finish a contact whose lift was missed; call it from the scheduled
+        context, like poll(). Costs no I2C traffic.
+        :param now: The current time in milliseconds (ticks_ms).
+        :return: None
+        """
+        if self.down and ticks_diff(now, self.last_ms) > self.release_ms:
+            self._release(self.last_ms)
+
+    def _release(self, now):
+        self.down = False
+        held = ticks_diff(now, self.t0)
+        if held < self.debounce_ms:
+            return  # A bounce, not a touch
+        x = self.dev.x
+        y = self.dev.y
+        dx = x - self.x0
+        dy = y - self.y0
+        if abs(dx) >= self.swipe_px or abs(dy) >= self.swipe_px:
+            if abs(dx) >= abs(dy):
+                gesture = SWIPE_RIGHT if dx > 0 else SWIPE_LEFT
+            else:
+                gesture = SWIPE_DOWN if dy > 0 else SWIPE_UP
+        elif held >= self.long_ms:
+            gesture = LONG_PRESS
+        else:
+            gesture = TAP
+        if len(self.events) >= self.queue_len:
+            self.events.pop(0)  # Keep the newest gestures
+            self.overflow += 1
+        self.events.append((gesture, self.x0, self.y0))
+
+    def get(self):
+        """
+        Return the oldest queued (gesture, x, y) event, or None.
+        """
+        if self.events:
+            return self.events.pop(0)
+        return None
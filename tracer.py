@@ -0,0 +1,124 @@
+# Opt-in latency tracing for the receive -> render -> ack path.
+# Every stage a frame passes records (seq, stage, channel, ticks_us) into a
+# fixed-size ring buffer; nothing is allocated per trace point. The ring is
+# dumped over the control endpoint ("TRACE") and the host reconstructs the
+# per-stage latencies (linux-side-python-test/wz1_trace.py).
+
+import struct
+from protocol import (REPLY_TRACE, TRACE_HEADER, TRACE_HEADER_SIZE,
+                      TRACE_ENTRY, TRACE_ENTRY_SIZE)
+
+try:
+    from time import ticks_us
+except ImportError:
+    from time import perf_counter_ns
+    ticks_us = lambda: perf_counter_ns() // 1000
+
+# Stages, in the order a frame passes them
+STAGE_RX = 1  # USB OUT transfer completed (Channel._rx_cb)
+STAGE_SCHED = 2  # Scheduled handler started (Channel._on_rx)
+STAGE_PARSED = 3  # Frame parsed
+STAGE_SPI = 4  # One pixel data flush to the display (RAMWR payload)
+STAGE_DRAWN = 5  # Layout and rendering finished
+STAGE_ACK = 6  # Reply queued for the IN transfer (Channel.write)
+
+_RAMWR = b"\x2c"  # ST7789 memory write, the command pixel data follows
+
+
+class Tracer:
+    """
+    A ring buffer of trace points.
+    Marks without an explicit seq/channel belong to the frame announced with
+    begin(), i.e. the one whose handler is running.
+    """
+    def __init__(self, size=256):
+        """
+        :param size: Number of entries kept; older ones are overwritten.
+        """
+        self.size = size
+        self.buf = bytearray(size * TRACE_ENTRY_SIZE)
+        # Reply buffer for dump(), header plus the entries in order
+        self._dump = bytearray(TRACE_HEADER_SIZE + len(self.buf))
+        self.pos = 0  # Next entry to write
+        self.count = 0  # Entries written since the last clear
+        self.seq = 0
+        self.chan = 0
+        self._ramwr = False  # The last display command was RAMWR
+
+    def begin(self, seq, chan):
+        """
+        Announce the frame the following marks belong to.
+        """
+        self.seq = seq
+        self.chan = chan
+
+    def mark(self, stage, seq=-1, chan=-1):
+        """
+        Record a trace point.
+        :param stage: One of the STAGE_* constants.
+        :param seq: The frame sequence number (default: the current frame).
+        :param chan: The channel index (default: the current frame's).
+        :return: None
+        """
+        if seq < 0:
+            seq = self.seq
+        if chan < 0:
+            chan = self.chan
+        struct.pack_into(TRACE_ENTRY, self.buf, self.pos * TRACE_ENTRY_SIZE,
+                         seq & 0xFFFF, stage, chan, ticks_us() & 0xFFFFFFFF)
+        self.pos += 1
+        if self.pos == self.size:
+            self.pos = 0
+        self.count += 1
+
+    def wrap_write(self, tft):
+        """
+        Mark every pixel data flush of the display driver, i.e. the data
+        written after a RAMWR command; command arguments such as the
+        CASET/RASET window are not marked.
+        :param tft: The ST7789 driver instance.
+        :return: None
+        """
+        write = tft._write
+
+        def traced_write(command=None, data=None):
+            write(command, data)
+            if command is not None:
+                self._ramwr = command == _RAMWR
+            elif data is not None and self._ramwr:
+                self.mark(STAGE_SPI)
+
+        tft._write = traced_write
+
+    def clear(self):
+        self.pos = 0
+        self.count = 0
+
+    def dump(self, max_bytes=None):
+        """
+        Encode the recorded entries, oldest first, and clear the ring.
+        :param max_bytes: Optional size limit of the reply, e.g. the free
+                          space of the TX buffer; only the newest entries
+                          that fit are encoded.
+        :return: A memoryview of the reply.
+        """
+        n = min(self.count, self.size)
+        if max_bytes is not None:
+            n = max(0, min(n, (max_bytes - TRACE_HEADER_SIZE) // TRACE_ENTRY_SIZE))
+        out = self._dump
+        struct.pack_into(TRACE_HEADER, out, 0, REPLY_TRACE, 0, n,
+                         TRACE_ENTRY_SIZE)
+        # The oldest of the n newest entries
+        first = (self.pos - n) % self.size * TRACE_ENTRY_SIZE
+        end = n * TRACE_ENTRY_SIZE
+        dst = memoryview(out)[TRACE_HEADER_SIZE:]
+        src = memoryview(self.buf)
+        tail = len(self.buf) - first
+        if end > tail:
+            # The entries wrap around the end of the ring
+            dst[:tail] = src[first:]
+            dst[tail:end] = src[:end - tail]
+        else:
+            dst[:end] = src[first:first + end]
+        self.clear()
+        return memoryview(out)[:TRACE_HEADER_SIZE + end]
@@ -5,6 +5,23 @@ mpremote cp fonts/vga2_8x8.py :fonts/vga2_8x8.py
 mpremote cp fonts/vga2_16x16.py :fonts/vga2_16x16.py
 mpremote cp fonts/vga2_bold_16x32.py :fonts/vga2_bold_16x32.py
 mpremote cp st7789py.py :st7789py.py
+mpremote cp static_layers.py :static_layers.py
+mpremote cp layout.py :layout.py
+mpremote cp compositor.py :compositor.py
+mpremote cp theme.py :theme.py
+mpremote cp wrap.py :wrap.py
+mpremote cp pages.py :pages.py
 mpremote cp lcd_printer.py :lcd_printer.py
 mpremote cp tft_config.py :tft_config.py
+mpremote cp protocol.py :protocol.py
+mpremote cp parser.py :parser.py
+mpremote cp history.py :history.py
+mpremote cp snapshot.py :snapshot.py
+mpremote cp channel.py :channel.py
+mpremote cp image_stream.py :image_stream.py
+mpremote cp touch.py :touch.py
+mpremote cp tracer.py :tracer.py
+mpremote cp instrument.py :instrument.py
+mpremote cp power.py :power.py
+mpremote cp supervisor.py :supervisor.py
 mpremote cp main.py :main.py
\ No newline at end of file
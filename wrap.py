@@ -0,0 +1,115 @@
+# Word-wrap engine for the LCD.
+# Line breaks are computed as (start, end) index pairs into the original text,
+# without building intermediate strings, and the result is memoised per
+# (text, font, x, width) so redrawing the same message costs nothing.
+# Works for the monospaced bitmap fonts used with ST7789.text and for the
+# proportional fonts used with ST7789.write (through cached glyph widths).
+
+
+def is_proportional(font):
+    """
+    True for converted true-type fonts drawn with ST7789.write.
+    """
+    return hasattr(font, "WIDTHS")
+
+
+def line_text(text, start, end):
+    """
+    The text of one line, with the whitespace between its words collapsed
+    to single spaces as they were measured.
+    """
+    line = text[start:end]
+    if "  " in line or "\n" in line or "\t" in line or "\r" in line:
+        line = " ".join(line.split())
+    return line
+
+
+class WordWrap:
+    """
+    Computes and caches line breaks.
+    """
+    def __init__(self, max_entries=8):
+        """
+        :param max_entries: How many wrapped texts to remember; at least
+                            the texts one page draws, or every redraw
+                            recomputes them.
+        """
+        self.max_entries = max_entries
+        # (text, font, x, width) -> [(start, end), ...]
+        self._cache = {}
+        # The cache keys, least recently used first (MicroPython dicts do not
+        # keep insertion order)
+        self._order = []
+        # font -> {char: width} for proportional fonts
+        self._widths = {}
+
+    def _char_widths(self, font):
+        widths = self._widths.get(font)
+        if widths is None:
+            widths = {}
+            for i, char in enumerate(font.MAP):
+                widths[char] = font.WIDTHS[i]
+            self._widths[font] = widths
+        return widths
+
+    def _span_width(self, text, start, end, font, widths):
+        if widths is None:
+            return (end - start) * font.WIDTH
+        w = 0
+        for i in range(start, end):
+            w += widths.get(text[i], 0)
+        return w
+
+    def breaks(self, text, font, x, width):
+        """
+        Return the line breaks of text as (start, end) index pairs.
+        A line is filled with whole words while it fits between x and width;
+        a single word wider than that gets a line of its own.
+        :param text: The text to wrap.
+        :param font: The font module the text will be drawn with.
+        :param x: The x-coordinate the lines start at.
+        :param width: The screen width.
+        :return: A list of (start, end) tuples.
+        """
+        key = (text, font, x, width)
+        lines = self._cache.get(key)
+        if lines is not None:
+            order = self._order
+            if order[-1] != key:
+                order.remove(key)
+                order.append(key)
+            return lines
+        widths = self._char_widths(font) if is_proportional(font) else None
+        space = widths.get(" ", 0) if widths is not None else font.WIDTH
+        avail = width - x
+        lines = []
+        line_start = -1
+        line_end = 0
+        line_w = 0
+        n = len(text)
+        i = 0
+        while i < n:
+            # Find the next word
+            while i < n and text[i].isspace():
+                i += 1
+            if i >= n:
+                break
+            start = i
+            while i < n and not text[i].isspace():
+                i += 1
+            word_w = self._span_width(text, start, i, font, widths)
+            if line_start < 0:
+                line_start, line_end, line_w = start, i, word_w
+            elif line_w + space + word_w > avail:
+                lines.append((line_start, line_end))
+                line_start, line_end, line_w = start, i, word_w
+            else:
+                line_end = i
+                line_w += space + word_w
+        if line_start >= 0:
+            lines.append((line_start, line_end))
+        if len(self._order) >= self.max_entries:
+            del self._cache[self._order.pop(0)]
+        self._cache[key] = lines
+        self._order.append(key)
+        return lines